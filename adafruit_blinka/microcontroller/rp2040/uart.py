@@ -12,10 +12,12 @@ class UART:
     """Custom UART Class for RP2040"""
 
     # pylint: disable=too-many-arguments
-    def __init__(self, tx, rx, baudrate=9600, bits=8, parity=None, stop=1):
+    def __init__(self, tx, rx, baudrate=9600, bits=8, parity=None, stop=1, rxbuf=None):
         # check tx and rx have hardware support
         for portId, txPin, rxPin in uartPorts:
             if txPin == tx and rxPin == rx:
+                # the receive buffer of the port, 256 bytes if not given
+                extra = {} if rxbuf is None else {"rxbuf": rxbuf}
                 self._uart = _UART(
                     portId,
                     baudrate,
@@ -24,7 +26,9 @@ class UART:
                     stop=stop,
                     tx=Pin(txPin.id),
                     rx=Pin(rxPin.id),
+                    **extra,
                 )
+                self._baudrate = baudrate
                 break
         else:
             raise ValueError(
@@ -50,3 +54,25 @@ class UART:
     def write(self, buf):
         """Write to the UART from a buffer"""
         return self._uart.write(buf)
+
+    @property
+    def in_waiting(self):
+        """Number of bytes in the receive buffer"""
+        return self._uart.any()
+
+    @property
+    def baudrate(self):
+        """The current baudrate"""
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, baudrate):
+        self._uart.init(baudrate=baudrate)
+        self._baudrate = baudrate
+
+    def irq(self, handler, trigger=None):
+        """Call handler(uart) on UART events, when the receive line goes idle
+        by default. Raises AttributeError if the port has no UART interrupts"""
+        if trigger is None:
+            trigger = _UART.IRQ_RXIDLE
+        return self._uart.irq(handler=handler, trigger=trigger)
@@ -93,6 +93,8 @@ _BME680_REG_CTRL_HUM = const(0x72)
 _BME680_REG_STATUS = const(0x73)
 _BME680_REG_CTRL_MEAS = const(0x74)
 _BME680_REG_CONFIG = const(0x75)
+# First register of the shadow copy kept by _trigger
+_BME680_SHADOW_START = const(0x71)
 
 _BME680_REG_MEAS_STATUS = const(0x1D)
 _BME680_REG_PDATA = const(0x1F)
@@ -123,6 +125,8 @@ _LOOKUP_TABLE_1 = (
     2147483647.0,
 )
 
+_LOOKUP_TABLE_1_INT = tuple(int(x) for x in _LOOKUP_TABLE_1)
+
 _LOOKUP_TABLE_2 = (
     4096000000.0,
     2048000000.0,
@@ -141,6 +145,7 @@ _LOOKUP_TABLE_2 = (
     250000.0,
     125000.0,
 )
+_LOOKUP_TABLE_2_INT = tuple(int(x) for x in _LOOKUP_TABLE_2)
 
 
 def bme_set_bits(reg_data, bitname_msk, bitname_pos, data):
@@ -176,6 +181,11 @@ class Adafruit_BME680:
     :param int refresh_rate: Maximum number of readings per second. Faster property reads
       will be from the previous reading."""
 
+    integer_compensation = False
+    """Compensate with the fixed point Bosch reference code instead of floats. Results match
+    the float path within the rounding of the integer units (0.01 C, 1 Pa, 0.001 %RH), with
+    fewer float objects allocated."""
+
     def __init__(self, *, refresh_rate: int = 10) -> None:
         """Check the BME680 was found, read the coefficients and enable the sensor for continuous
         reads."""
@@ -217,6 +227,14 @@ class Adafruit_BME680:
 
         self._last_reading = 0
         self._min_refresh_time = 1 / refresh_rate
+        self._measure_start = 0
+        self._measure_due = None
+        self._heater_time = 0
+
+        # Last values written to CONFIG..CTRL_GAS_1 by _trigger, invalid until the first one
+        self._shadow = bytearray(_BME680_REG_CONFIG - _BME680_SHADOW_START + 1)
+        self._shadow_valid = False
+        self._pairs = bytearray(10)
 
         self._amb_temp = 25  # Copy required parameters from reference bme68x_dev struct
         self.set_gas_heater(320, 150)  # heater 320 deg C for 150 msec
@@ -273,6 +291,11 @@ class Adafruit_BME680:
     def temperature(self) -> float:
         """The compensated temperature in degrees Celsius."""
         self._perform_reading()
+        return self._calc_temperature()
+
+    def _calc_temperature(self) -> float:
+        if self.integer_compensation:
+            return self._calc_temperature_int() / 100
         calc_temp = ((self._t_fine * 5) + 128) / 256
         return calc_temp / 100
 
@@ -280,6 +303,11 @@ class Adafruit_BME680:
     def pressure(self) -> float:
         """The barometric pressure in hectoPascals"""
         self._perform_reading()
+        return self._calc_pressure()
+
+    def _calc_pressure(self) -> float:
+        if self.integer_compensation:
+            return self._calc_pressure_int() / 100
         var1 = (self._t_fine / 2) - 64000
         var2 = ((var1 / 4) * (var1 / 4)) / 2048
         var2 = (var2 * self._pressure_calibration[5]) / 4
@@ -308,6 +336,11 @@ class Adafruit_BME680:
     def humidity(self) -> float:
         """The relative humidity in RH %"""
         self._perform_reading()
+        return self._calc_humidity()
+
+    def _calc_humidity(self) -> float:
+        if self.integer_compensation:
+            return self._calc_humidity_int() / 1000
         temp_scaled = ((self._t_fine * 5) + 128) / 256
         var1 = (self._adc_hum - (self._humidity_calibration[0] * 16)) - (
             (temp_scaled * self._humidity_calibration[2]) / 200
@@ -346,6 +379,11 @@ class Adafruit_BME680:
     def gas(self) -> int:
         """The gas resistance in ohms"""
         self._perform_reading()
+        return self._calc_gas()
+
+    def _calc_gas(self) -> int:
+        if self.integer_compensation:
+            return self._calc_gas_int()
         if self._chip_variant == 0x01:
             # taken from https://github.com/BoschSensortec/BME68x-Sensor-API
             var1 = 262144 >> self._gas_range
@@ -361,39 +399,164 @@ class Adafruit_BME680:
             calc_gas_res = (var3 + (var2 / 2)) / var2
         return int(calc_gas_res)
 
+    def read_all(self) -> tuple:
+        """Temperature (degrees Celsius), pressure (hPa), relative humidity (%) and gas
+        resistance (ohms), all compensated from one measurement and one burst read.
+
+        Always starts a new measurement, ``refresh_rate`` does not apply."""
+        self._measure()
+        return (
+            self._calc_temperature(),
+            self._calc_pressure(),
+            self._calc_humidity(),
+            self._calc_gas(),
+        )
+
+    def read_all_raw(self) -> tuple:
+        """Uncompensated ADC values of one measurement:
+        (temperature, pressure, humidity, gas, gas range)"""
+        self._measure()
+        return (
+            int(self._adc_temp),
+            int(self._adc_pres),
+            self._adc_hum,
+            self._adc_gas,
+            self._gas_range,
+        )
+
     def _perform_reading(self) -> None:
         """Perform a single-shot reading from the sensor and fill internal data structure for
         calculations"""
         if time.monotonic() - self._last_reading < self._min_refresh_time:
             return
+        self._measure()
 
-        # set filter
-        self._write(_BME680_REG_CONFIG, [self._filter << 2])
-        # turn on temp oversample & pressure oversample
-        self._write(
-            _BME680_REG_CTRL_MEAS,
-            [(self._temp_oversample << 5) | (self._pressure_oversample << 2)],
+    @property
+    def measuring(self) -> bool:
+        """True between :meth:`start_measurement` and the :meth:`try_collect` that returns
+        its result"""
+        return self._measure_due is not None
+
+    def measurement_duration(self) -> float:
+        """Expected duration of a forced mode measurement with the current settings, in
+        seconds (as calculated by the Bosch BME68x API)"""
+        # One conversion cycle per oversample
+        cycles = (
+            _BME680_SAMPLERATES[self._temp_oversample]
+            + _BME680_SAMPLERATES[self._pressure_oversample]
+            + _BME680_SAMPLERATES[self._humidity_oversample]
         )
-        # turn on humidity oversample
-        self._write(_BME680_REG_CTRL_HUM, [self._humidity_oversample])
-        # gas measurements enabled
-        if self._chip_variant == 0x01:
-            self._write(_BME680_REG_CTRL_GAS, [(self._run_gas & _BME680_RUNGAS) << 1])
-        else:
-            self._write(_BME680_REG_CTRL_GAS, [(self._run_gas & _BME680_RUNGAS)])
-        ctrl = self._read_byte(_BME680_REG_CTRL_MEAS)
-        ctrl = (ctrl & 0xFC) | 0x01  # enable single shot!
-        self._write(_BME680_REG_CTRL_MEAS, [ctrl])
-        new_data = False
+        # TPH conversion, switching, gas measurement and wake up, in microseconds
+        duration_us = cycles * 1963 + 477 * 4 + 477 * 5 + 1000
+        return duration_us / 1000000 + self._heater_time / 1000
+
+    def start_measurement(self) -> float:
+        """Trigger a forced mode measurement and return without waiting for it.
+
+        :return: :func:`time.monotonic` value when the result is expected"""
+        self._trigger()
+        self._measure_start = time.monotonic()
+        self._measure_due = self._measure_start + self.measurement_duration()
+        return self._measure_due
+
+    def try_collect(self):
+        """Result of the measurement started with :meth:`start_measurement`, ``None`` while it
+        is still running.
+
+        Before the expected completion time this does not touch the bus. After it, all data
+        registers are read in one burst and used if the sensor reports new data, so a
+        measurement costs the trigger write and usually a single burst read.
+
+        :return: (temperature, pressure, humidity, gas) like :meth:`read_all`, or ``None``"""
+        if self._measure_due is None:
+            raise RuntimeError("No measurement started")
+        now = time.monotonic()
+        if now < self._measure_due:
+            return None
+        data = self._read(_BME680_REG_MEAS_STATUS, 17)
+        if not data[0] & 0x80:
+            if now - self._measure_start >= 3.0:
+                self._measure_due = None
+                raise RuntimeError("Timeout while reading sensor data")
+            return None
+        self._measure_due = None
+        self._collect(data)
+        return (
+            self._calc_temperature(),
+            self._calc_pressure(),
+            self._calc_humidity(),
+            self._calc_gas(),
+        )
+
+    def _measure(self) -> None:
+        """Trigger a forced mode measurement, wait for it and read all data registers in one
+        burst"""
+        self._trigger()
+        # Poll the status byte only, the data registers are read once complete
         start_time = time.monotonic()
-        while not new_data:
-            data = self._read(_BME680_REG_MEAS_STATUS, 17)
-            new_data = data[0] & 0x80 != 0
+        while not self._read_byte(_BME680_REG_MEAS_STATUS) & 0x80:
             time.sleep(0.005)
             if time.monotonic() - start_time >= 3.0:
                 raise RuntimeError("Timeout while reading sensor data")
+        self._collect()
+
+    def _trigger(self) -> None:
+        """Write the measurement settings and start a forced mode measurement.
+
+        Settings that match the shadow copy of the registers are skipped, changed ones and
+        the trigger go out in one transaction."""
+        # gas measurements enabled
+        if self._chip_variant == 0x01:
+            ctrl_gas = ((self._run_gas & _BME680_RUNGAS) << 1) & 0xFF
+        else:
+            ctrl_gas = self._run_gas & _BME680_RUNGAS
+        # turn on temp oversample & pressure oversample
+        ctrl_meas = (self._temp_oversample << 5) | (self._pressure_oversample << 2)
+        pairs = self._pairs
+        n = 0
+        # humidity oversample only takes effect with the following CTRL_MEAS write
+        for register, value in (
+            (_BME680_REG_CONFIG, self._filter << 2),
+            (_BME680_REG_CTRL_HUM, self._humidity_oversample),
+            (_BME680_REG_CTRL_GAS, ctrl_gas),
+            (_BME680_REG_CTRL_MEAS, ctrl_meas),
+        ):
+            if not self._shadow_valid or self._shadow[register - _BME680_SHADOW_START] != value:
+                pairs[n] = register
+                pairs[n + 1] = value
+                n += 2
+                self._shadow[register - _BME680_SHADOW_START] = value
+        self._shadow_valid = True
+        # enable single shot!
+        pairs[n] = _BME680_REG_CTRL_MEAS
+        pairs[n + 1] = ctrl_meas | 0x01
+        self._write_pairs(pairs, n // 2 + 1)
+
+    def _write_pairs(self, pairs: bytearray, count: int) -> None:
+        """Write ``count`` register/value pairs from ``pairs``, in order"""
+        for i in range(count):
+            self._write(pairs[2 * i], [pairs[2 * i + 1]])
+
+    def _collect(self, data: bytearray = None) -> None:
+        """Read the data registers of a completed measurement in one burst, unless ``data``
+        already holds them, and fill internal data structure for calculations"""
+        if data is None:
+            data = self._read(_BME680_REG_MEAS_STATUS, 17)
         self._last_reading = time.monotonic()
 
+        if self.integer_compensation:
+            self._adc_pres = (data[2] << 12) | (data[3] << 4) | (data[4] >> 4)
+            self._adc_temp = (data[5] << 12) | (data[6] << 4) | (data[7] >> 4)
+            self._adc_hum = (data[8] << 8) | data[9]
+            if self._chip_variant == 0x01:
+                self._adc_gas = (data[15] << 2) | (data[16] >> 6)
+                self._gas_range = data[16] & 0x0F
+            else:
+                self._adc_gas = (data[13] << 2) | (data[14] >> 6)
+                self._gas_range = data[14] & 0x0F
+            self._calc_t_fine_int()
+            return
+
         self._adc_pres = _read24(data[2:5]) / 16
         self._adc_temp = _read24(data[5:8]) / 16
         self._adc_hum = struct.unpack(">H", bytes(data[8:10]))[0]
@@ -403,13 +566,99 @@ class Adafruit_BME680:
         else:
             self._adc_gas = int(struct.unpack(">H", bytes(data[13:15]))[0] / 64)
             self._gas_range = data[14] & 0x0F
+        self._calc_t_fine()
 
+    def _calc_t_fine(self) -> None:
         var1 = (self._adc_temp / 8) - (self._temp_calibration[0] * 2)
         var2 = (var1 * self._temp_calibration[1]) / 2048
         var3 = ((var1 / 2) * (var1 / 2)) / 4096
         var3 = (var3 * self._temp_calibration[2] * 16) / 16384
         self._t_fine = int(var2 + var3)
 
+    def compensate_raw(self, raw: tuple) -> tuple:
+        """Compensate values returned by :meth:`read_all_raw` (possibly recorded earlier) with
+        this sensor's calibration and the current compensation mode.
+
+        :return: (temperature, pressure, humidity, gas) like :meth:`read_all`"""
+        self._adc_temp, self._adc_pres, self._adc_hum, self._adc_gas, self._gas_range = raw
+        if self.integer_compensation:
+            self._calc_t_fine_int()
+        else:
+            self._calc_t_fine()
+        return (
+            self._calc_temperature(),
+            self._calc_pressure(),
+            self._calc_humidity(),
+            self._calc_gas(),
+        )
+
+    # Fixed point compensation after the Bosch BME68x API reference code. Every step is an
+    # integer operation; only the final scaling to the units of the float path divides.
+
+    def _calc_t_fine_int(self) -> None:
+        t1, t2, t3 = self._temp_calibration_int
+        var1 = (self._adc_temp >> 3) - (t1 << 1)
+        var2 = (var1 * t2) >> 11
+        var3 = ((var1 >> 1) * (var1 >> 1)) >> 12
+        var3 = (var3 * (t3 << 4)) >> 14
+        self._t_fine = var2 + var3
+
+    def _calc_temperature_int(self) -> int:
+        """Temperature in 1/100 degrees Celsius"""
+        return ((self._t_fine * 5) + 128) >> 8
+
+    def _calc_pressure_int(self) -> int:
+        """Pressure in Pascal"""
+        p1, p2, p3, p4, p5, p6, p7, p8, p9, p10 = self._pressure_calibration_int
+        var1 = (self._t_fine >> 1) - 64000
+        var2 = ((((var1 >> 2) * (var1 >> 2)) >> 11) * p6) >> 2
+        var2 = var2 + ((var1 * p5) << 1)
+        var2 = (var2 >> 2) + (p4 << 16)
+        var1 = (((((var1 >> 2) * (var1 >> 2)) >> 13) * (p3 << 5)) >> 3) + ((p2 * var1) >> 1)
+        var1 = var1 >> 18
+        var1 = ((32768 + var1) * p1) >> 15
+        calc_pres = 1048576 - self._adc_pres
+        calc_pres = (calc_pres - (var2 >> 12)) * 3125
+        if calc_pres >= 0x40000000:
+            calc_pres = (calc_pres // var1) << 1
+        else:
+            calc_pres = (calc_pres << 1) // var1
+        var1 = (p9 * (((calc_pres >> 3) * (calc_pres >> 3)) >> 13)) >> 12
+        var2 = ((calc_pres >> 2) * p8) >> 13
+        var3 = ((calc_pres >> 8) * (calc_pres >> 8) * (calc_pres >> 8) * p10) >> 17
+        return calc_pres + ((var1 + var2 + var3 + (p7 << 7)) >> 4)
+
+    def _calc_humidity_int(self) -> int:
+        """Relative humidity in 1/1000 %"""
+        h1, h2, h3, h4, h5, h6, h7 = self._humidity_calibration_int
+        temp_scaled = ((self._t_fine * 5) + 128) >> 8
+        var1 = (self._adc_hum - h1) - (((temp_scaled * h3) // 100) >> 1)
+        var2 = (
+            h2
+            * (
+                ((temp_scaled * h4) // 100)
+                + (((temp_scaled * ((temp_scaled * h5) // 100)) >> 6) // 100)
+                + 16384
+            )
+        ) >> 10
+        var3 = var1 * var2
+        var4 = ((h6 << 7) + ((temp_scaled * h7) // 100)) >> 4
+        var5 = ((var3 >> 14) * (var3 >> 14)) >> 10
+        var6 = (var4 * var5) >> 1
+        calc_hum = (((var3 + var6) >> 10) * 1000) >> 12
+        return min(max(calc_hum, 0), 100000)
+
+    def _calc_gas_int(self) -> int:
+        """Gas resistance in ohms"""
+        if self._chip_variant == 0x01:
+            var1 = 262144 >> self._gas_range
+            var2 = 4096 + (self._adc_gas - 512) * 3
+            return (1000000 * var1) // var2
+        var1 = ((1340 + (5 * self._sw_err_int)) * _LOOKUP_TABLE_1_INT[self._gas_range]) >> 16
+        var2 = ((self._adc_gas << 15) - 16777216) + var1
+        var3 = (_LOOKUP_TABLE_2_INT[self._gas_range] * var1) >> 9
+        return (var3 + (var2 >> 1)) // var2
+
     def _read_calibration(self) -> None:
         """Read & save the calibration coefficients"""
         coeff = self._read(_BME680_BME680_COEFF_ADDR1, 25)
@@ -432,6 +681,13 @@ class Adafruit_BME680:
         self._heat_val = self._read_byte(0x00)
         self._sw_err = (self._read_byte(0x04) & 0xF0) / 16
 
+        # Same calibration for the fixed point path, H1 is kept multiplied by 16 as it is used
+        self._temp_calibration_int = [int(x) for x in self._temp_calibration]
+        self._pressure_calibration_int = [int(x) for x in self._pressure_calibration]
+        self._humidity_calibration_int = [int(x) for x in self._humidity_calibration]
+        self._humidity_calibration_int[0] = int(self._humidity_calibration[0] * 16)
+        self._sw_err_int = int(self._sw_err)
+
     def _read_byte(self, register: int) -> int:
         """Read a byte register value and return it"""
         return self._read(register, 1)[0]
@@ -481,6 +737,9 @@ class Adafruit_BME680:
             hctrl = _BME68X_DISABLE_HEATER
             run_gas = _BME68X_DISABLE_GAS_MEAS
         self._run_gas = ~(run_gas - 1)
+        self._heater_time = heater_time if enable else 0
+        # CTRL_GAS_1 and CTRL_MEAS are written here, resend them on the next trigger
+        self._shadow_valid = False
 
         ctrl_gas_data_0 = bme_set_bits(ctrl_gas_data_0, _BME68X_HCTRL_MSK, _BME68X_HCTRL_POS, hctrl)
         ctrl_gas_data_1 = bme_set_bits_pos_0(ctrl_gas_data_1, _BME68X_NBCONV_MSK, nb_conv)
@@ -668,6 +927,13 @@ class Adafruit_BME680_I2C(Adafruit_BME680):
             if self._debug:
                 print(f"\t${values[0]:02X} <= {[hex(i) for i in values[1:]]}")
 
+    def _write_pairs(self, pairs: bytearray, count: int) -> None:
+        """Writes ``count`` register/value pairs in one transaction"""
+        with self._i2c as i2c:
+            i2c.write(pairs, end=2 * count)
+            if self._debug:
+                print(f"\t<= {[hex(i) for i in pairs[:2 * count]]}")
+
 
 class Adafruit_BME680_SPI(Adafruit_BME680):
     """Driver for SPI connected BME680.
@@ -765,6 +1031,17 @@ class Adafruit_BME680_SPI(Adafruit_BME680):
             if self._debug:
                 print(f"\t${values[0]:02X} <= {[hex(i) for i in values[1:]]}")
 
+    def _write_pairs(self, pairs: bytearray, count: int) -> None:
+        # All shadowed registers are in memory page 1
+        self._set_spi_mem_page(pairs[0])
+        buffer = bytearray(pairs[: 2 * count])
+        for i in range(0, len(buffer), 2):
+            buffer[i] &= 0x7F  # Write, bit 7 low.
+        with self._spi as spi:
+            spi.write(buffer)
+            if self._debug:
+                print(f"\t<= {[hex(i) for i in buffer]}")
+
     def _set_spi_mem_page(self, register: int) -> None:
         spi_mem_page = 0x00
         if register < 0x80:
@@ -26,6 +26,8 @@ Implementation Notes
   https://github.com/adafruit/circuitpython/releases
 
 """
+from array import array
+
 import adafruit_blinka.agnostic.time as time
 from micropython import const
 
@@ -42,6 +44,8 @@ __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_GPS.git"
 
 
 _GPSI2C_DEFAULT_ADDRESS = const(0x10)
+# Seconds to wait before polling again when the module has no data
+_GPSI2C_IDLE_POLL = 0.01
 
 _GLL = 0
 _RMC = 1
@@ -57,6 +61,43 @@ _VTG = 10
 _ST_MIN = _GLL
 _ST_MAX = _VTG
 
+# Incremental sentence parser: longest sentence kept from '$' to the checksum
+# (NMEA allows 82 bytes including \r\n, PMTK replies can be longer) and most
+# fields in one (GSV with 4 satellites has 20 including the type)
+_NMEA_MAX = const(100)
+_NMEA_FIELDS = const(24)
+_NMEA_IDLE = const(0)
+_NMEA_BODY = const(1)
+_NMEA_SUM_HIGH = const(2)
+_NMEA_SUM_LOW = const(3)
+
+# The three letters of a sentence type as an int, compared without allocating
+_KEY_GLL = const(0x474C4C)
+_KEY_RMC = const(0x524D43)
+_KEY_GGA = const(0x474741)
+_KEY_GSA = const(0x475341)
+_KEY_GSV = const(0x475356)
+_KEY_VTG = const(0x565447)
+# Second letters of the GNSS talkers, see GPS.update
+_GNSS_TALKERS = (0x41, 0x42, 0x49, 0x4C, 0x50, 0x51, 0x4E)
+
+# Sentences in the order of the PMTK314 output fields, their keys, and their
+# typical length in bytes with a fix (GSV usually takes 3 sentences)
+_PMTK314_SENTENCES = ("GLL", "RMC", "VTG", "GGA", "GSA", "GSV")
+_PMTK314_KEYS = (_KEY_GLL, _KEY_RMC, _KEY_VTG, _KEY_GGA, _KEY_GSA, _KEY_GSV)
+_PMTK314_BYTES = (50, 70, 40, 75, 68, 210)
+# PMTK314 has 19 fields, the ones after GSV are proprietary or unused
+_PMTK314_FIELDS = const(19)
+
+# Groups of fields reported as changed by GPS.update_all
+FIELD_TIME = const(0x01)
+FIELD_POSITION = const(0x02)
+FIELD_ALTITUDE = const(0x04)
+FIELD_FIX = const(0x08)
+FIELD_VELOCITY = const(0x10)
+FIELD_SATELLITES = const(0x20)
+FIELD_DOP = const(0x40)
+
 _SENTENCE_PARAMS = (
     # 0 - _GLL
     "dcdcscC",
@@ -328,6 +369,37 @@ class GPS:
         """Message number"""
         self._raw_sentence = None
         self._mode_indicator = None
+        # Received bytes not fed to the parser yet start at _rx_pos
+        self._rx = bytearray()
+        self._rx_pos = 0
+        # Sentence being received and its field start offsets, swapped with
+        # the last complete one so that stays valid until the next
+        self._line = bytearray(_NMEA_MAX)
+        self._line_fields = array("B", bytes(_NMEA_FIELDS + 1))
+        self._sentence = bytearray(_NMEA_MAX)
+        self._fields = array("B", bytes(_NMEA_FIELDS + 1))
+        self._sentence_len = 0
+        self._field_count = 0
+        self._state = _NMEA_IDLE
+        self._length = 0
+        self._line_field_count = 0
+        self._checksum = 0
+        self._expected = 0
+        self.sentences_parsed = 0
+        """Sentences received with a valid checksum"""
+        self.sentences_dropped = 0
+        """Sentences discarded for a bad checksum, invalid characters, or
+        because they were cut off or too long"""
+        self.budget_overruns = 0
+        """Calls of :meth:`update_all` that ran out of time before the data did"""
+        self.sentences_skipped = 0
+        """Sentences of types not selected with :meth:`configure`, not decoded"""
+        self.output_bytes_per_s = None
+        """Estimated NMEA output of the configuration set with :meth:`configure`"""
+        # Keys of the sentence types the parser drops after the type field
+        self._skip_keys = ()
+        # Positions received, a new one is a change even if it is the same
+        self._positions = 0
         self._magnetic_variation = None
         self.debug = debug
         """Toggles debug mode. When True, prints the incoming data sentence to the console"""
@@ -337,22 +409,63 @@ class GPS:
         accordingly.  Returns True if new data was processed, and False if
         nothing new was received.
         """
-        # Grab a sentence and check its data type to call the appropriate
-        # parsing function.
-
-        try:
-            sentence = self._parse_sentence()
-        except UnicodeError:
-            return None
-        if sentence is None:
+        if not self._next_sentence():
             return False
         if self.debug:
-            print(sentence)
-        data_type, args = sentence
-        if len(data_type) < 5:
+            print(self.nmea_sentence)
+        return self._dispatch()
+
+    def update_all(self, budget_ms: int = 20) -> int:
+        """Process every sentence received so far, until none is left or
+        budget_ms have passed, without waiting for the module to send more.
+        Call it at any rate: the values are as current as the last sentence
+        the module sent, instead of one sentence behind per :meth:`update`.
+
+        Returns a bitmask of the ``FIELD_*`` groups whose values changed,
+        ``FIELD_POSITION`` is also set for a new position equal to the last.
+        """
+        deadline = time.monotonic() + budget_ms / 1000
+        before = self._field_values()
+        while True:
+            if time.monotonic() >= deadline:
+                self.budget_overruns += 1
+                break
+            if not self._next_sentence(0):
+                break
+            if self.debug:
+                print(self.nmea_sentence)
+            self._dispatch()
+        after = self._field_values()
+        changed = 0
+        for i, value in enumerate(before):
+            if value != after[i]:
+                changed |= 1 << i
+        return changed
+
+    @property
+    def backlog(self) -> int:
+        """Bytes received but not parsed yet"""
+        return len(self._rx) - self._rx_pos
+
+    def _field_values(self) -> tuple:
+        # In the bit order of the FIELD_* groups
+        return (
+            self.timestamp_utc,
+            (self.latitude, self.longitude, self._positions),
+            self.altitude_m,
+            (self.fix_quality, self.fix_quality_3d),
+            (self.speed_knots, self.track_angle_deg),
+            self.satellites,
+            (self.horizontal_dilution, self.pdop, self.hdop, self.vdop),
+        )
+
+    def _dispatch(self) -> bool:
+        # Process the complete sentence by its data type, GGA and RMC straight
+        # from the bytes, the others through the string parsers
+        line = self._sentence
+        fields = self._fields
+        if self._field_count < 2 or fields[1] - fields[0] - 1 < 5:
             return False
-        data_type = bytes(data_type.upper(), "ascii")
-        (talker, sentence_type) = _parse_talker(data_type)
 
         # Check for all currently known GNSS talkers
         # GA - Galileo
@@ -362,27 +475,33 @@ class GPS:
         # GP - GPS
         # GQ - QZSS
         # GN - GNSS / More than one of the above
-        if talker not in (b"GA", b"GB", b"GI", b"GL", b"GP", b"GQ", b"GN"):
+        if line[1] & 0xDF != 0x47 or (line[2] & 0xDF) not in _GNSS_TALKERS:
             # It's not a known GNSS source of data
             # Assume it's a valid packet anyway
             return True
+        if fields[1] - fields[0] - 1 != 5:
+            return True
+        key = ((line[3] & 0xDF) << 16) | ((line[4] & 0xDF) << 8) | (line[5] & 0xDF)
 
-        result = True
+        if key == _KEY_GGA:  # 3D location fix
+            return self._update_gga()
+        if key == _KEY_RMC:  # Minimum location info
+            return self._update_rmc()
+        if key not in (_KEY_GLL, _KEY_GSV, _KEY_GSA, _KEY_VTG):
+            return True
+        try:
+            data_type, args = self._parse_sentence()
+        except UnicodeError:
+            return False
+        talker = bytes(data_type[:2].upper(), "ascii")
         args = args.split(",")
-        if sentence_type == b"GLL":  # Geographic position - Latitude/Longitude
-            result = self._parse_gll(args)
-        elif sentence_type == b"RMC":  # Minimum location info
-            result = self._parse_rmc(args)
-        elif sentence_type == b"GGA":  # 3D location fix
-            result = self._parse_gga(args)
-        elif sentence_type == b"GSV":  # Satellites in view
-            result = self._parse_gsv(talker, args)
-        elif sentence_type == b"GSA":  # GPS DOP and active satellites
-            result = self._parse_gsa(talker, args)
-        elif sentence_type == b"VTG":  # Ground speed
-            result = self._parse_vtg(args)
-
-        return result
+        if key == _KEY_GLL:  # Geographic position - Latitude/Longitude
+            return self._parse_gll(args)
+        if key == _KEY_GSV:  # Satellites in view
+            return self._parse_gsv(talker, args)
+        if key == _KEY_GSA:  # GPS DOP and active satellites
+            return self._parse_gsa(talker, args)
+        return self._parse_vtg(args)  # Ground speed
 
     def send_command(self, command: bytes, add_checksum: bool = True) -> None:
         """Send a command string to the GPS.  If add_checksum is True (the
@@ -390,15 +509,69 @@ class GPS:
         Note you should NOT add the leading $ and trailing * to the command
         as they will automatically be added!
         """
-        self.write(b"$")
-        self.write(command)
+        # One write, on I2C every write is a bus transaction
+        buffer = bytearray(b"$")
+        buffer.extend(command)
         if add_checksum:
             checksum = 0
             for char in command:
                 checksum ^= char
-            self.write(b"*")
-            self.write(bytes("{:02x}".format(checksum).upper(), "ascii"))
-        self.write(b"\r\n")
+            buffer.extend(b"*")
+            buffer.extend(bytes("{:02x}".format(checksum).upper(), "ascii"))
+        buffer.extend(b"\r\n")
+        self.write(buffer)
+
+    def configure(
+        self,
+        sentences: Tuple[str, ...] = ("GGA", "RMC"),
+        rate_hz: float = 1,
+        baudrate: Optional[int] = None,
+    ) -> None:
+        """Configure the module output: the NMEA sentences it sends out of
+        GLL, RMC, VTG, GGA, GSA and GSV (PMTK314), its fix rate from 0.1 to
+        10 Hz (PMTK220) and, for UART modules, the baudrate (PMTK251).
+
+        Sentences that are not selected are skipped by the parser without
+        being decoded, including the ones still buffered. Raises ValueError
+        for an unknown sentence, a rate out of range, or a baudrate (given or
+        the UART's current one) too slow for the estimated output
+        (:attr:`output_bytes_per_s`).
+        """
+        for name in sentences:
+            if name not in _PMTK314_SENTENCES:
+                raise ValueError(f"Unknown sentence {name}")
+        if not 0.1 <= rate_hz <= 10:
+            raise ValueError("Fix rate must be 0.1 to 10 Hz")
+        output = 0
+        fields = []
+        skip = []
+        for i, name in enumerate(_PMTK314_SENTENCES):
+            if name in sentences:
+                output += _PMTK314_BYTES[i]
+                fields.append("1")
+            else:
+                skip.append(_PMTK314_KEYS[i])
+                fields.append("0")
+        fields.extend("0" * (_PMTK314_FIELDS - len(fields)))
+        output = int(output * rate_hz)
+
+        if baudrate is not None:
+            if self._uart is None:
+                raise ValueError("The baudrate only applies to UART modules")
+            # 10 bits per byte on the wire, 8N1
+            if output * 10 > baudrate:
+                raise ValueError(f"{baudrate} baud is too slow for {output} bytes/s")
+            self.send_command(bytes(f"PMTK251,{baudrate}", "ascii"))
+            time.sleep(0.1)
+            self._uart.baudrate = baudrate
+        elif self._uart is not None and hasattr(self._uart, "baudrate"):
+            if output * 10 > self._uart.baudrate:
+                raise ValueError(f"{self._uart.baudrate} baud is too slow for {output} bytes/s")
+
+        self.send_command(bytes("PMTK314," + ",".join(fields), "ascii"))
+        self.send_command(bytes(f"PMTK220,{int(1000 / rate_hz)}", "ascii"))
+        self._skip_keys = tuple(skip)
+        self.output_bytes_per_s = output
 
     @property
     def has_fix(self) -> bool:
@@ -420,6 +593,8 @@ class GPS:
     @property
     def nmea_sentence(self) -> Optional[str]:
         """Return raw_sentence which is the raw NMEA sentence read from the GPS"""
+        if self._raw_sentence is None and self._sentence_len:
+            self._raw_sentence = str(self._sentence[: self._sentence_len], "ascii")
         return self._raw_sentence
 
     def read(self, num_bytes: Optional[int]) -> Optional[bytes]:
@@ -442,55 +617,310 @@ class GPS:
         the underlying UART or this will block forever!"""
         return self._uart.readline()
 
-    def _read_sentence(self) -> Optional[str]:
-        # Parse any NMEA sentence that is available.
-        # pylint: disable=len-as-condition
-        # This needs to be refactored when it can be tested.
+    def _receive(self, deadline: Optional[float] = None) -> int:
+        """Append the bytes the UART has buffered to the receive buffer,
+        returns how many. Never waits, the UART timeout applies to reads"""
+        waiting = self.in_waiting
+        if not waiting:
+            return 0
+        data = self._uart.read(waiting)
+        if not data:
+            return 0
+        self._rx.extend(data)
+        return len(data)
+
+    def _next_sentence(self, deadline: Optional[float] = None) -> bool:
+        """Feed received bytes to the parser until a sentence with a valid
+        checksum is complete, False when the received data runs out first.
+        Waiting for more data ends at the time.monotonic() deadline, after
+        the timeout by default"""
+        rx = self._rx
+        while True:
+            if self._rx_pos < len(rx):
+                self._rx_pos = self._feed(rx, self._rx_pos, len(rx))
+                done = self._state == _NMEA_IDLE and self._length < 0
+                if self._rx_pos >= len(rx):
+                    del rx[:]
+                    self._rx_pos = 0
+                if done:
+                    self._length = 0
+                    self.sentences_parsed += 1
+                    return True
+            elif not self._receive(deadline):
+                return False
+
+    def _feed(self, data: ReadableBuffer, start: int, end: int) -> int:
+        """Run the parser over data[start:end], stop after a sentence with a
+        valid checksum and return the index of the next byte"""
+        # pylint: disable=too-many-branches
+        line = self._line
+        fields = self._line_fields
+        state = self._state
+        n = self._length
+        count = self._line_field_count
+        checksum = self._checksum
+        i = start
+        while i < end:
+            char = data[i]
+            i += 1
+            if char == 0x24:  # '$' starts a sentence, also after garbage
+                if state != _NMEA_IDLE:
+                    self.sentences_dropped += 1
+                line[0] = char
+                n = 1
+                fields[0] = 1
+                count = 1
+                checksum = 0
+                state = _NMEA_BODY
+            elif state == _NMEA_BODY:
+                if char == 0x2A:  # '*', the checksum follows
+                    fields[count] = n + 1
+                    state = _NMEA_SUM_HIGH
+                elif char < 0x20 or char > 0x7E or n >= _NMEA_MAX - 3:
+                    self.sentences_dropped += 1
+                    state = _NMEA_IDLE
+                    continue
+                else:
+                    checksum ^= char
+                    if char == 0x2C:  # ','
+                        if (
+                            count == 1
+                            and n == 6
+                            and line[1] & 0xDF == 0x47
+                            and ((line[3] & 0xDF) << 16 | (line[4] & 0xDF) << 8 | (line[5] & 0xDF))
+                            in self._skip_keys
+                        ):
+                            # A sentence type that is not configured
+                            self.sentences_skipped += 1
+                            state = _NMEA_IDLE
+                            continue
+                        if count == _NMEA_FIELDS:
+                            self.sentences_dropped += 1
+                            state = _NMEA_IDLE
+                            continue
+                        fields[count] = n + 1
+                        count += 1
+                line[n] = char
+                n += 1
+            elif state != _NMEA_IDLE:
+                if 0x30 <= char <= 0x39:
+                    digit = char - 0x30
+                elif 0x41 <= char & 0xDF <= 0x46:
+                    digit = (char & 0xDF) - 0x37
+                else:
+                    self.sentences_dropped += 1
+                    state = _NMEA_IDLE
+                    continue
+                line[n] = char
+                n += 1
+                if state == _NMEA_SUM_HIGH:
+                    self._expected = digit << 4
+                    state = _NMEA_SUM_LOW
+                    continue
+                state = _NMEA_IDLE
+                if self._expected | digit != checksum:
+                    self.sentences_dropped += 1
+                    continue  # Failed to validate checksum.
+                # Complete, it becomes the current sentence
+                self._line, self._sentence = self._sentence, line
+                self._line_fields, self._fields = self._fields, fields
+                self._sentence_len = n
+                self._field_count = count
+                self._raw_sentence = None
+                n = -1
+                break
+        self._state = state
+        self._length = n
+        self._line_field_count = count
+        self._checksum = checksum
+        return i
 
-        # Only continue if we have at least 11 bytes in the input buffer
-        if self.in_waiting < 11:
+    def _parse_sentence(self) -> Optional[Tuple[str, str]]:
+        # The type of the current sentence (first string after $ up to comma)
+        # and the rest as data within the sentence, without the checksum.
+        if not self._sentence_len:
             return None
-
-        sentence = self.readline()
-        if sentence is None or sentence == b"" or len(sentence) < 1:
+        line = self._sentence
+        delimiter = self._fields[1] - 1
+        data_type = str(line[1:delimiter], "ascii")
+        return (data_type, str(line[delimiter + 1 : self._sentence_len - 3], "ascii"))
+
+    # Field access on the current sentence. Field 0 is the data type, the
+    # numeric ones parse the digits in place and raise ValueError like
+    # int()/float() would.
+
+    def _field_len(self, index: int) -> int:
+        return self._fields[index + 1] - self._fields[index] - 1
+
+    def _field_char(self, index: int) -> Optional[str]:
+        # A single character, None if empty, ValueError otherwise
+        length = self._field_len(index)
+        if length == 0:
             return None
-        try:
-            sentence = str(sentence, "ascii").strip()
-        except UnicodeError:
+        if length != 1:
+            raise ValueError("Expected one character")
+        return chr(self._sentence[self._fields[index]])
+
+    def _field_digits(self, start: int, end: int) -> int:
+        line = self._sentence
+        value = 0
+        for i in range(start, end):
+            digit = line[i] - 0x30
+            if not 0 <= digit <= 9:
+                raise ValueError("Expected a digit")
+            value = value * 10 + digit
+        return value
+
+    def _field_int(self, index: int) -> Optional[int]:
+        start = self._fields[index]
+        end = self._fields[index + 1] - 1
+        if start == end:
             return None
-        # Look for a checksum and validate it if present.
-        if len(sentence) > 7 and sentence[-3] == "*":
-            # Get included checksum, then calculate it and compare.
-            expected = int(sentence[-2:], 16)
-            actual = 0
-            for i in range(1, len(sentence) - 3):
-                actual ^= ord(sentence[i])
-            if actual != expected:
-                return None  # Failed to validate checksum.
-
-            # copy the raw sentence
-            self._raw_sentence = sentence
-
-            return sentence
-        # At this point we don't have a valid sentence
-        return None
+        if self._sentence[start] == 0x2D:  # '-'
+            return -self._field_digits(start + 1, end)
+        return self._field_digits(start, end)
+
+    def _field_float(self, index: int) -> Optional[float]:
+        line = self._sentence
+        start = self._fields[index]
+        end = self._fields[index + 1] - 1
+        if start == end:
+            return None
+        sign = 1
+        if line[start] == 0x2D:  # '-'
+            sign = -1
+            start += 1
+        point = start
+        while point < end and line[point] != 0x2E:  # '.'
+            point += 1
+        if point == end:
+            return float(sign * self._field_digits(start, end))
+        whole = self._field_digits(start, point)
+        places = end - point - 1
+        # One division of the exact digits rounds like float() does
+        return sign * (whole * 10**places + self._field_digits(point + 1, end)) / 10**places
+
+    def _field_degrees(self, index: int, neg: int) -> Tuple[float, int, float]:
+        # A 'dddmm.mmmm' field and its hemisphere field as degrees, degrees
+        # component and minutes component, see _parse_degrees and _read_deg_mins
+        line = self._sentence
+        start = self._fields[index]
+        end = self._fields[index + 1] - 1
+        if end - start < 3 or self._field_len(index + 1) != 1:
+            raise ValueError("Expected degrees")
+        point = start
+        while point < end and line[point] != 0x2E:  # '.'
+            point += 1
+        whole = self._field_digits(start, point)
+        places = max(0, end - point - 1)
+        decimals = self._field_digits(point + 1, end) if places else 0
+        # Same precision handling as _parse_degrees: 4 decimal places of minutes
+        if places >= 4:
+            short = decimals // 10 ** (places - 4)
+        else:
+            short = decimals * 10 ** (4 - places)
+        minutes = int(((whole % 100) + short / 10000) * 1000000 / 60)
+        degrees = (whole // 100 * 1000000 + minutes) / 1000000
+        deg = whole // 100
+        minutes_full = (whole % 100 * 10**places + decimals) / 10**places
+        if line[self._fields[index + 1]] | 0x20 == neg:
+            degrees *= -1.0
+            deg *= -1
+        return degrees, deg, minutes_full
+
+    def _field_timestamp(self, time_index: int, date_index: int = -1) -> None:
+        # hhmmss(.sss) and ddmmyy fields, see _update_timestamp_utc
+        start = self._fields[time_index]
+        if self._field_len(time_index) < 6:
+            raise ValueError("Expected a time")
+        hours = self._field_digits(start, start + 2)
+        mins = self._field_digits(start + 2, start + 4)
+        secs = self._field_digits(start + 4, start + 6)
+        if date_index < 0 or self._field_len(date_index) < 6:
+            if self.timestamp_utc is None:
+                day, month, year = 0, 0, 0
+            else:
+                day = self.timestamp_utc.tm_mday
+                month = self.timestamp_utc.tm_mon
+                year = self.timestamp_utc.tm_year
+        else:
+            start = self._fields[date_index]
+            day = self._field_digits(start, start + 2)
+            month = self._field_digits(start + 2, start + 4)
+            year = 2000 + self._field_digits(start + 4, start + 6)
 
-    def _parse_sentence(self) -> Optional[Tuple[str, str]]:
-        sentence = self._read_sentence()
+        self.timestamp_utc = time.struct_time(
+            (year, month, day, hours, mins, secs, 0, 0, -1)
+        )
 
-        # sentence is a valid NMEA with a valid checksum
-        if sentence is None:
-            return None
+    def _update_gga(self) -> bool:
+        # GGA - Global Positioning System Fix Data, the fields _parse_gga uses
+
+        if self._field_count != 15:
+            return False  # Unexpected number of params.
+        try:
+            latitude = self._field_degrees(2, 0x73)  # 's'
+            longitude = self._field_degrees(4, 0x77)  # 'w'
+            fix_quality = self._field_int(6)
+            satellites = self._field_int(7)
+            horizontal_dilution = self._field_float(8)
+            altitude_m = self._field_float(9)
+            height_geoid = self._field_float(11)
+            self._field_timestamp(1)
+        except ValueError:
+            self.fix_quality = 0
+            return False  # Params didn't parse
+
+        self.latitude, self.latitude_degrees, self.latitude_minutes = latitude
+        self.longitude, self.longitude_degrees, self.longitude_minutes = longitude
+        self._positions += 1
+        self.fix_quality = fix_quality
+        self.satellites = satellites
+        self.horizontal_dilution = horizontal_dilution
+        self.altitude_m = altitude_m
+        self.height_geoid = height_geoid
+        return True
 
-        # Remove checksum once validated.
-        sentence = sentence[:-3]
-        # Parse out the type of sentence (first string after $ up to comma)
-        # and then grab the rest as data within the sentence.
-        delimiter = sentence.find(",")
-        if delimiter == -1:
-            return None  # Invalid sentence, no comma after data type.
-        data_type = sentence[1:delimiter]
-        return (data_type, sentence[delimiter + 1 :])
+    def _update_rmc(self) -> bool:
+        # RMC - Recommended Minimum Navigation Information, as _parse_rmc
+
+        if self._field_count not in (13, 14):
+            return False  # Unexpected number of params.
+        try:
+            if self._field_len(1) == 0 or self._field_len(2) != 1:
+                raise ValueError("Missing field")
+            latitude = self._field_degrees(3, 0x73)  # 's'
+            longitude = self._field_degrees(5, 0x77)  # 'w'
+            speed_knots = self._field_float(7)
+            track_angle_deg = self._field_float(8)
+            if self._field_len(10) >= 3 and self._field_len(11) == 1:
+                magnetic_variation = self._field_degrees(10, 0x77)[0]  # 'w'
+            else:
+                magnetic_variation = None
+                self._field_char(11)
+            mode_indicator = self._field_char(12)
+            if self._field_count == 14:
+                self._field_char(13)
+            self._field_timestamp(1, 9)
+        except ValueError:
+            self.fix_quality = 0
+            return False  # Params didn't parse
+
+        # Status Valid(A) or Invalid(V)
+        self.isactivedata = self._field_char(2)
+        if self.isactivedata in ("A", "a"):
+            if self.fix_quality == 0:
+                self.fix_quality = 1
+        else:
+            self.fix_quality = 0
+        self.latitude, self.latitude_degrees, self.latitude_minutes = latitude
+        self.longitude, self.longitude_degrees, self.longitude_minutes = longitude
+        self._positions += 1
+        self.speed_knots = speed_knots
+        self.track_angle_deg = track_angle_deg
+        self._magnetic_variation = magnetic_variation
+        self._mode_indicator = mode_indicator
+        return True
 
     def _update_timestamp_utc(self, time_utc: str, date: Optional[str] = None) -> None:
         hours = int(time_utc[0:2])
@@ -562,6 +992,7 @@ class GPS:
 
         # Status Valid(A) or Invalid(V)
         self.isactivedata = parsed_data[5]
+        self._positions += 1
 
         # Parse FAA mode indicator
         self._mode_indicator = parsed_data[6]
@@ -788,6 +1219,7 @@ class GPS_GtopI2C(GPS):
         address: int = _GPSI2C_DEFAULT_ADDRESS,
         debug: bool = False,
         timeout: float = 5.0,
+        chunk_size: int = 32,
     ) -> None:
         from adafruit_bus_device import (  # pylint: disable=import-outside-toplevel
             i2c_device,
@@ -796,25 +1228,53 @@ class GPS_GtopI2C(GPS):
         super().__init__(None, debug)  # init the parent with no UART
         self._i2c = i2c_device.I2CDevice(i2c_bus, address)
         self._lastbyte = None
-        self._charbuff = bytearray(1)
-        self._internalbuffer = []
+        # Each bus transaction reads up to chunk_size bytes into this buffer
+        self._chunk = bytearray(chunk_size)
+        self._chunk_mv = memoryview(self._chunk)
+        # A chunk of these means the module has nothing buffered
+        self._padding = b"\n" * chunk_size
+        self._has_data = True
         self._timeout = timeout
 
+    def _read_chunk(self, num_bytes: int, out: bytearray) -> int:
+        """Read up to num_bytes in one bus transaction and append them to out,
+        without the 'stuffed' newlines the module pads with when it has no data.
+        Returns the number of bytes appended"""
+        num_bytes = min(num_bytes, len(self._chunk))
+        with self._i2c as i2c:
+            i2c.readinto(self._chunk, end=num_bytes)
+        last = self._lastbyte
+        if last != 0x0D and num_bytes == len(self._chunk) and self._chunk == self._padding:
+            return 0
+        # Only a newline ending a \r\n is data, copy the runs between the others
+        data = bytes(self._chunk_mv[:num_bytes])
+        mv = self._chunk_mv
+        appended = 0
+        start = 0
+        while start < num_bytes:
+            i = data.find(b"\n", start)
+            if i < 0:
+                end = skip = num_bytes
+            else:
+                skip = i + 1
+                prev = data[i - 1] if i > start else last
+                end = skip if prev == 0x0D else i
+            if end > start:
+                out.extend(mv[start:end])
+                appended += end - start
+                last = data[end - 1]
+            start = skip
+        self._lastbyte = last  # keep track of the last character approved
+        return appended
+
     def read(self, num_bytes: int = 1) -> bytearray:
         """Read up to num_bytes of data from the GPS directly, without parsing.
         Returns a bytearray with up to num_bytes or None if nothing was read"""
-        result = []
-        for _ in range(num_bytes):
-            with self._i2c as i2c:
-                # we read one byte at a time, verify it isnt part of a string of
-                # 'stuffed' newlines and then append to our result array for byteification
-                i2c.readinto(self._charbuff)
-                char = self._charbuff[0]
-                if (char == 0x0A) and (self._lastbyte != 0x0D):
-                    continue  # skip duplicate \n's!
-                result.append(char)
-                self._lastbyte = char  # keep track of the last character approved
-        return bytearray(result)
+        result = bytearray()
+        while len(result) < num_bytes:
+            if not self._read_chunk(num_bytes - len(result), result):
+                break
+        return result
 
     def write(self, bytestr: ReadableBuffer) -> None:
         """Write a bytestring data to the GPS directly, without parsing
@@ -831,18 +1291,31 @@ class GPS_GtopI2C(GPS):
     def readline(self) -> Optional[bytearray]:
         """Returns a newline terminated bytearray, must have timeout set for
         the underlying UART or this will block forever!"""
-        timeout = time.monotonic() + self._timeout
-        while timeout > time.monotonic():
+        buffer = self._rx
+        scanned = self._rx_pos
+        while True:
             # check if our internal buffer has a '\n' termination already
-            if self._internalbuffer and (self._internalbuffer[-1] == 0x0A):
-                break
-            char = self.read(1)
-            if not char:
-                continue
-            self._internalbuffer.append(char[0])
-            # print(bytearray(self._internalbuffer))
-        if self._internalbuffer and self._internalbuffer[-1] == 0x0A:
-            ret = bytearray(self._internalbuffer)
-            self._internalbuffer = []  # reset the buffer to empty
-            return ret
-        return None  # no completed data yet
+            i = bytes(buffer[scanned:]).find(b"\n") if len(buffer) > scanned else -1
+            if i >= 0:
+                i += scanned + 1
+                ret = buffer[self._rx_pos : i]
+                del buffer[:i]
+                self._rx_pos = 0
+                return ret
+            scanned = len(buffer)
+            if not self._receive():
+                return None  # no completed data yet
+
+    def _receive(self, deadline: Optional[float] = None) -> int:
+        """Read the next data from the module into the receive buffer, waiting
+        until the deadline (after the timeout by default) for it to have some.
+        Returns the number of bytes"""
+        timeout = time.monotonic() + self._timeout if deadline is None else deadline
+        while True:
+            # while the module is empty poll a single byte, then read in chunks
+            received = self._read_chunk(len(self._chunk) if self._has_data else 1, self._rx)
+            self._has_data = received > 0
+            if received or timeout <= time.monotonic():
+                return received
+            # nothing buffered in the module, don't keep the shared bus busy
+            time.sleep(_GPSI2C_IDLE_POLL)
@@ -35,6 +35,7 @@ from micropython import const
 # pylint: enable=import-error
 
 _WIA = const(0x00)
+_ST1 = const(0x02)
 _HXL = const(0x03)
 _HXH = const(0x04)
 _HYL = const(0x05)
@@ -47,6 +48,13 @@ _ASAX = const(0x10)
 _ASAY = const(0x11)
 _ASAZ = const(0x12)
 
+_ST1_DRDY = const(0b00000001)
+_ST1_DOR = const(0b00000010)
+_ST2_HOFL = const(0b00001000)
+# ST1, HXL..HZH, ST2
+_BURST_FORMAT = "<B3hB"
+_BURST_SIZE = const(8)
+
 _MODE_POWER_DOWN = 0b00000000
 MODE_SINGLE_MEASURE = 0b00000001
 MODE_CONTINOUS_MEASURE_1 = 0b00000010 # 8Hz
@@ -72,6 +80,9 @@ class AK8963:
         self.address = address
         self._offset = offset
         self._scale = scale
+        self._burst = bytearray(_BURST_SIZE)
+        self.overruns = 0
+        self.overflows = 0
 
         if 0x48 != self.whoami:
             raise RuntimeError("AK8963 not found in I2C bus.")
@@ -91,43 +102,66 @@ class AK8963:
         )
 
         # Power on
+        self._output = output
         self._register_char(_CNTL1, (mode | output))
 
         if output is OUTPUT_16_BIT:
             self._so = _SO_16BIT
         else:
             self._so = _SO_14BIT
+        self._update_gain()
 
     @property
     def magnetic(self):
         """
         X, Y, Z axis micro-Tesla (uT) as floats.
         """
-        xyz = list(self._register_three_shorts(_HXL))
+        x, y, z = self._register_three_shorts(_HXL)
         self._register_char(_ST2) # Enable updating readings again
 
-        # Apply factory axial sensitivy adjustements
-        xyz[0] *= self._adjustement[0]
-        xyz[1] *= self._adjustement[1]
-        xyz[2] *= self._adjustement[2]
-
-        # Apply output scale determined in constructor
-        so = self._so
-        xyz[0] *= so
-        xyz[1] *= so
-        xyz[2] *= so
-
-        # Apply hard iron ie. offset bias from calibration
-        xyz[0] -= self._offset[0]
-        xyz[1] -= self._offset[1]
-        xyz[2] -= self._offset[2]
+        gx, gy, gz = self._gain
+        bx, by, bz = self._bias
+        return (x * gx - bx, y * gy - by, z * gz - bz)
 
-        # Apply soft iron ie. scale bias from calibration
-        xyz[0] *= self._scale[0]
-        xyz[1] *= self._scale[1]
-        xyz[2] *= self._scale[2]
+    def start_continuous(self, mode=MODE_CONTINOUS_MEASURE_2):
+        """
+        Measure continuously, at 100 Hz by default (mode 2) or 8 Hz
+        (`MODE_CONTINOUS_MEASURE_1`), for reading with `read_magnetic`.
+        """
+        self._register_char(_CNTL1, _MODE_POWER_DOWN)
+        # Should wait atleast 100us before next mode
+        utime.sleep_us(100)
+        self._register_char(_CNTL1, (mode | self._output))
 
-        return tuple(xyz)
+    def read_magnetic(self, out=None):
+        """
+        The latest measurement in micro-Tesla (uT) if there is a new one,
+        else None. ST1, the data and ST2 are read in one 8 byte transaction.
+        Fills `out` (a list or array("f") of 3, a new list by default) with
+        X, Y, Z and returns it.
+
+        `overruns` counts measurements that were replaced before they were
+        read (ST1 DOR), `overflows` the ones dropped because the magnetic
+        field exceeded the range (ST2 HOFL).
+        """
+        buf = self._burst
+        self.i2c.readfrom_mem_into(self.address, _ST1, buf)
+        st1, x, y, z, st2 = ustruct.unpack(_BURST_FORMAT, buf)
+        if not st1 & _ST1_DRDY:
+            return None
+        if st1 & _ST1_DOR:
+            self.overruns += 1
+        if st2 & _ST2_HOFL:
+            self.overflows += 1
+            return None
+        if out is None:
+            out = [0.0] * 3
+        gain = self._gain
+        bias = self._bias
+        out[0] = x * gain[0] - bias[0]
+        out[1] = y * gain[1] - bias[1]
+        out[2] = z * gain[2] - bias[2]
+        return out
 
     @property
     def adjustement(self):
@@ -141,6 +175,7 @@ class AK8963:
     def calibrate(self, count=256, delay=200):
         self._offset = (0, 0, 0)
         self._scale = (1, 1, 1)
+        self._update_gain()
 
         reading = self.magnetic
         minx = maxx = reading[0]
@@ -178,9 +213,19 @@ class AK8963:
         scale_z = avg_delta / avg_delta_z
 
         self._scale = (scale_x, scale_y, scale_z)
+        self._update_gain()
 
         return self._offset, self._scale
 
+    def _update_gain(self):
+        # (raw * adjustement * so - offset) * scale as raw * gain - bias
+        adj = self._adjustement
+        so = self._so
+        offset = self._offset
+        scale = self._scale
+        self._gain = tuple(adj[i] * so * scale[i] for i in range(3))
+        self._bias = tuple(offset[i] * scale[i] for i in range(3))
+
     def _register_short(self, register, value=None, buf=bytearray(2)):
         if value is None:
             self.i2c.readfrom_mem_into(self.address, register, buf)
@@ -0,0 +1,120 @@
+"""
+GTop I2C GPS read benchmark.
+
+Runs ``adafruit_gps.GPS_GtopI2C`` against the simulated GTop module (see
+``sim``) with several read chunk sizes, one after the other on the same
+virtual clock, and prints one JSON object with, per chunk size:
+
+* ``sentences_per_s``: NMEA sentences that passed the checksum
+* ``transactions_per_sentence``: I2C transactions on the shared bus that
+  returned data
+* ``bus_ms_per_sentence``: time the bus was busy with them (address and data
+  bytes at the bus frequency, the same model the simulator charges)
+* ``idle_polls_per_s`` and ``idle_bus_ms_per_s``: reads that only returned
+  the module's newline padding while ``readline`` waited for data
+* ``update_ms``: virtual time of the ``update`` calls (p50/max), including the
+  time ``readline`` waits for the module's next fix
+
+Chunk size 1 is one transaction per byte, like the driver did before chunked
+reads. ``--sentences`` configures the module output first (``GPS.configure``),
+by default it sends what a GTop module sends after power up::
+
+    python benchmarks/gps_i2c.py --duration 30 --chunk 1 --chunk 32 --chunk 255
+    python benchmarks/gps_i2c.py --sentences GGA,RMC --rate 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": 0, "max": 0}
+    values = sorted(values)
+    return {"p50": values[len(values) // 2], "max": values[-1]}
+
+
+def run(duration: float, chunks: list, cpu_scale: float, root: str, sentences: tuple = None, rate_hz: float = 1) -> dict:
+    simulator = sim.install(root, cpu_scale)
+    clock = simulator.clock
+    module = simulator.gps
+    usage = {"data": 0, "data_us": 0.0, "idle": 0, "idle_us": 0.0}
+    read = module.read
+
+    def timed_read(n: int) -> bytes:
+        data = read(n)
+        kind = "idle" if data == b"\n" * n else "data"
+        usage[kind] += 1
+        usage[kind + "_us"] += (n + 1) * 9e6 / i2c.freq
+        return data
+
+    module.read = timed_read
+
+    import board
+    import busio
+    import time
+    import adafruit_gps
+
+    i2c = busio.I2C(scl=board.GP21, sda=board.GP20)
+    results = {}
+    for chunk in chunks:
+        gps = adafruit_gps.GPS_GtopI2C(i2c, chunk_size=chunk)
+        if sentences:
+            gps.configure(sentences, rate_hz)
+        before = dict(usage)
+        start = clock.now_us()
+        end = start + duration * 1e6
+        received = 0
+        update_ms = []
+        while clock.now_us() < end:
+            t0 = time.ticks_us()
+            previous = gps.nmea_sentence
+            gps.update()
+            update_ms.append(time.ticks_diff(time.ticks_us(), t0) / 1000)
+            if gps.nmea_sentence is not previous:
+                received += 1
+        elapsed = (clock.now_us() - start) / 1e6
+        used = {k: usage[k] - before[k] for k in usage}
+        n = max(1, received)
+        results[str(chunk)] = {
+            "sentences": received,
+            "sentences_per_s": round(received / elapsed, 3),
+            "transactions_per_sentence": round(used["data"] / n, 1),
+            "bus_ms_per_sentence": round(used["data_us"] / n / 1000, 3),
+            "idle_polls_per_s": round(used["idle"] / elapsed, 1),
+            "idle_bus_ms_per_s": round(used["idle_us"] / elapsed / 1000, 3),
+            "update_ms": {k: round(v, 3) for k, v in percentiles(update_ms).items()},
+            "skipped": gps.sentences_skipped,
+            "has_fix": gps.has_fix,
+        }
+    return {"duration_s": duration, "cpu_scale": cpu_scale, "frequency": i2c.freq, "configured": list(sentences) if sentences else None, "rate_hz": rate_hz, "chunks": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GTop I2C GPS read benchmark (host simulator).")
+    parser.add_argument("--duration", type=float, default=20, help="virtual seconds per chunk size")
+    parser.add_argument("--chunk", type=int, action="append", default=[], help="read chunk size in bytes, repeatable (default 1, 32, 64, 255)")
+    parser.add_argument("--sentences", default=None, help="configure the module to send only these, e.g. GGA,RMC")
+    parser.add_argument("--rate", type=float, default=1, help="fix rate in Hz with --sentences")
+    parser.add_argument("--cpu-scale", type=float, default=20.0, help="Pico time per host second of computation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sentences = tuple(args.sentences.split(",")) if args.sentences else None
+        result = run(args.duration, args.chunk or [1, 32, 64, 255], args.cpu_scale, tmp, sentences, args.rate)
+    print(json.dumps(result, indent=2))
+    sys.stdout.flush()
+    # Simulated threads stay parked on the clock, see sim/__main__.py
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
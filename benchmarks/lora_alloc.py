@@ -0,0 +1,105 @@
+"""
+Heap allocations per LoRa packet.
+
+Loads a 251 byte packet into the RFM95 FIFO the way ulora did before (payload
+turned into lists and joined into a new bytearray) and the way it does now
+(address byte + payload buffer in one chip select window), and reports the
+bytes allocated per packet with the garbage collector disabled. The radio stays
+in standby, nothing is transmitted.
+
+Register access is also run with the heap locked, any allocation there raises
+a MemoryError.
+
+    mpremote cp ulora.py : + run benchmarks/lora_alloc.py
+"""
+
+import gc
+import micropython
+from time import ticks_ms, ticks_diff
+
+from ulora import LoRa, REG_00_FIFO, REG_01_OP_MODE, REG_0D_FIFO_ADDR_PTR, REG_22_PAYLOAD_LENGTH
+
+RFM95_RST = 4
+RFM95_SPIBUS = (0, 2, 3, 0)
+RFM95_CS = 1
+RFM95_INT = 6
+CLIENT_ADDRESS = 42
+SERVER_ADDRESS = 2
+
+PACKETS = 200
+PACKET_SIZE = 251
+
+
+def legacy_write(lora, register, payload):
+    # ulora._spi_write before the allocation free rewrite
+    if type(payload) == int:
+        payload = [payload]
+    elif type(payload) == bytes:
+        payload = [p for p in payload]
+    elif type(payload) == str:
+        payload = [ord(s) for s in payload]
+    lora.cs.value(0)
+    lora.spi.write(bytearray([register | 0x80] + payload))
+    lora.cs.value(1)
+
+
+def legacy_packet(lora, data):
+    header = [SERVER_ADDRESS, CLIENT_ADDRESS, 1, 0]
+    payload = header + [p for p in data]
+    legacy_write(lora, REG_0D_FIFO_ADDR_PTR, 0)
+    legacy_write(lora, REG_00_FIFO, payload)
+    legacy_write(lora, REG_22_PAYLOAD_LENGTH, len(payload))
+
+
+def queued_packet(lora, packet):
+    lora._spi_write(REG_0D_FIFO_ADDR_PTR, 0)
+    lora._spi_write(REG_00_FIFO, packet)
+    lora._spi_write(REG_22_PAYLOAD_LENGTH, len(packet))
+
+
+def send_packet(lora, data):
+    lora._hdr_buf[2] = 1
+    lora._spi_write(REG_0D_FIFO_ADDR_PTR, 0)
+    lora._spi_write_fifo(lora._hdr_buf, data)
+    lora._spi_write(REG_22_PAYLOAD_LENGTH, 4 + len(data))
+
+
+def measure(name, fn, *args):
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc()
+    t = ticks_ms()
+    for _ in range(PACKETS):
+        fn(*args)
+    dt = ticks_diff(ticks_ms(), t)
+    allocated = gc.mem_alloc() - before
+    gc.enable()
+    print(f"{name:>8}: {allocated / PACKETS:8.1f} bytes/packet {dt * 1000 / PACKETS:8.1f} us/packet")
+
+
+def heap_locked(lora):
+    micropython.heap_lock()
+    try:
+        for _ in range(PACKETS):
+            lora._spi_write(REG_0D_FIFO_ADDR_PTR, 0)
+            lora._spi_read(REG_01_OP_MODE)
+            lora._spi_read_into(REG_00_FIFO, lora._rx_mv)
+        return True
+    except MemoryError:
+        return False
+    finally:
+        micropython.heap_unlock()
+
+
+lora = LoRa(RFM95_SPIBUS, RFM95_INT, CLIENT_ADDRESS, RFM95_CS, reset_pin=RFM95_RST)
+lora.set_mode_idle()
+
+data = bytes(range(PACKET_SIZE - 4))
+packet = lora._tx_mvs[0][:PACKET_SIZE]
+packet[4:] = data
+
+measure("legacy", legacy_packet, lora, data)
+measure("queued", queued_packet, lora, packet)
+measure("send", send_packet, lora, memoryview(data))
+print("register access without allocation:", heap_locked(lora))
+lora.close()
@@ -0,0 +1,132 @@
+"""
+MPU6500 FIFO streaming benchmark.
+
+Streams accelerometer and gyro samples through the FIFO of the simulated
+MPU6500 (see ``sim``) and drains it every ``--drain-ms``, then polls
+``read_motion`` once per sample period for the same time for comparison.
+Prints one JSON object with, for both:
+
+* ``samples_per_s``: samples delivered
+* ``transactions_per_s`` and ``bus_ms_per_s``: I2C transactions on the
+  shared bus and the time they kept it busy
+* ``cpu_ms_per_s``: virtual time spent in the driver calls, bus included,
+  without the waits between them
+* ``overflows``: FIFO overflows (FIFO only), a drain interval too long for
+  the rate shows up here
+* ``max_gap_us``: largest difference between consecutive batch timestamps
+  and the sample period they imply (FIFO only)
+
+::
+
+    python benchmarks/mpu_fifo.py --rate 1000 --drain-ms 20
+    python benchmarks/mpu_fifo.py --rate 500 --drain-ms 50 --duration 30
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim
+
+
+def run(duration: float, rate_hz: int, drain_ms: int, cpu_scale: float, root: str) -> dict:
+    simulator = sim.install(root, cpu_scale)
+    clock = simulator.clock
+
+    from array import array
+    import time
+    from machine import I2C, Pin
+    import mpu6500
+
+    i2c = I2C(0, scl=Pin(21), sda=Pin(20), freq=400000)
+    bus = simulator.board.i2c_bus(0)
+    usage = {"bus_us": 0.0}
+    device = bus.device
+
+    def timed_device(address: int, n: int, freq: int):
+        usage["bus_us"] += (n + 1) * 9e6 / freq
+        return device(address, n, freq)
+
+    bus.device = timed_device
+    sensor = mpu6500.MPU6500(i2c)
+    results = {}
+
+    def measure(name: str, step) -> None:
+        transactions = bus.transactions
+        bus_us = usage["bus_us"]
+        start = clock.now_us()
+        end = start + duration * 1e6
+        samples = 0
+        cpu_us = 0
+        while clock.now_us() < end:
+            # The wait for the next sample or drain is not driver time
+            n, t0 = step()
+            samples += n
+            cpu_us += time.ticks_diff(time.ticks_us(), t0)
+        elapsed = (clock.now_us() - start) / 1e6
+        results[name] = {
+            "samples_per_s": round(samples / elapsed, 1),
+            "transactions_per_s": round((bus.transactions - transactions) / elapsed, 1),
+            "bus_ms_per_s": round((usage["bus_us"] - bus_us) / elapsed / 1000, 3),
+            "cpu_ms_per_s": round(cpu_us / elapsed / 1000, 3),
+        }
+
+    out = array("h", bytes(512))
+    last = [None]
+    gaps = [0]
+
+    def drain() -> tuple:
+        time.sleep_ms(drain_ms)
+        t0 = time.ticks_us()
+        samples, ticks = sensor.read_fifo(out)
+        if samples and last[0] is not None:
+            # The first sample of this batch should follow the last one
+            first = time.ticks_add(ticks, -(samples - 1) * sensor.fifo_period_us)
+            gap = abs(time.ticks_diff(first, last[0]) - sensor.fifo_period_us)
+            gaps[0] = max(gaps[0], gap)
+        if samples:
+            last[0] = ticks
+        return samples, t0
+
+    sensor.start_fifo(rate_hz, accel=True, gyro=True)
+    measure("fifo", drain)
+    results["fifo"]["overflows"] = sensor.fifo_overflows
+    results["fifo"]["max_gap_us"] = gaps[0]
+    sensor.stop_fifo()
+
+    motion = [0.0] * 7
+    period_us = sensor.fifo_period_us
+
+    def poll() -> tuple:
+        time.sleep_us(period_us)
+        t0 = time.ticks_us()
+        sensor.read_motion(motion)
+        return 1, t0
+
+    measure("read_motion", poll)
+    return {"duration_s": duration, "rate_hz": rate_hz, "drain_ms": drain_ms, "frequency": i2c.freq, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MPU6500 FIFO streaming benchmark (host simulator).")
+    parser.add_argument("--duration", type=float, default=10, help="virtual seconds per mode")
+    parser.add_argument("--rate", type=int, default=1000, help="sample rate in Hz, 4 to 1000")
+    parser.add_argument("--drain-ms", type=int, default=20, help="FIFO drain interval")
+    parser.add_argument("--cpu-scale", type=float, default=20.0, help="Pico time per host second of computation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run(args.duration, args.rate, args.drain_ms, args.cpu_scale, tmp)
+    print(json.dumps(result, indent=2))
+    sys.stdout.flush()
+    # Simulated threads stay parked on the clock, see sim/__main__.py
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+End to end acquisition benchmark.
+
+Runs ``CanSat`` with its real ``IOThread``, ``SdCardArray`` and ``CanSatLoRa``
+in the host simulator (see ``sim``), but samples synthetic sensors at
+configurable rates instead of the flight sensors. Prints one JSON object::
+
+    python benchmarks/pipeline.py --duration 120 --period imu=5 --conf '{"sd_compress": true}' > before.json
+
+Reported per run:
+
+* ``samples_per_s``: readings handed to the IO core per second
+* ``jitter_ms``: lateness of each sample against its deadline (p50/p90/p99/max),
+  overall and per sensor, plus scheduler overruns
+* ``sd_bytes_per_s``: bytes written to the card (block writes, including
+  padding and FAT updates) and bytes the firmware wrote to its writers
+* ``lora_frames_per_s`` and air time
+* ``mem_alloc_peak``: peak heap in use while sampling, with the heap after
+  setup and at the end (``gc.mem_alloc`` from tracemalloc, host objects are
+  larger than on the Pico, so only compare runs of this benchmark with each
+  other)
+* ``dropped_readings``: readings lost because the IO core did not release a
+  page in time, and how long sampling was blocked waiting for it
+
+Synthetic sensors cost ``cost_us`` of virtual time per sample, roughly what the
+real driver takes on the Pico. All times are virtual, the results only depend
+on the firmware and the ``--cpu-scale`` estimate of host vs Pico speed.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim
+
+# name: (period_ms, sensor ids, cost_us, priority)
+SENSORS = {
+    "imu": (10, (19, 20, 21), 400, 10),
+    "env": (200, (0, 1, 2, 3), 3000, 5),
+    "gps": (1000, (14, 15, 16), 8000, 1),
+    "adc": (1000, (31, 33), 50, 1),
+}
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": 0, "p90": 0, "p99": 0, "max": 0, "n": 0}
+    values = sorted(values)
+    n = len(values)
+    return {
+        "p50": values[n * 50 // 100],
+        "p90": values[n * 90 // 100],
+        "p99": values[min(n - 1, n * 99 // 100)],
+        "max": values[-1],
+        "n": n,
+    }
+
+
+def revision() -> str:
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def build(main, periods: dict):
+    """Benchmark subclasses of the firmware classes, created after ``sim.install``."""
+    import gc
+    import time
+    import tracemalloc
+    import telemetry
+    from scheduler import Scheduler
+
+    class SyntheticSensor(main.Sensor):
+        def __init__(self, name: str, period_ms: int, ids: tuple, cost_us: int, priority: int) -> None:
+            self.name = name
+            self.period_ms = period_ms
+            self.ids = ids
+            self.cost_us = cost_us
+            self.priority = priority
+            self.samples = 0
+
+        def get_data(self, t: int) -> list:
+            time.sleep_us(self.cost_us)
+            self.samples += 1
+            n = self.samples
+            return [main.SensorData(i, t, n * 0.01 + i if telemetry.SCHEMA[i] == "f" else n & 0xFFFF) for i in self.ids]
+
+        def __repr__(self) -> str:
+            return f"<SyntheticSensor {self.name}>"
+
+    class JitterScheduler(Scheduler):
+        def __init__(self) -> None:
+            super().__init__()
+            self.jitter = {}
+
+        def done(self, task, start: int, end: int) -> None:
+            self.jitter.setdefault(task.sensor.name, []).append(time.ticks_diff(start, task.deadline))
+            super().done(task, start, end)
+
+    class CountingEncoder(telemetry.Encoder):
+        def __init__(self, size: int = 1024) -> None:
+            super().__init__(size)
+            self.pending = 0
+
+        def add(self, sensor_id: int, t: int, value) -> bool:
+            if super().add(sensor_id, t, value):
+                self.pending += 1
+                return True
+            return False
+
+        def take(self) -> memoryview:
+            self.pending = 0
+            return super().take()
+
+        def rebind(self, buf) -> None:
+            self.pending = 0
+            super().rebind(buf)
+
+    class BenchCanSat(main.CanSat):
+        def __init__(self) -> None:
+            super().__init__()
+            self.scheduler = JitterScheduler()
+            self.encoder = CountingEncoder(0)
+            self.encoder.rebind(self.pipeline.page())
+            self.published = 0
+            self.dropped_readings = 0
+            self.started = None
+
+        def setup(self) -> None:
+            super().setup()
+            # The flight sensors were set up against the simulated hardware,
+            # sample only the synthetic ones
+            self.sensors = [SyntheticSensor(name, periods.get(name, spec[0]), *spec[1:]) for name, spec in SENSORS.items() if periods.get(name, spec[0]) > 0]
+            self.started = sim.current.snapshot()
+            tracemalloc.reset_peak()
+            self.mem_start = gc.mem_alloc()
+
+        def publish(self, full: bool) -> None:
+            pending = self.encoder.pending
+            dropped = self.pipeline.dropped_pages
+            super().publish(full)
+            if self.pipeline.dropped_pages != dropped:
+                self.dropped_readings += pending
+            elif self.encoder.pending == 0:
+                self.published += pending
+
+    return BenchCanSat
+
+
+def run(duration: float, periods: dict, conf: dict, cpu_scale: float, root: str) -> dict:
+    card_dir = os.path.join(root, "sd1.img.d")
+    os.makedirs(card_dir, exist_ok=True)
+    with open(os.path.join(card_dir, "conf.json"), "w") as f:
+        # setup() counts the run up to 0
+        json.dump(dict(conf, runs=-1), f)
+
+    import tracemalloc
+
+    tracemalloc.start()
+    simulator = sim.install(root, cpu_scale, duration)
+    import main
+
+    cansat = build(main, periods)()
+    # Firmware progress output goes to stderr, stdout is for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            cansat.run()
+        except sim.SimulationEnd:
+            pass
+    mem_end, mem_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if cansat.started is None:
+        raise RuntimeError("The simulation ended before setup finished, increase --duration")
+    end = simulator.snapshot()
+    start = cansat.started
+    elapsed = (end["t_us"] - start["t_us"]) / 1e6
+
+    jitter = cansat.scheduler.jitter
+    sensors = {}
+    for task in cansat.scheduler.tasks:
+        s = task.sensor
+        sensors[s.name] = {
+            "period_ms": s.period_ms,
+            "samples": s.samples,
+            "overruns": task.stats.overruns,
+            "deferred": task.stats.deferred,
+            "jitter_ms": percentiles(jitter.get(s.name, [])),
+        }
+
+    written = 0
+    for card in cansat.sdcard_array.cards:
+        for writer in card.writers.values():
+            written += writer.stats.bytes
+
+    return {
+        "revision": revision(),
+        "duration_s": round(elapsed, 3),
+        "cpu_scale": cpu_scale,
+        "conf": conf,
+        "samples_per_s": round(cansat.published / elapsed, 2),
+        "readings": cansat.published,
+        "dropped_readings": cansat.dropped_readings,
+        "dropped_pages": cansat.pipeline.dropped_pages,
+        "sampling_blocked_ms": round(cansat.pipeline.blocked_us / 1000, 3),
+        "sampling_blocked_waits": cansat.pipeline.waits,
+        "jitter_ms": percentiles([x for values in jitter.values() for x in values]),
+        "sensors": sensors,
+        "sd_bytes_per_s": round((end["sd_bytes"] - start["sd_bytes"]) / elapsed, 1),
+        "sd_block_writes": end["sd_writes"] - start["sd_writes"],
+        "sd_logical_bytes_per_s": round(written / elapsed, 1),
+        "lora_frames_per_s": round((end["lora_frames"] - start["lora_frames"]) / elapsed, 3),
+        "lora_airtime_s": round(end["lora_airtime_s"] - start["lora_airtime_s"], 3),
+        "mem_alloc_start": cansat.mem_start,
+        "mem_alloc_peak": mem_peak,
+        "mem_alloc_end": mem_end,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CanSat acquisition pipeline benchmark (host simulator).")
+    parser.add_argument("--duration", type=float, default=60, help="virtual seconds including about 2 s of setup")
+    parser.add_argument("--period", action="append", default=[], metavar="NAME=MS", help=f"sampling period of a synthetic sensor ({', '.join(SENSORS)}), 0 disables it")
+    parser.add_argument("--conf", default="{}", help="conf.json overrides as JSON, e.g. '{\"sd_compress\": true}'")
+    parser.add_argument("--cpu-scale", type=float, default=20.0, help="Pico time per host second of computation")
+    parser.add_argument("--root", default=None, help="directory for the card image, a temporary one by default")
+    parser.add_argument("--out", default=None, help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    periods = {}
+    for spec in args.period:
+        name, _, ms = spec.partition("=")
+        if name not in SENSORS:
+            parser.error(f"unknown sensor {name}")
+        periods[name] = int(ms)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run(args.duration, periods, json.loads(args.conf), args.cpu_scale, args.root or tmp)
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        # builtins.open is redirected to the simulated filesystem
+        with io.open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.stdout.flush()
+    # Simulated threads stay parked on the clock, see sim/__main__.py
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Raw log-structured writer for a reserved region of SD card blocks.
+
+The flight data stream can bypass FAT entirely: records are appended to a
+contiguous region of blocks with multi-block (CMD25) writes through
+``sdcard.SDCard.writeblocks``. No FAT table or directory entry is touched per
+append, so the card sees a plain sequential write.
+
+Region layout (block numbers relative to ``start``)::
+
+    0       superblock  magic, region id, start, size, head, head sequence
+    1..n-1  data blocks header (14 bytes) + 498 payload bytes
+
+Every data block carries the random region id chosen when the region was
+formatted and a running sequence number. The superblock is only rewritten every
+``superblock_every`` flushes; on open the writer scans forward from the
+recorded head for blocks that continue the sequence, so nothing written after
+the last superblock update is lost or overwritten.
+
+The region must lie outside of the FAT partition. ``fs_end`` reads the
+partition table (or the boot sector of an unpartitioned card) and the writer
+refuses to format a region that overlaps the filesystem. The default region is
+the end of the card, so the card has to be partitioned with some space left
+free.
+
+On the host, the region can be extracted from a card image::
+
+    python blocklog.py card.img [start_block]
+
+which writes one ``session-<n>.bin`` telemetry stream per power cycle.
+"""
+
+import random
+import struct
+import time
+
+from sdwriter import FlushStats
+
+BLOCK_SIZE = 512
+
+_SB_MAGIC = b"CSRLOG"
+_SB_VERSION = 1
+_SB_FORMAT = "<6sBBIIIII"
+
+_BLK_MAGIC = b"LB"
+_BLK_FORMAT = "<2sBBIIH"
+_BLK_HEADER = 14
+PAYLOAD_SIZE = BLOCK_SIZE - _BLK_HEADER
+
+FLAG_SESSION_START = 0x01
+
+
+def fs_end(card) -> int:
+    """First block after the FAT filesystem(s) on ``card``."""
+    buf = bytearray(BLOCK_SIZE)
+    card.readblocks(0, buf)
+    if buf[510] != 0x55 or buf[511] != 0xAA:
+        return 0
+    if buf[0] in (0xEB, 0xE9) and buf[11:13] == b"\x00\x02":
+        # Boot sector of an unpartitioned card
+        total = struct.unpack_from("<H", buf, 19)[0]
+        return total or struct.unpack_from("<I", buf, 32)[0]
+    end = 0
+    for i in range(4):
+        lba, count = struct.unpack_from("<II", buf, 446 + 16 * i + 8)
+        if count:
+            end = max(end, lba + count)
+    return end
+
+
+class BlockLog:
+    def __init__(self, card, start: int = None, nblocks: int = 2048, buffer_blocks: int = 8, flush_ms: int = 1000, superblock_every: int = 16) -> None:
+        self.card = card
+        if start is None:
+            start = card.ioctl(4, 0) - nblocks
+        self.start = start
+        self.nblocks = nblocks
+        self.capacity = nblocks - 1
+        self.flush_ms = flush_ms
+        self.superblock_every = superblock_every
+        self.buf = bytearray(buffer_blocks * BLOCK_SIZE)
+        self.mv = memoryview(self.buf)
+        self.buffer_blocks = buffer_blocks
+        self.sb = bytearray(BLOCK_SIZE)
+        self.block = 0
+        self.used = 0
+        self.first_pending = 0
+        self.flags = FLAG_SESSION_START
+        self.flushes = 0
+        self.dropped = 0
+        self.stats = FlushStats()
+        self._open()
+
+    def _open(self) -> None:
+        self.card.readblocks(self.start, self.sb)
+        magic, version, _, region_id, start, nblocks, head, seq = struct.unpack_from(_SB_FORMAT, self.sb)
+        if magic == _SB_MAGIC and version == _SB_VERSION and start == self.start and nblocks == self.nblocks:
+            self.region_id = region_id
+            self.head = head
+            self.seq = seq
+            self._recover()
+        else:
+            self._format()
+
+    def _format(self) -> None:
+        if self.start < fs_end(self.card):
+            raise ValueError("Raw log region overlaps the filesystem")
+        self.region_id = random.getrandbits(32)
+        self.head = 0
+        self.seq = 0
+        self._write_superblock()
+
+    def _recover(self) -> None:
+        # Blocks written after the last superblock update continue the sequence
+        blk = self.mv[:BLOCK_SIZE]
+        while self.head < self.capacity:
+            self.card.readblocks(self.start + 1 + self.head, blk)
+            magic, _, _, region_id, seq, _ = struct.unpack_from(_BLK_FORMAT, blk)
+            if magic != _BLK_MAGIC or region_id != self.region_id or seq != self.seq:
+                break
+            self.head += 1
+            self.seq += 1
+
+    def _write_superblock(self) -> None:
+        struct.pack_into(_SB_FORMAT, self.sb, 0, _SB_MAGIC, _SB_VERSION, 0, self.region_id, self.start, self.nblocks, self.head, self.seq)
+        self.card.writeblocks(self.start, self.sb)
+
+    def _begin_block(self) -> None:
+        struct.pack_into(_BLK_FORMAT, self.buf, self.block * BLOCK_SIZE, _BLK_MAGIC, self.flags, 0, self.region_id, self.seq + self.block, 0)
+        self.flags = 0
+
+    def _end_block(self) -> None:
+        struct.pack_into("<H", self.buf, self.block * BLOCK_SIZE + _BLK_HEADER - 2, self.used)
+
+    def write(self, data) -> bool:
+        """Append ``data``, returns False and writes nothing if it does not fit.
+
+        Writes are all or nothing, so the log ends at a record boundary and
+        the caller can continue with the same data elsewhere.
+        """
+        data = memoryview(data)
+        if (self.capacity - self.head - self.block) * PAYLOAD_SIZE - self.used < len(data):
+            self.dropped += len(data)
+            return False
+        while len(data):
+            if self.used == 0:
+                if self.block == 0:
+                    self.first_pending = time.ticks_ms()
+                self._begin_block()
+            offset = self.block * BLOCK_SIZE + _BLK_HEADER + self.used
+            k = min(len(data), PAYLOAD_SIZE - self.used)
+            self.mv[offset:offset + k] = data[:k]
+            self.used += k
+            data = data[k:]
+            if self.used == PAYLOAD_SIZE:
+                self._end_block()
+                self.block += 1
+                self.used = 0
+                if self.block == self.buffer_blocks:
+                    self.flush()
+        return True
+
+    def flush(self) -> None:
+        """Write all buffered blocks, including a partially filled one."""
+        full = self.block
+        count = full + (1 if self.used else 0)
+        if count == 0:
+            return
+        if self.used:
+            self._end_block()
+        t = time.ticks_ms()
+        self.card.writeblocks(self.start + 1 + self.head, self.mv[:count * BLOCK_SIZE])
+        dt = time.ticks_diff(time.ticks_ms(), t)
+        stats = self.stats
+        stats.writes += 1
+        stats.bytes += count * BLOCK_SIZE
+        stats.flush_ms_total += dt
+        stats.flush_ms_max = max(stats.flush_ms_max, dt)
+
+        # The partial block is rewritten in place on the next flush
+        self.head += full
+        self.seq += full
+        if self.used and full:
+            self.mv[0:BLOCK_SIZE] = self.mv[full * BLOCK_SIZE:count * BLOCK_SIZE]
+        self.block = 0
+        if self.used:
+            self.first_pending = time.ticks_ms()
+
+        self.flushes += 1
+        if self.flushes % self.superblock_every == 0:
+            self.sync()
+
+    def sync(self) -> None:
+        t = time.ticks_ms()
+        self._write_superblock()
+        self.stats.syncs += 1
+        self.stats.sync_ms_max = max(self.stats.sync_ms_max, time.ticks_diff(time.ticks_ms(), t))
+
+    def poll(self) -> None:
+        if (self.block or self.used) and time.ticks_diff(time.ticks_ms(), self.first_pending) >= self.flush_ms:
+            self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.sync()
+
+
+def find_superblock(read_block, nblocks: int) -> int:
+    """Search backwards from the end of the card for the superblock."""
+    for n in range(nblocks - 1, -1, -1):
+        if bytes(read_block(n)[:6]) == _SB_MAGIC:
+            return n
+    raise ValueError("No raw log superblock found")
+
+
+def extract(read_block, start: int) -> list:
+    """Return the logged byte stream of each session in the region at ``start``.
+
+    ``read_block(n)`` has to return the 512 bytes of block ``n``.
+    """
+    magic, version, _, region_id, _, nblocks, _, _ = struct.unpack_from(_SB_FORMAT, read_block(start))
+    if magic != _SB_MAGIC or version != _SB_VERSION:
+        raise ValueError("Not a raw log superblock")
+    sessions = []
+    seq = 0
+    for n in range(nblocks - 1):
+        blk = read_block(start + 1 + n)
+        magic, flags, _, blk_region, blk_seq, used = struct.unpack_from(_BLK_FORMAT, blk)
+        if magic != _BLK_MAGIC or blk_region != region_id or blk_seq != seq:
+            break
+        if flags & FLAG_SESSION_START or not sessions:
+            sessions.append(bytearray())
+        sessions[-1] += blk[_BLK_HEADER:_BLK_HEADER + used]
+        seq += 1
+    return sessions
+
+
+if __name__ == "__main__":
+    import sys
+
+    with open(sys.argv[1], "rb") as f:
+        f.seek(0, 2)
+        total = f.tell() // BLOCK_SIZE
+
+        def read_block(n):
+            f.seek(n * BLOCK_SIZE)
+            return f.read(BLOCK_SIZE)
+
+        start = int(sys.argv[2]) if len(sys.argv) > 2 else find_superblock(read_block, total)
+        for i, session in enumerate(extract(read_block, start)):
+            with open(f"session-{i}.bin", "wb") as out:
+                out.write(session)
+            print(f"session-{i}.bin: {len(session)} bytes")
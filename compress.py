@@ -0,0 +1,309 @@
+"""
+Delta + varint compression of telemetry streams.
+
+Readings of one sensor id (a channel) change little from sample to sample, and
+most sensors are sampled at a fixed period. The compressed stream therefore
+stores per channel:
+
+* the timestamp as the zigzag varint of the delta of deltas, which is ``0``
+  (one byte) for a channel sampled at a steady rate,
+* integer values and quantized floats as the zigzag varint of the difference to
+  the previous value of the channel,
+* other floats unchanged (``f32``) and strings as in ``telemetry``.
+
+A stream starts with the header ``b"CSAT" + FORMAT_COMPRESSED`` and is followed
+by records of the form::
+
+    id:u8  dod:varint  value
+
+``id | NULL_FLAG`` is a reading without value and carries only ``dod``.
+``RESET_ID`` has no payload and resets the state of every channel; the encoder
+emits one after ``resync``. The state of every channel starts at zero, so the
+first record of a channel carries its absolute time and value.
+
+Quantization is lossy: a float registered in ``QUANT`` is stored as
+``round(value / step)``, readings that are not finite are stored without value.
+
+``FramePacker`` uses the same value coding without deltas, see
+``pack_absolute`` and ``unpack_absolute``.
+"""
+
+import struct
+
+import telemetry
+from telemetry import MAGIC, NULL_FLAG, TIME_ID
+
+FORMAT_COMPRESSED = 2
+RESET_ID = TIME_ID
+
+# Quantization step per sensor id, floats not listed are stored as f32
+QUANT = {
+    0: 0.01,    # BME680 - Temperature
+    1: 0.01,    # BME680 - Pressure
+    2: 0.01,    # BME680 - Humidity
+    4: 1,       # Pico - RAM free
+    5: 1,       # Pico - RAM allocated
+    6: 0.01,    # Pico - CPU temperature
+    14: 1e-6,   # GPS - Latitude
+    15: 1e-6,   # GPS - Longitude
+    16: 0.1,    # GPS - Altitude
+    19: 0.001,  # MPU9250 - Accelerometer X
+    20: 0.001,  # MPU9250 - Accelerometer Y
+    21: 0.001,  # MPU9250 - Accelerometer Z
+    22: 0.001,  # MPU9250 - Gyroscope X
+    23: 0.001,  # MPU9250 - Gyroscope Y
+    24: 0.001,  # MPU9250 - Gyroscope Z
+    25: 0.01,   # MPU9250 - Magnetometer X
+    26: 0.01,   # MPU9250 - Magnetometer Y
+    27: 0.01,   # MPU9250 - Magnetometer Z
+    28: 0.01,   # MPU9250 - Temperature
+    32: 0.01,   # O2
+}
+
+# Value coding per sensor id
+_RAW = 0
+_DELTA = 1
+_STRING = 2
+
+# Worst case size of a record without its value
+_MAX_HEADER = 1 + 10
+
+
+def zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def unzigzag(n: int) -> int:
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def put_varint(buf, offset: int, n: int) -> int:
+    """Write unsigned ``n`` as LEB128 at ``offset``, returns the new offset."""
+    while n > 0x7F:
+        buf[offset] = (n & 0x7F) | 0x80
+        n >>= 7
+        offset += 1
+    buf[offset] = n
+    return offset + 1
+
+
+def get_varint(data, offset: int, end: int):
+    """Read a LEB128 varint, returns (value, new offset) or (None, offset) if truncated."""
+    n = 0
+    shift = 0
+    while offset < end:
+        b = data[offset]
+        offset += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, offset
+        shift += 7
+    return None, offset
+
+
+def header() -> bytes:
+    return MAGIC + bytes([FORMAT_COMPRESSED])
+
+
+def _coding(quant: dict) -> tuple:
+    coding = [None] * TIME_ID
+    steps = [0] * TIME_ID
+    for sensor_id, fmt in telemetry.SCHEMA.items():
+        if fmt == "s":
+            coding[sensor_id] = _STRING
+        elif fmt == "f" and sensor_id not in quant:
+            coding[sensor_id] = _RAW
+        else:
+            coding[sensor_id] = _DELTA
+            steps[sensor_id] = quant.get(sensor_id, 0)
+    return coding, steps
+
+
+def quantize(step, value):
+    """Integer representation of ``value``, None if it has none (NaN, inf)."""
+    if not step:
+        return int(value)
+    value = value / step
+    if value != value or value in (float("inf"), float("-inf")):
+        return None
+    return int(round(value))
+
+
+class Encoder:
+    """Streaming compressor with the same interface as ``telemetry.Encoder``."""
+
+    def __init__(self, size: int = 1024, quant: dict = QUANT) -> None:
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.n = 0
+        self.coding, self.steps = _coding(quant)
+        self.last_t = [0] * TIME_ID
+        self.last_dt = [0] * TIME_ID
+        self.last_v = [0] * TIME_ID
+        self.reset = False
+
+    def add(self, sensor_id: int, t: int, value) -> bool:
+        """Append one reading, returns False if it does not fit anymore."""
+        coding = self.coding[sensor_id]
+        if coding is None:
+            raise ValueError(f"Unknown sensor id {sensor_id}")
+        if value is not None and coding == _DELTA:
+            value = quantize(self.steps[sensor_id], value)
+        if value is None:
+            size = 0
+        elif coding == _STRING:
+            if isinstance(value, str):
+                value = value.encode()
+            size = 1 + min(len(value), 255)
+        else:
+            size = 10
+        buf = self.buf
+        n = self.n
+        if n + 1 + self.reset + _MAX_HEADER + size > len(buf):
+            return False
+        if self.reset:
+            buf[n] = RESET_ID
+            n += 1
+            self.reset = False
+
+        dt = t - self.last_t[sensor_id]
+        buf[n] = sensor_id if value is not None else sensor_id | NULL_FLAG
+        n = put_varint(buf, n + 1, zigzag(dt - self.last_dt[sensor_id]))
+        self.last_t[sensor_id] = t
+        self.last_dt[sensor_id] = dt
+
+        if value is not None:
+            if coding == _DELTA:
+                n = put_varint(buf, n, zigzag(value - self.last_v[sensor_id]))
+                self.last_v[sensor_id] = value
+            elif coding == _STRING:
+                length = size - 1
+                buf[n] = length
+                buf[n + 1:n + size] = value[:length]
+                n += size
+            else:
+                struct.pack_into("<f", buf, n, value)
+                n += 4
+        self.n = n
+        return True
+
+    def resync(self) -> None:
+        """Start over from zero state, needed when encoded bytes were dropped."""
+        for i in range(TIME_ID):
+            self.last_t[i] = 0
+            self.last_dt[i] = 0
+            self.last_v[i] = 0
+        self.reset = True
+
+    def take(self) -> memoryview:
+        """Return the encoded bytes and rewind the buffer.
+
+        The returned memoryview is only valid until the next ``add``.
+        """
+        n = self.n
+        self.n = 0
+        return self.mv[:n]
+
+
+class Decoder:
+    """Turns a compressed stream back into (sensor_id, time, value) tuples."""
+
+    def __init__(self, quant: dict = QUANT) -> None:
+        self.coding, self.steps = _coding(quant)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.last_t = [0] * TIME_ID
+        self.last_dt = [0] * TIME_ID
+        self.last_v = [0] * TIME_ID
+
+    def records(self, data, offset: int = 0, end: int = None):
+        if end is None:
+            end = len(data)
+        while offset < end:
+            sensor_id = data[offset]
+            if sensor_id == RESET_ID:
+                self._reset()
+                offset += 1
+                continue
+            null = sensor_id & NULL_FLAG
+            sensor_id &= ~NULL_FLAG
+            coding = self.coding[sensor_id]
+            if coding is None:
+                raise ValueError(f"Unknown sensor id {sensor_id}")
+            # A log cut off by a power loss can end in the middle of a record
+            dod, offset = get_varint(data, offset + 1, end)
+            if dod is None:
+                return
+            dt = self.last_dt[sensor_id] + unzigzag(dod)
+            t = self.last_t[sensor_id] + dt
+            if null:
+                value = None
+            elif coding == _DELTA:
+                delta, offset = get_varint(data, offset, end)
+                if delta is None:
+                    return
+                value = self.last_v[sensor_id] + unzigzag(delta)
+                self.last_v[sensor_id] = value
+                step = self.steps[sensor_id]
+                if step:
+                    value = value * step
+            elif coding == _STRING:
+                if offset >= end or offset + 1 + data[offset] > end:
+                    return
+                value, offset = telemetry.unpack_value(data, offset, sensor_id)
+            else:
+                if offset + 4 > end:
+                    return
+                value = struct.unpack_from("<f", data, offset)[0]
+                offset += 4
+            self.last_t[sensor_id] = t
+            self.last_dt[sensor_id] = dt
+            yield sensor_id, t, value
+
+
+# Absolute (not delta) coding, for frames that have to decode on their own
+_ABS_CODING, _ABS_STEPS = _coding(QUANT)
+
+
+def delta_coded(sensor_id: int) -> bool:
+    """True if ``sensor_id`` is stored as (quantized) integer, not as in ``telemetry``."""
+    return _ABS_CODING[sensor_id] == _DELTA
+
+
+def pack_absolute(buf, offset: int, sensor_id: int, value) -> int:
+    """Pack ``value`` without reference to earlier readings, returns the new offset.
+
+    Values that cannot be quantized fall back to the ``telemetry`` packing, so
+    ``value`` has to be finite for quantized ids; see ``absolute_size``.
+    """
+    if _ABS_CODING[sensor_id] == _DELTA:
+        return put_varint(buf, offset, zigzag(quantize(_ABS_STEPS[sensor_id], value)))
+    return telemetry.pack_value(buf, offset, sensor_id, value)
+
+
+def absolute_size(sensor_id: int, value) -> int:
+    """Bytes ``pack_absolute`` needs for ``value``, -1 if it cannot be packed."""
+    if _ABS_CODING[sensor_id] != _DELTA:
+        return telemetry.value_size(sensor_id, value)
+    q = quantize(_ABS_STEPS[sensor_id], value)
+    if q is None:
+        return -1
+    q = zigzag(q)
+    size = 1
+    while q > 0x7F:
+        q >>= 7
+        size += 1
+    return size
+
+
+def unpack_absolute(data, offset: int, sensor_id: int):
+    """Unpack a value written by ``pack_absolute``, returns (value, new offset)."""
+    if _ABS_CODING[sensor_id] != _DELTA:
+        return telemetry.unpack_value(data, offset, sensor_id)
+    q, offset = get_varint(data, offset, len(data))
+    if q is None:
+        raise ValueError("Truncated value")
+    value = unzigzag(q)
+    step = _ABS_STEPS[sensor_id]
+    return (value * step if step else value), offset
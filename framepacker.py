@@ -0,0 +1,261 @@
+"""
+Packs many readings into each LoRa frame.
+
+The packer queues readings in a preallocated pool of ``queue_size`` slots, one
+FIFO per sensor id. ``frame`` fills a LoRa payload by taking the oldest queued
+reading of one sensor id after the other, round after round, until the frame
+is full. The next frame continues with the id that did not fit, so fast sensors
+fill the frames without starving the slow ones. When the pool is full, a new
+reading replaces the oldest one of its own id, or of the id with the most
+queued readings if it has none (counted in ``PackStats.overwritten``).
+
+Frame layout (after the 4 byte RadioHead header)::
+
+    type:u8  t0:u32  { id:u8  age:u16  value }*
+
+``t0`` is the time of the newest queued reading and ``age`` is how many
+milliseconds older each reading is. Values are packed as in ``telemetry``,
+readings without value use ``id | telemetry.NULL_FLAG`` and carry no value.
+
+With ``compressed=True`` frames use the type ``FRAME_COMPRESSED``: ``age`` is a
+varint and quantized values are packed with ``compress.pack_absolute``. Frames
+get lost, so values are not delta coded against earlier frames.
+"""
+
+import struct
+import time
+
+import compress
+import telemetry
+from array import array
+
+# RadioHead limits a message to 251 bytes including its 4 byte header
+MAX_FRAME = 251
+RH_HEADER = 4
+MAX_PAYLOAD = MAX_FRAME - RH_HEADER
+
+FRAME_READINGS = 1
+FRAME_COMPRESSED = 2
+FRAME_HEADER = 5
+RECORD_HEADER = 3
+# id + age varint of up to 3 bytes
+COMPRESSED_HEADER = 4
+
+# Longer strings are truncated in frames
+SLOT_SIZE = 32
+QUEUE_SIZE = 64
+
+# End of a queue, slot indexes are bytes
+_NONE = 0xFF
+
+
+class PackStats:
+    def __init__(self) -> None:
+        self.frames = 0
+        self.readings = 0
+        self.payload_bytes = 0
+        self.overwritten = 0
+
+    def bytes_per_frame(self) -> float:
+        return self.payload_bytes / self.frames if self.frames else 0
+
+    def readings_per_frame(self) -> float:
+        return self.readings / self.frames if self.frames else 0
+
+
+class FramePacker:
+    def __init__(self, max_payload: int = MAX_PAYLOAD, compressed: bool = False, queue_size: int = QUEUE_SIZE) -> None:
+        if not 0 < queue_size < _NONE:
+            raise ValueError("queue_size must be between 1 and 254")
+        self.max_payload = max_payload
+        self.compressed = compressed
+        # Reading slots, size 0 is a reading without value
+        self.slots = bytearray(queue_size * SLOT_SIZE)
+        self.slots_mv = memoryview(self.slots)
+        self.sizes = bytearray(queue_size)
+        self.ids = bytearray(queue_size)
+        self.times = array("l", [0] * queue_size)
+        # Slot lists: the free list and one FIFO per sensor id
+        self.next = bytearray(range(1, queue_size + 1))
+        self.next[queue_size - 1] = _NONE
+        self.free = 0
+        self.heads = bytearray([_NONE] * telemetry.TIME_ID)
+        self.tails = bytearray([_NONE] * telemetry.TIME_ID)
+        self.counts = bytearray(telemetry.TIME_ID)
+        self.queued = 0
+        self.buf = bytearray(max_payload)
+        self.mv = memoryview(self.buf)
+        self.cursor = 0
+        self.stats = PackStats()
+
+    def offer(self, sensor_id: int, t: int, data, offset: int, size: int) -> None:
+        """Queue a reading, ``size`` < 0 is a reading without value."""
+        if self.free == _NONE:
+            self._evict(sensor_id)
+        k = self.free
+        self.free = self.next[k]
+        self.ids[k] = sensor_id
+        self.times[k] = t
+        if size < 0:
+            size = 0
+        else:
+            size = min(size, SLOT_SIZE)
+            slot = k * SLOT_SIZE
+            self.slots_mv[slot:slot + size] = data[offset:offset + size]
+            if telemetry.SCHEMA[sensor_id] == "s":
+                self.slots[slot] = size - 1
+        self.sizes[k] = size
+        self.next[k] = _NONE
+        tail = self.tails[sensor_id]
+        if tail == _NONE:
+            self.heads[sensor_id] = k
+        else:
+            self.next[tail] = k
+        self.tails[sensor_id] = k
+        self.counts[sensor_id] += 1
+        self.queued += 1
+
+    def _evict(self, sensor_id: int) -> None:
+        # Drop the oldest reading of the id, or of the id with the longest queue
+        victim = sensor_id
+        if self.counts[victim] == 0:
+            counts = self.counts
+            for i in range(len(counts)):
+                if counts[i] > counts[victim]:
+                    victim = i
+        self._pop(victim)
+        self.stats.overwritten += 1
+
+    def _pop(self, sensor_id: int) -> None:
+        # Return the oldest slot of the id to the free list
+        k = self.heads[sensor_id]
+        self.heads[sensor_id] = self.next[k]
+        if self.next[k] == _NONE:
+            self.tails[sensor_id] = _NONE
+        self.counts[sensor_id] -= 1
+        self.queued -= 1
+        self.next[k] = self.free
+        self.free = k
+
+    def feed(self, decoder, data) -> None:
+        """Offer every record of an encoded telemetry chunk."""
+        for sensor_id, t, offset, size in decoder.raw_records(data):
+            self.offer(sensor_id, t, data, offset, size)
+
+    def frame(self):
+        """Build the next frame, returns a memoryview or None without queued readings.
+
+        The memoryview is only valid until the next call.
+        """
+        if self.queued == 0:
+            return None
+        # Newest time first, it is the reference for all ages
+        t0 = None
+        for k in self.tails:
+            if k != _NONE and (t0 is None or time.ticks_diff(self.times[k], t0) > 0):
+                t0 = self.times[k]
+
+        buf = self.buf
+        n = FRAME_HEADER
+        readings = 0
+        count = len(self.heads)
+        i = self.cursor
+        # Round robin over the ids, a whole round without a reading ends the frame
+        idle = 0
+        while idle < count:
+            k = self.heads[i]
+            if k == _NONE:
+                idle += 1
+            else:
+                if self.compressed:
+                    end = self._record_compressed(n, i, k, t0)
+                else:
+                    end = self._record(n, i, k, t0)
+                if end < 0:
+                    break
+                n = end
+                self._pop(i)
+                readings += 1
+                idle = 0
+            i = (i + 1) % count
+        # The next frame starts with the first reading that did not fit
+        self.cursor = i
+
+        buf[0] = FRAME_COMPRESSED if self.compressed else FRAME_READINGS
+        struct.pack_into("<I", buf, 1, t0 & 0xFFFFFFFF)
+        stats = self.stats
+        stats.frames += 1
+        stats.readings += readings
+        stats.payload_bytes += n
+        return self.mv[:n]
+
+    def _record(self, n: int, i: int, k: int, t0: int) -> int:
+        # Returns the new frame length, -1 if the record does not fit
+        size = self.sizes[k]
+        if n + RECORD_HEADER + size > self.max_payload:
+            return -1
+        buf = self.buf
+        buf[n] = i if size else i | telemetry.NULL_FLAG
+        struct.pack_into("<H", buf, n + 1, min(max(time.ticks_diff(t0, self.times[k]), 0), 0xFFFF))
+        n += RECORD_HEADER
+        if size:
+            slot = k * SLOT_SIZE
+            self.mv[n:n + size] = self.slots_mv[slot:slot + size]
+            n += size
+        return n
+
+    def _record_compressed(self, n: int, i: int, k: int, t0: int) -> int:
+        # Returns the new frame length, -1 if the record does not fit
+        slot = k * SLOT_SIZE
+        size = self.sizes[k]
+        null = size == 0
+        value = None
+        if size and compress.delta_coded(i):
+            value = telemetry.unpack_value(self.slots, slot, i)[0]
+            size = compress.absolute_size(i, value)
+            if size < 0:
+                # Not finite, sent without value
+                size = 0
+                null = True
+        if n + COMPRESSED_HEADER + size > self.max_payload:
+            return -1
+        buf = self.buf
+        buf[n] = i | telemetry.NULL_FLAG if null else i
+        n = compress.put_varint(buf, n + 1, min(max(time.ticks_diff(t0, self.times[k]), 0), 0xFFFF))
+        if value is not None and size:
+            n = compress.pack_absolute(buf, n, i, value)
+        elif size:
+            self.mv[n:n + size] = self.slots_mv[slot:slot + size]
+            n += size
+        return n
+
+
+def decode_frame(data) -> list:
+    """Ground station side: turn a frame back into (sensor_id, time, value) tuples."""
+    if data[0] not in (FRAME_READINGS, FRAME_COMPRESSED):
+        raise ValueError(f"Unknown frame type {data[0]}")
+    compressed = data[0] == FRAME_COMPRESSED
+    t0 = struct.unpack_from("<I", data, 1)[0]
+    readings = []
+    offset = FRAME_HEADER
+    while offset < len(data):
+        sensor_id = data[offset]
+        if compressed:
+            age, offset = compress.get_varint(data, offset + 1, len(data))
+            if age is None:
+                break
+        elif offset + RECORD_HEADER <= len(data):
+            age = struct.unpack_from("<H", data, offset + 1)[0]
+            offset += RECORD_HEADER
+        else:
+            break
+        t = t0 - age
+        if sensor_id & telemetry.NULL_FLAG:
+            readings.append((sensor_id & ~telemetry.NULL_FLAG, t, None))
+            continue
+        if compressed:
+            value, offset = compress.unpack_absolute(data, offset, sensor_id)
+        else:
+            value, offset = telemetry.unpack_value(data, offset, sensor_id)
+        readings.append((sensor_id, t, value))
+    return readings
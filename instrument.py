@@ -0,0 +1,214 @@
+"""
+Latency histograms and counters for the flight loops.
+
+Instruments are created once at setup from a ``Registry`` and updated from the
+loops without allocating: a histogram is a preallocated array of bucket counts
+with fixed bounds (``BOUNDS_US``), a counter is a single int. Each instrument
+must only be updated from one core, reading them from the other one is fine.
+
+    t0 = time.ticks_us()
+    sensor.get_data(t)
+    hist.since(t0)
+
+The IO thread periodically writes ``Registry.dump`` (one JSON line) to the SD
+cards and can downlink ``Registry.health_frame``, a compact binary summary::
+
+    type:u8  t:u32  nh:u8  { id:u16  count:u32  p50:u8  p99:u8  max_ms:u16 }*nh
+                    nc:u8  { id:u16  value:u32 }*nc
+
+``id`` is ``name_id`` of the instrument name, so an entry can be told apart
+no matter which sensors came up and how many instruments fit. Histograms and
+counters appear in registration order, ``p50``/``p99`` are bucket indexes into
+``BOUNDS_US`` (``len(BOUNDS_US)`` is the overflow bucket). The frame fits into
+one LoRa payload (``framepacker.MAX_PAYLOAD``), the instruments registered
+after that is full are only in the SD dump. ``decode_health`` turns a frame
+back into numbers on the ground.
+"""
+
+import json
+import struct
+import time
+from array import array
+
+from framepacker import MAX_PAYLOAD
+
+# Frame types share one byte with framepacker.FRAME_READINGS/FRAME_COMPRESSED
+FRAME_HEALTH = 3
+HEALTH_HEADER = 6
+HISTOGRAM_SIZE = 10
+COUNTER_SIZE = 6
+
+# Upper bucket bounds in microseconds, roughly 1-2-5 steps
+BOUNDS_US = (50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000)
+
+
+def name_id(name: str) -> int:
+    """16 bit FNV-1a hash of an instrument name, its id in the health frame."""
+    h = 0x811C9DC5
+    for c in name.encode():
+        h = ((h ^ c) * 0x01000193) & 0xFFFFFFFF
+    return (h >> 16) ^ (h & 0xFFFF)
+
+
+class Histogram:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.id = name_id(name)
+        self.counts = array("L", [0] * (len(BOUNDS_US) + 1))
+        self.count = 0
+        self.max = 0
+
+    def record(self, us: int) -> None:
+        i = 0
+        n = len(BOUNDS_US)
+        while i < n and us > BOUNDS_US[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        if us > self.max:
+            self.max = us
+
+    def since(self, t0: int) -> None:
+        """Record the time since ``t0`` (a ``time.ticks_us`` value)."""
+        self.record(time.ticks_diff(time.ticks_us(), t0))
+
+    def percentile(self, q: int) -> int:
+        """Bucket index that holds the ``q`` percent quantile."""
+        if self.count == 0:
+            return 0
+        target = (self.count * q + 99) // 100
+        seen = 0
+        for i in range(len(self.counts)):
+            seen += self.counts[i]
+            if seen >= target:
+                return i
+        return len(self.counts) - 1
+
+    def reset(self) -> None:
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.max = 0
+
+
+class Counter:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.id = name_id(name)
+        self.value = 0
+
+    def add(self, n: int = 1) -> None:
+        self.value += n
+
+
+class Gauge:
+    """Counter kept elsewhere (e.g. ``RingBuffer.overflows``), read when reporting."""
+
+    def __init__(self, name: str, fn) -> None:
+        self.name = name
+        self.id = name_id(name)
+        self.fn = fn
+
+    @property
+    def value(self) -> int:
+        return int(self.fn())
+
+
+class Registry:
+    def __init__(self, max_frame: int = MAX_PAYLOAD) -> None:
+        self.histograms = []
+        self.counters = []
+        self.ids = {}
+        self.frame = None
+        self.max_frame = max_frame
+
+    def _register(self, instrument) -> None:
+        # The ground station can only tell instruments apart by id
+        other = self.ids.get(instrument.id)
+        if other is not None:
+            raise ValueError(f"Instrument {instrument.name} has the same id as {other}")
+        self.ids[instrument.id] = instrument.name
+
+    def histogram(self, name: str) -> Histogram:
+        h = Histogram(name)
+        self._register(h)
+        self.histograms.append(h)
+        return h
+
+    def counter(self, name: str) -> Counter:
+        c = Counter(name)
+        self._register(c)
+        self.counters.append(c)
+        return c
+
+    def gauge(self, name: str, fn) -> Gauge:
+        g = Gauge(name, fn)
+        self._register(g)
+        self.counters.append(g)
+        return g
+
+    def snapshot(self, t: int) -> dict:
+        return {
+            "t": t,
+            "bounds_us": BOUNDS_US,
+            "histograms": {h.name: {"counts": list(h.counts), "max_us": h.max} for h in self.histograms},
+            "counters": {c.name: c.value for c in self.counters},
+        }
+
+    def dump(self, t: int) -> str:
+        """One JSON line for the SD log."""
+        return json.dumps(self.snapshot(t)) + "\n"
+
+    def health_frame(self, t: int) -> memoryview:
+        """Compact summary for the downlink, valid until the next call. At
+        most ``max_frame`` bytes, the instruments that do not fit are left out."""
+        nh = min(len(self.histograms), (self.max_frame - HEALTH_HEADER - 1) // HISTOGRAM_SIZE)
+        nc = min(len(self.counters), (self.max_frame - HEALTH_HEADER - HISTOGRAM_SIZE * nh - 1) // COUNTER_SIZE)
+        size = HEALTH_HEADER + HISTOGRAM_SIZE * nh + 1 + COUNTER_SIZE * nc
+        if self.frame is None or len(self.frame) != size:
+            self.frame = bytearray(size)
+        buf = self.frame
+        struct.pack_into("<BIB", buf, 0, FRAME_HEALTH, t & 0xFFFFFFFF, nh)
+        n = HEALTH_HEADER
+        for i in range(nh):
+            h = self.histograms[i]
+            max_ms = min(0xFFFF, (h.max + 999) // 1000)
+            struct.pack_into("<HIBBH", buf, n, h.id, h.count & 0xFFFFFFFF, h.percentile(50), h.percentile(99), max_ms)
+            n += HISTOGRAM_SIZE
+        buf[n] = nc
+        n += 1
+        for i in range(nc):
+            c = self.counters[i]
+            struct.pack_into("<HI", buf, n, c.id, c.value & 0xFFFFFFFF)
+            n += COUNTER_SIZE
+        return memoryview(buf)
+
+
+def bucket_bound(i: int) -> int:
+    """Upper bound of bucket ``i`` in microseconds, -1 for the overflow bucket."""
+    return BOUNDS_US[i] if i < len(BOUNDS_US) else -1
+
+
+def decode_health(data, names=()) -> tuple:
+    """Ground station side: (t, {key: (count, p50_us, p99_us, max_ms)}, {key: value}).
+
+    ``key`` is the instrument name if it is in ``names``, the id otherwise.
+    """
+    if data[0] != FRAME_HEALTH:
+        raise ValueError(f"Not a health frame: type {data[0]}")
+    known = {name_id(x): x for x in names}
+    _, t, nh = struct.unpack_from("<BIB", data, 0)
+    n = HEALTH_HEADER
+    histograms = {}
+    for _ in range(nh):
+        i, count, p50, p99, max_ms = struct.unpack_from("<HIBBH", data, n)
+        histograms[known.get(i, i)] = (count, bucket_bound(p50), bucket_bound(p99), max_ms)
+        n += HISTOGRAM_SIZE
+    nc = data[n]
+    n += 1
+    counters = {}
+    for _ in range(nc):
+        i, value = struct.unpack_from("<HI", data, n)
+        counters[known.get(i, i)] = value
+        n += COUNTER_SIZE
+    return t, histograms, counters
@@ -4,9 +4,16 @@ import uos
 import logging
 import gc
 from threading import Thread
-import _thread
 import time
 import json
+import telemetry
+import compress
+import instrument
+from pages import PagePipeline
+from scheduler import Scheduler
+from sdwriter import BufferedWriter
+from blocklog import BlockLog
+from framepacker import FramePacker
 
 # CircuitPython 
 import board
@@ -20,6 +27,8 @@ import mpu9250
 import adafruit_ccs811
 from DFRobot_Oxygen import DFRobot_Oxygen_IIC
 import adafruit_gps
+from adafruit_blinka.microcontroller.rp2040.uart import UART
+from uartbuffer import BufferedUART
 from machine import ADC
 # fan
 from digitalio import DigitalInOut, Direction
@@ -76,6 +85,10 @@ sensors with IDs:
 """
 
 DEFAULT_CONF = {"runs":0}
+# SD writer defaults, can be overridden in conf.json
+SD_BUFFER_SIZE = 4096
+SD_FLUSH_MS = 1000
+SD_SYNC_MS = 5000
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("CanSat")
 
@@ -89,9 +102,17 @@ CLIENT_ADDRESS = 42
 SERVER_ADDRESS = 2
 
 SENSOR_DATA = []
+PAGE_SIZE = 2048
+# A page is handed to the IO core when full or this old
+PAGE_MS = 200
+# How long sampling waits for the IO core to release a page before dropping it
+PAGE_WAIT_MS = 50
+STATS_INTERVAL = 10000
+LORA_INTERVAL = 1000
+GC_INTERVAL = 1000
 
 class SensorData:
-    def __init__(self, sensor_id:int, time:int, value:str) -> None:
+    def __init__(self, sensor_id:int, time:int, value) -> None:
         self.id = sensor_id
         self.time = time
         self.value = value
@@ -100,24 +121,48 @@ class SensorData:
         return f"{self.id},{self.time},{self.value};"
     
 class Sensor:
+    # Sampling period in ms and priority for the scheduler, higher runs first
+    period_ms = 1000
+    priority = 1
+    
     def __init__(self) -> None:
         pass
     
     def get_data(self, t:int) -> list[SensorData]:
         return []
     
+    def instrument(self, stats: instrument.Registry) -> None:
+        # Register the sensor's own counters, called once before sampling
+        pass
+    
 class BME680(Sensor):
-    def __init__(self) -> None:
+    period_ms = 200
+    priority = 5
+    
+    def __init__(self, integer_compensation: bool = False) -> None:
         self.i2c = busio.I2C(scl=board.GP21, sda=board.GP20)
         self.bme680 = adafruit_bme680.Adafruit_BME680_I2C(self.i2c)
+        self.bme680.integer_compensation = integer_compensation
+        self.started = 0
     
     def get_data(self, t:int) -> list[SensorData]:
-        return [
-            SensorData(0, t, str(self.bme680.temperature)),
-            SensorData(1, t, str(self.bme680.pressure)),
-            SensorData(2, t, str(self.bme680.relative_humidity)),
-            SensorData(3, t, str(self.bme680.gas))
-        ]
+        # Collect the measurement started in the previous period and start the
+        # next one, the heater runs while the loop samples the other sensors
+        readings = []
+        if self.bme680.measuring:
+            values = self.bme680.try_collect()
+            if values is None:
+                return readings
+            temperature, pressure, humidity, gas = values
+            readings = [
+                SensorData(0, self.started, temperature),
+                SensorData(1, self.started, pressure),
+                SensorData(2, self.started, humidity),
+                SensorData(3, self.started, gas)
+            ]
+        self.started = t
+        self.bme680.start_measurement()
+        return readings
 
 class NitrogenDioxideSensor(Sensor):
     def __init__(self) -> None:
@@ -125,7 +170,7 @@ class NitrogenDioxideSensor(Sensor):
     
     def get_data(self, t:int) -> list[SensorData]:
         return [
-            SensorData(33, t, str(self.pin.read_u16()))
+            SensorData(33, t, self.pin.read_u16())
         ]
         
 class DustSensor(Sensor):
@@ -134,35 +179,89 @@ class DustSensor(Sensor):
     
     def get_data(self, t:int) -> list[SensorData]:
         return [
-            SensorData(31, t, str(self.pin.read_u16()))
+            SensorData(31, t, self.pin.read_u16())
         ]
 
 class MPU9250(Sensor):
+    period_ms = 10
+    priority = 10
+    
     def __init__(self) -> None:
         self.i2c = machine_I2C(0, scl=Pin(21), sda=Pin(20))
         self.mpu9250 = mpu9250.MPU9250(self.i2c)
+        # 100 Hz, the sampling rate of this sensor
+        self.mpu9250.ak8963.start_continuous()
+        self.motion = [0.0] * 7
+        self.magnetic = [0.0] * 3
     def get_data(self,t :int) -> list[SensorData]:
-        return [
-            SensorData(19, t, str(self.mpu9250.acceleration)),
+        ax, ay, az, temp, gx, gy, gz = self.mpu9250.read_motion(self.motion)
+        data = [
+            SensorData(19, t, ax),
+            SensorData(20, t, ay),
+            SensorData(21, t, az),
+            SensorData(22, t, gx),
+            SensorData(23, t, gy),
+            SensorData(24, t, gz),
+            SensorData(28, t, temp),
         ]
+        # Only when the magnetometer has a new measurement
+        if self.mpu9250.ak8963.read_magnetic(self.magnetic) is not None:
+            mx, my, mz = self.magnetic
+            data.append(SensorData(25, t, mx))
+            data.append(SensorData(26, t, my))
+            data.append(SensorData(27, t, mz))
+        return data
+
+    def instrument(self, stats: instrument.Registry) -> None:
+        ak8963 = self.mpu9250.ak8963
+        stats.gauge("mag_overruns", lambda: ak8963.overruns)
         
 class GPSModul(Sensor):
-    def __init__(self) -> None:
-        self.i2c = busio.I2C(scl=board.GP21, sda=board.GP20)
-        self.gps = adafruit_gps.GPS_GtopI2C(self.i2c, debug=True)
+    # Polled at least every 250 ms so reading the NMEA stays in short slices,
+    # each at most budget_ms
+    period_ms = 250
+    budget_ms = 20
+    # Only the sentences with the logged fields
+    sentences = ("GGA", "RMC")
+    
+    def __init__(self, rate_hz: float = 1, uart: bool = False) -> None:
+        if uart:
+            # Off the shared I2C bus, BufferedUART receives from the UART interrupt
+            self.uart = BufferedUART(UART(board.GP16, board.GP17, baudrate=9600, rxbuf=512))
+            self.gps = adafruit_gps.GPS(self.uart, debug=False)
+        else:
+            self.uart = None
+            self.i2c = busio.I2C(scl=board.GP21, sda=board.GP20)
+            self.gps = adafruit_gps.GPS_GtopI2C(self.i2c, debug=False)
+        self.gps.configure(self.sentences, rate_hz)
+        self.period_ms = min(GPSModul.period_ms, int(1000 / rate_hz))
     
     def get_data(self, t:int) -> list[SensorData]:
-        self.gps.update()
+        # Only log a position from a fix received since the last call
+        changed = self.gps.update_all(self.budget_ms)
         if self.gps.has_fix:
+            if not changed & adafruit_gps.FIELD_POSITION:
+                return []
             return [
-                SensorData(14, t, str(self.gps.latitude)),
-                SensorData(15, t, str(self.gps.longitude)),
-                SensorData(16, t, str(self.gps.altitude_m)),
+                SensorData(14, t, self.gps.latitude),
+                SensorData(15, t, self.gps.longitude),
+                SensorData(16, t, self.gps.altitude_m),
             ]
         else:     
             return [
-                SensorData(34, t, str(self.gps.has_fix))
+                SensorData(34, t, self.gps.has_fix)
             ]
+    
+    def instrument(self, stats: instrument.Registry) -> None:
+        gps = self.gps
+        stats.gauge("gps_sentences", lambda: gps.sentences_parsed)
+        stats.gauge("gps_dropped", lambda: gps.sentences_dropped)
+        stats.gauge("gps_overruns", lambda: gps.budget_overruns)
+        stats.gauge("gps_backlog", lambda: gps.backlog)
+        stats.gauge("gps_skipped", lambda: gps.sentences_skipped)
+        if self.uart is not None:
+            uart = self.uart
+            stats.gauge("gps_uart_overflows", lambda: uart.overflows)
 
 class CCS811(Sensor):
     def __init__(self) -> None:
@@ -172,8 +271,8 @@ class CCS811(Sensor):
     def get_data(self, t:int) -> list[SensorData]:
         t = time.ticks_ms()
         return [
-            SensorData(29, t, str(self.ccs811.eco2)),
-            SensorData(30, t, str(self.ccs811.tvoc)),
+            SensorData(29, t, self.ccs811.eco2),
+            SensorData(30, t, self.ccs811.tvoc),
         ]
         
 class OxygenSensor(Sensor):
@@ -185,7 +284,7 @@ class OxygenSensor(Sensor):
     
     def get_data(self, t:int) -> list[SensorData]:
         return [
-            SensorData(32, t, str(self.o2_sensor.get_oxygen_data(self.collect_number)))
+            SensorData(32, t, self.o2_sensor.get_oxygen_data(self.collect_number))
         ]
         
 class Mosfet:
@@ -226,10 +325,17 @@ class CanSatLoRa:
             reset_pin=RFM95_RST
         )
     
-    def send(self, data:str):
-        self.lora.send_to_wait(data, SERVER_ADDRESS)
+    def send(self, data) -> bool:
+        # Queued, the radio sends it in the background
+        return self.lora.enqueue(data, SERVER_ADDRESS) is not None
+    
+    def poll(self) -> int:
+        return self.lora.poll()
 
 class Pico(Sensor):
+    period_ms = 10000
+    priority = 0
+    
     def __init__(self) -> None:
         pass
     
@@ -248,9 +354,9 @@ class Pico(Sensor):
         ram_free, ram_allocated = self.ram_stats()
         sysname, nodename, release, version, machine = self.device_info()
         return [
-            SensorData(4, t, str(ram_free)),
-            SensorData(5, t, str(ram_allocated)),
-            SensorData(6, t, str(self.cpu_temperature())),
+            SensorData(4, t, ram_free),
+            SensorData(5, t, ram_allocated),
+            SensorData(6, t, self.cpu_temperature()),
             SensorData(7, t, sysname),
             SensorData(8, t, nodename),
             SensorData(9, t, release),
@@ -266,6 +372,15 @@ class SDCard:
         self.spi = spi
         self.cs = cs
         self.mounted = False
+        self.writers = {}
+        # Writers dropped after an error or a full raw log
+        self.errors = 0
+        # Stream headers by file name, and the streams to restart after a dropped writer
+        self.headers = {}
+        self.resync = set()
+        self.buffer_size = SD_BUFFER_SIZE
+        self.flush_ms = SD_FLUSH_MS
+        self.sync_ms = SD_SYNC_MS
         
         
     def mount(self) -> bool:
@@ -283,19 +398,89 @@ class SDCard:
             return False
         
     
-    def write(self, filename:str, text:str) -> bool:
+    def start(self, filename:str, header: bytes) -> bool:
+        ok = self.write(filename, header)
+        # A stream file, a new file for it starts with the header again
+        self.headers[filename] = header
+        return ok
+    
+    def write(self, filename:str, data) -> bool:
         if self.mounted:
-            joined_name = f"/{self.mount_name}/{filename}"
-            
+            if filename in self.resync:
+                # The data depends on what was lost, the stream has to be restarted
+                return False
+            return self._write(filename, data)
+        return False
+    
+    def restart(self, filename:str, data) -> bool:
+        # Continue a stream after its writer was dropped, data has to decode on its own
+        if self.mounted and self._write(filename, data):
+            self.resync.discard(filename)
+            return True
+        return False
+    
+    def _write(self, filename:str, data) -> bool:
+        joined_name = f"/{self.mount_name}/{filename}"
+        if isinstance(data, str):
+            data = data.encode()
+        
+        try:
+            writer = self.writers.get(filename)
+            if writer is None:
+                # Keep the file open, data is flushed in whole blocks
+                writer = BufferedWriter(joined_name, self.buffer_size, self.flush_ms, self.sync_ms)
+                self.writers[filename] = writer
+                header = self.headers.get(filename)
+                if header is not None and writer.pos == 0:
+                    writer.write(header)
+            if writer.write(data) is False:
+                # Raw log region full, the next write opens a FAT file instead
+                logger.error(f"Raw log {joined_name} is full")
+                self._drop(filename)
+                return False
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error writing to {joined_name}: {e}")
+            # Reopen on the next write, the file handle must not leak
+            self._drop(filename)
+            return False
+    
+    def _drop(self, filename:str) -> None:
+        self.errors += 1
+        if filename in self.headers:
+            self.resync.add(filename)
+        writer = self.writers.pop(filename, None)
+        if writer is not None:
             try:
-                with open(joined_name, "a") as f:
-                    f.write(text)       
+                writer.close()
+            except Exception as e:
+                logger.error(f"Error closing {filename} on {self.name}: {e}")
+    
+    def open_raw_log(self, filename:str, nblocks:int) -> bool:
+        # Log to a reserved block region at the end of the card instead of a FAT file
+        if self.mounted:
+            try:
+                self.writers[filename] = BlockLog(self.card, nblocks=nblocks, flush_ms=self.flush_ms)
                 return True
-            
             except Exception as e:
-                logger.error(f"Error writing to {joined_name}: {e}")
-                return False
+                logger.error(f"Error opening raw log on {self.name}: {e}")
         return False
+    
+    def poll(self) -> None:
+        for filename, writer in self.writers.items():
+            try:
+                writer.poll()
+            except Exception as e:
+                logger.error(f"Error flushing {filename} on {self.name}: {e}")
+    
+    def close(self) -> None:
+        for filename, writer in self.writers.items():
+            try:
+                writer.close()
+            except Exception as e:
+                logger.error(f"Error closing {filename} on {self.name}: {e}")
+        self.writers.clear()
 
 class SdCardArray:
     def __init__(self) -> None:
@@ -306,45 +491,193 @@ class SdCardArray:
             card.mount()
         return True
 
-    def write_all(self, filename:str, text:str) -> bool:
+    def start_all(self, filename:str, header: bytes) -> None:
+        for card in self.cards:
+            card.start(filename, header)
+    
+    def write_all(self, filename:str, data) -> list:
+        # Returns the cards that have to restart the stream, or None
+        failed = None
+        for card in self.cards:
+            if not card.write(filename, data) and filename in card.resync:
+                if failed is None:
+                    failed = []
+                failed.append(card)
+        return failed
+    
+    def configure(self, conf: dict) -> None:
         for card in self.cards:
-            card.write(filename, text)
+            card.buffer_size = conf.get("sd_buffer_size", SD_BUFFER_SIZE)
+            card.flush_ms = conf.get("sd_flush_ms", SD_FLUSH_MS)
+            card.sync_ms = conf.get("sd_sync_ms", SD_SYNC_MS)
+    
+    def open_raw_log_all(self, filename:str, nblocks:int) -> bool:
+        for card in self.cards:
+            card.open_raw_log(filename, nblocks)
         return True
+    
+    def poll_all(self) -> None:
+        for card in self.cards:
+            card.poll()
+    
+    def report(self) -> None:
+        for card in self.cards:
+            for filename, writer in card.writers.items():
+                st = writer.stats
+                avg = st.flush_ms_total / st.writes if st.writes else 0
+                logger.info(f"{card.name}/{filename}: {st.writes} writes, {st.bytes} bytes, flush {avg:.1f}/{st.flush_ms_max} ms, {st.syncs} syncs, sync max {st.sync_ms_max} ms")
+    
+    def close_all(self) -> None:
+        for card in self.cards:
+            card.close()
 
 
 class IOThread(Thread):
-    def __init__(self, lock, conf: dict, cards: SdCardArray, lora: CanSatLoRa, sensor_data: list[SensorData]) -> None:
+    def __init__(self, conf: dict, cards: SdCardArray, lora: CanSatLoRa, pipeline: PagePipeline, stats: instrument.Registry) -> None:
         super(IOThread, self).__init__()
-        self.lock = lock
-        self.local_sensor_data = []
         self.lora = lora
-        self.sensor_data = sensor_data
+        self.pipeline = pipeline
         self.conf = conf
         self.cards: SdCardArray = cards
+        self.decoder = telemetry.Decoder()
+        self.packer = FramePacker(compressed=conf.get("lora_compress", False))
+        # Delta compressed SD stream, the pages always carry plain records
+        self.sd_encoder = compress.Encoder(pipeline.page_size) if conf.get("sd_compress", False) else None
+        self.stats = stats
+        self.sd_write_time = stats.histogram("sd_write")
+        self.sd_poll_time = stats.histogram("sd_poll")
+        self.lora_send_time = stats.histogram("lora_send")
+        self.gc_time = stats.histogram("gc")
+        self.sd_bytes = stats.counter("sd_bytes")
+        stats.gauge("lora_overwritten", lambda: self.packer.stats.overwritten)
+        stats.gauge("lora_sent", lambda: lora.lora.tx_ok)
+        stats.gauge("lora_failed", lambda: lora.lora.tx_failed)
+        stats.gauge("lora_dropped", lambda: lora.lora.tx_dropped)
+        stats.gauge("sd_errors", lambda: sum(card.errors for card in cards.cards))
     
-    def run(self):
+    def write_plain(self, filename: str, data) -> None:
+        base = self.decoder.time
+        failed = self.cards.write_all(filename, data)
+        if failed:
+            # The page continues from the last record of the previous one
+            for card in failed:
+                if card.restart(filename, telemetry.time_record(base)):
+                    card.write(filename, data)
+        self.packer.feed(self.decoder, data)
+    
+    def write_compressed(self, filename: str, data) -> None:
+        encoder = self.sd_encoder
+        base = self.decoder.time
+        first = 0
         i = 0
+        for sensor_id, t, offset, size in self.decoder.raw_records(data):
+            self.packer.offer(sensor_id, t, data, offset, size)
+            value = None if size < 0 else telemetry.unpack_value(data, offset, sensor_id)[0]
+            if not encoder.add(sensor_id, t, value):
+                self.write_chunk(filename, data, base, first, i)
+                first = i
+                encoder.add(sensor_id, t, value)
+            i += 1
+        self.write_chunk(filename, data, base, first, i)
+    
+    def write_chunk(self, filename: str, data, base: int, first: int, end: int) -> None:
+        # The encoder holds records first to end - 1 of the page
+        failed = self.cards.write_all(filename, self.sd_encoder.take())
+        if failed:
+            self.restart_compressed(failed, filename, data, base, first, end)
+    
+    def restart_compressed(self, cards: list, filename: str, data, base: int, first: int, end: int) -> None:
+        # Encode the chunk again from zero state, it must not depend on the lost bytes
+        encoder = compress.Encoder(len(self.sd_encoder.buf))
+        encoder.resync()
+        decoder = telemetry.Decoder()
+        decoder.time = base
+        write = SDCard.restart
+        i = 0
+        for sensor_id, t, offset, size in decoder.raw_records(data):
+            if i == end:
+                break
+            if i >= first:
+                value = None if size < 0 else telemetry.unpack_value(data, offset, sensor_id)[0]
+                if not encoder.add(sensor_id, t, value):
+                    chunk = encoder.take()
+                    for card in cards:
+                        write(card, filename, chunk)
+                    write = SDCard.write
+                    encoder.add(sensor_id, t, value)
+            i += 1
+        chunk = encoder.take()
+        for card in cards:
+            write(card, filename, chunk)
+        # Every card continues from zero state, the healthy ones after a reset record
+        self.sd_encoder.resync()
+    
+    def run(self):
         r = self.conf["runs"]
+        filename = f"data-{r}.bin"
+        stats_filename = f"stats-{r}.json"
+        raw_log_blocks = self.conf.get("raw_log_blocks", 0)
+        if raw_log_blocks:
+            self.cards.open_raw_log_all(filename, raw_log_blocks)
+        self.cards.start_all(filename, compress.header() if self.sd_encoder else telemetry.header())
+        send_health = self.conf.get("lora_health", False)
+        health_due = False
+        last_report = time.ticks_ms()
+        last_send = last_report
+        last_gc = last_report
         while True:
             t = time.ticks_ms()
-            with self.lock:
-                self.local_sensor_data = self.sensor_data.copy()
-                self.sensor_data.clear()
+            data = self.pipeline.take()
             
-            if len(self.local_sensor_data) != 0:
-                fcsv = "\n".join([x.csv() for x in self.local_sensor_data]) + "\n"
-                self.cards.write_all(f"data-{r}.csv", fcsv) # Write to cards
-                fcsv2 = "\n".join([x.csv() for x in self.local_sensor_data[:1]]) + "\n"
-                self.lora.send(fcsv2) # Send to base station
-                
-                
+            if data is not None:
+                t0 = time.ticks_us()
+                n = len(data)
+                if self.sd_encoder is None:
+                    self.write_plain(filename, data) # Write to cards
+                else:
+                    self.write_compressed(filename, data)
+                # The writers copied it, the sampling core can refill the page
+                self.pipeline.release()
+                self.sd_write_time.since(t0)
+                self.sd_bytes.add(n)
+            
+            # Only pack a new frame once the previous one is out, so it carries the newest data
+            if self.lora.poll() == 0:
+                t0 = time.ticks_us()
+                try:
+                    if health_due:
+                        health_due = False
+                        self.lora.send(self.stats.health_frame(t))
+                        self.lora_send_time.since(t0)
+                    elif time.ticks_diff(t, last_send) >= LORA_INTERVAL:
+                        frame = self.packer.frame()
+                        if frame is not None:
+                            last_send = t
+                            self.lora.send(frame) # Send to base station
+                            self.lora_send_time.since(t0)
+                except ValueError as e:
+                    # A frame the radio does not take must not stop the SD logging
+                    logger.error(f"Error sending LoRa frame: {e}")
             
-            i += len(self.local_sensor_data)
-            dt = (time.ticks_ms() - t)
-            if dt !=0:
-                print(f"Writing {len(self.local_sensor_data)} took {time.ticks_ms() - t} ms, total: {i}, speed: {len(self.local_sensor_data)/dt*100}")
+            t0 = time.ticks_us()
+            self.cards.poll_all() # Time based flush and sync
+            self.sd_poll_time.since(t0)
             
+            # Collect here, while the card is idle, rather than inside a sensor read
+            if time.ticks_diff(t, last_gc) >= GC_INTERVAL:
+                last_gc = t
+                t0 = time.ticks_us()
+                gc.collect()
+                self.gc_time.since(t0)
             
+            if time.ticks_diff(t, last_report) >= STATS_INTERVAL:
+                last_report = t
+                self.cards.write_all(stats_filename, self.stats.dump(t))
+                health_due = send_health
+                self.cards.report()
+                st = self.packer.stats
+                lora = self.lora.lora
+                logger.info(f"LoRa: {st.frames} frames, {st.bytes_per_frame():.1f} bytes/frame, {st.readings_per_frame():.1f} readings/frame, {st.overwritten} overwritten, sent {lora.tx_ok}, failed {lora.tx_failed}, dropped {lora.tx_dropped}")
             
             time.sleep(0.1)
             
@@ -354,7 +687,22 @@ class CanSat:
         self.pico = Pico()
         self.sdcard_array = SdCardArray()
         self.sensors = []
-        self.sensor_data = []
+        # Sampling encodes straight into the pages the IO core consumes
+        self.pipeline = PagePipeline(PAGE_SIZE)
+        self.encoder = telemetry.Encoder(0)
+        self.encoder.rebind(self.pipeline.page())
+        self.page_started = 0
+        self.scheduler = Scheduler()
+        self.stats = instrument.Registry()
+        self.encode_time = self.stats.histogram("encode")
+        self.blocked_time = self.stats.histogram("sampling_blocked")
+        self.readings = self.stats.counter("readings")
+        self.sensor_errors = self.stats.counter("sensor_errors")
+        pipeline = self.pipeline
+        self.stats.gauge("pages", lambda: pipeline.handed)
+        self.stats.gauge("blocked_us", lambda: pipeline.blocked_us)
+        self.stats.gauge("dropped_pages", lambda: pipeline.dropped_pages)
+        self.stats.gauge("dropped_bytes", lambda: pipeline.dropped)
         self.onboard_led = Pin(25, Pin.OUT)
         self.onboard_led.off()
 
@@ -389,12 +737,16 @@ class CanSat:
                 
         except Exception as e:
             logger.error(f"Fatal Error loading configuration: {e}")
+            # Keep sampling without a card, the defaults apply
+            self.conf = dict(DEFAULT_CONF)
+        
+        self.sdcard_array.configure(self.conf)
         
         # Setup LoRa
         
         # Setup sensors
         try:
-            bme680 = BME680()
+            bme680 = BME680(self.conf.get("bme680_integer", False))
             self.sensors.append(bme680)
             del bme680
         except Exception as e:
@@ -442,7 +794,7 @@ class CanSat:
         except Exception as e:
             logger.error(f"Error initializing MPU9250: {e}")"""
         try:
-            gps = GPSModul()
+            gps = GPSModul(self.conf.get("gps_rate_hz", 1), self.conf.get("gps_uart", False))
             self.sensors.append(gps)
             del gps
         
@@ -458,9 +810,8 @@ class CanSat:
         logger.info(self.sensors)
         errorm = False
         # Threading
-        self.thread_lock = _thread.allocate_lock()
         try:
-            self.io_thread = IOThread(self.thread_lock, self.conf, self.sdcard_array, self.lora, self.sensor_data)
+            self.io_thread = IOThread(self.conf, self.sdcard_array, self.lora, self.pipeline, self.stats)
             self.io_thread.start()
         except:
             errorm = True
@@ -471,41 +822,79 @@ class CanSat:
             self.buzzer.turn_off()
         
         
+    def publish(self, full: bool) -> None:
+        # Hand the page to the IO core and continue in the other one. A page
+        # that is not full yet is kept while the IO core is busy.
+        pipeline = self.pipeline
+        if not pipeline.ready():
+            if not full:
+                return
+            t0 = time.ticks_us()
+            ready = pipeline.wait(PAGE_WAIT_MS)
+            self.blocked_time.since(t0)
+            if not ready:
+                # Discard the page, the next record carries an absolute time
+                pipeline.drop(self.encoder.n)
+                self.encoder.take()
+                self.encoder.resync()
+                return
+        pipeline.submit(self.encoder.n)
+        self.encoder.rebind(pipeline.page())
+        self.page_started = time.ticks_ms()
+        
     def run(self):
         self.setup()
         logger.info("CanSat started")
         
-        run_intervall = 1
-        
-        
-        
         """print(self.bme680.get_data())
         print(self.oxygen.get_data())
         print(self.gps.get_data())
         print("hi")"""
         #print(self.mpu.get_data())
         
+        seen = {}
+        for s in self.sensors:
+            task = self.scheduler.add(s)
+            # Instrument names have to be unique, sensors of one class are numbered
+            name = type(s).__name__
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                name = f"{name}{seen[name]}"
+            task.latency = self.stats.histogram(f"get_data.{name}")
+            st = task.stats
+            self.stats.gauge(f"overruns.{name}", lambda st=st: st.overruns)
+            self.stats.gauge(f"deferred.{name}", lambda st=st: st.deferred)
+            self.stats.gauge(f"jitter_avg.{name}", st.jitter_avg)
+            self.stats.gauge(f"jitter_max.{name}", lambda st=st: st.jitter_max)
+            s.instrument(self.stats)
+        
+        cd = []
         while True:
-            t = time.ticks_ms()
-            cd = []
-            for s in self.sensors:
+            for task in self.scheduler.due(time.ticks_ms()):
+                t = time.ticks_ms()
+                t0 = time.ticks_us()
                 try:
-                    cd.extend(s.get_data(t))
+                    cd.extend(task.sensor.get_data(t))
                 except Exception as e:
-                    logger.error(f"Error getting data from {s}: {e}")
+                    self.sensor_errors.add()
+                    logger.error(f"Error getting data from {task.sensor}: {e}")
+                task.latency.since(t0)
+                self.scheduler.done(task, t, time.ticks_ms())
             
-            with self.thread_lock:
-                self.sensor_data.extend(cd)
-            cd.clear()
+            if cd:
+                t0 = time.ticks_us()
+                for x in cd:
+                    if not self.encoder.add(x.id, x.time, x.value):
+                        self.publish(True)
+                        self.encoder.add(x.id, x.time, x.value)
+                self.encode_time.since(t0)
+                self.readings.add(len(cd))
+                cd.clear()
             
-            logger.info(f"Getting data took {time.ticks_ms() - t} ms")
+            if self.encoder.n and time.ticks_diff(time.ticks_ms(), self.page_started) >= PAGE_MS:
+                self.publish(False)
             
-            dt = time.ticks_ms() - t
-            
-            if dt<run_intervall*1000:
-                time.sleep_ms((run_intervall*1000) - dt)
-            else:
-                logger.info("Behind time, skipping sleep")
+            time.sleep_ms(self.scheduler.sleep_time(time.ticks_ms()))
         #for i in range(1000):
         #    with self.thread_lock:
         #        self.sensor_data.extend([SensorData(0, time.ticks_ms(), str(self.pico.ram_stats()[0]))])
@@ -523,6 +912,7 @@ class CanSat:
         
         
         
-cansat = CanSat()
-cansat.run()
+if __name__ == "__main__":
+    cansat = CanSat()
+    cansat.run()
     
\ No newline at end of file
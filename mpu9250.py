@@ -89,6 +89,13 @@ class MPU9250:
         """
         return self.ak8963.magnetic
 
+    def read_motion(self, out=None):
+        """
+        Acceleration, die temperature and gyro of the same sample in one
+        read, see `MPU6500.read_motion`.
+        """
+        return self.mpu6500.read_motion(out)
+
     @property
     def whoami(self):
         return self.mpu6500.whoami
@@ -0,0 +1,84 @@
+"""
+Double buffered page hand-off between the sampling core and the IO core.
+
+The sampling core encodes readings straight into one page while the IO core
+works on the other one, so no data is copied between the cores and nothing
+is allocated. Page ownership is the only shared state:
+
+* ``lengths[i] == 0``: page ``i`` belongs to the producer
+* ``lengths[i] > 0``: page ``i`` holds that many bytes for the consumer
+
+Only the producer sets a length, only the consumer clears it, and each side
+publishes a page only after it is done with it, which is safe without a lock
+for exactly one producer and one consumer.
+
+The producer has to wait when it wants to hand over a page while the consumer
+still owns the other one. ``wait`` measures that, it is the time sampling is
+blocked by IO and should stay close to zero.
+"""
+
+import time
+
+
+class PagePipeline:
+    def __init__(self, page_size: int) -> None:
+        self.pages = [bytearray(page_size), bytearray(page_size)]
+        self.mvs = [memoryview(x) for x in self.pages]
+        self.lengths = [0, 0]
+        # Page the producer fills
+        self.fill = 0
+        self.handed = 0
+        self.waits = 0
+        self.blocked_us = 0
+        self.dropped_pages = 0
+        self.dropped = 0
+
+    @property
+    def page_size(self) -> int:
+        return len(self.pages[0])
+
+    # -- producer side
+
+    def page(self) -> bytearray:
+        """The page to fill."""
+        return self.pages[self.fill]
+
+    def ready(self) -> bool:
+        """True if the consumer has released the other page."""
+        return self.lengths[1 - self.fill] == 0
+
+    def submit(self, n: int) -> None:
+        """Hand over the first ``n`` bytes of the current page, requires ``ready()``."""
+        if n:
+            self.lengths[self.fill] = n
+            self.handed += 1
+            self.fill = 1 - self.fill
+
+    def wait(self, timeout_ms: int) -> bool:
+        """Wait up to ``timeout_ms`` for ``ready()``, the time is added to ``blocked_us``."""
+        if self.ready():
+            return True
+        self.waits += 1
+        start = time.ticks_us()
+        while not self.ready() and time.ticks_diff(time.ticks_us(), start) < timeout_ms * 1000:
+            time.sleep_us(100)
+        self.blocked_us += time.ticks_diff(time.ticks_us(), start)
+        return self.ready()
+
+    def drop(self, n: int) -> None:
+        """Record that ``n`` bytes of the current page were discarded."""
+        self.dropped_pages += 1
+        self.dropped += n
+
+    # -- consumer side
+
+    def take(self):
+        """Memoryview of the page handed over, or None. Call ``release`` when done."""
+        i = 1 - self.fill
+        n = self.lengths[i]
+        if n == 0:
+            return None
+        return self.mvs[i][:n]
+
+    def release(self) -> None:
+        self.lengths[1 - self.fill] = 0
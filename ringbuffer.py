@@ -0,0 +1,68 @@
+"""
+Fixed capacity single producer / single consumer byte ring buffer.
+
+The producer only ever moves ``head`` and the consumer only ever moves
+``tail``, so the two sides can run on different cores without a lock as long
+as there is exactly one of each. Data is copied into a preallocated bytearray,
+no objects are created per write.
+
+A write is all or nothing: if the data does not fit, nothing is written and
+``overflows``/``dropped`` are incremented. Writing whole records therefore
+guarantees the consumer only ever sees whole records.
+"""
+
+
+class RingBuffer:
+    def __init__(self, capacity: int) -> None:
+        # One byte stays unused to tell a full buffer from an empty one
+        self.size = capacity + 1
+        self.buf = bytearray(self.size)
+        self.mv = memoryview(self.buf)
+        self.head = 0
+        self.tail = 0
+        self.overflows = 0
+        self.dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.size - 1
+
+    def used(self) -> int:
+        return (self.head - self.tail) % self.size
+
+    def free(self) -> int:
+        return self.size - 1 - self.used()
+
+    def write(self, data) -> bool:
+        """Copy all of ``data`` into the buffer (producer side)."""
+        n = len(data)
+        if n > self.free():
+            self.overflows += 1
+            self.dropped += n
+            return False
+        head = self.head
+        first = min(n, self.size - head)
+        self.mv[head:head + first] = data[:first]
+        if first < n:
+            self.mv[0:n - first] = data[first:n]
+        # Publish only after the data is in place
+        self.head = (head + n) % self.size
+        return True
+
+    def readinto(self, buf, nbytes: int = None) -> int:
+        """Move up to ``nbytes`` (default ``len(buf)``) into ``buf`` (consumer side).
+
+        Returns the number of bytes read.
+        """
+        if nbytes is None:
+            nbytes = len(buf)
+        n = min(nbytes, self.used())
+        if n == 0:
+            return 0
+        tail = self.tail
+        first = min(n, self.size - tail)
+        buf[0:first] = self.mv[tail:tail + first]
+        if first < n:
+            buf[first:n] = self.mv[0:n - first]
+        self.tail = (tail + n) % self.size
+        return n
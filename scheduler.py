@@ -0,0 +1,114 @@
+"""
+Deadline based multi-rate scheduler for the sampling loop.
+
+Every sensor declares ``period_ms`` and ``priority`` (higher runs first). The
+scheduler hands out the sensors that are due in priority order and keeps per
+sensor timing statistics. A sensor whose deadline was missed by one or more
+whole periods is not sampled repeatedly to catch up, the missed periods are
+counted as overruns instead.
+
+The loop is cooperative, so a slow sensor can still delay a fast one. To limit
+that, a due sensor is deferred while a higher priority sensor becomes due
+before it would finish (judged by its average run time), unless it is already
+late by a whole period itself.
+"""
+
+import time
+
+
+class SensorStats:
+    def __init__(self) -> None:
+        self.runs = 0
+        self.overruns = 0
+        self.deferred = 0
+        self.jitter_max = 0
+        self.jitter_total = 0
+        self.duration_max = 0
+        self.duration_total = 0
+
+    def jitter_avg(self) -> float:
+        return self.jitter_total / self.runs if self.runs else 0
+
+    def duration_avg(self) -> float:
+        return self.duration_total / self.runs if self.runs else 0
+
+
+class Task:
+    def __init__(self, sensor, now: int) -> None:
+        self.sensor = sensor
+        self.period = sensor.period_ms
+        self.priority = sensor.priority
+        self.deadline = now
+        # Deadline of the higher priority task this one waits for, None if not deferred
+        self.deferred_until = None
+        self.stats = SensorStats()
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self.tasks = []
+
+    def add(self, sensor) -> Task:
+        task = Task(sensor, time.ticks_ms())
+        self.tasks.append(task)
+        # Keep the list in priority order so due() does not have to sort
+        self.tasks.sort(key=lambda x: -x.priority)
+        return task
+
+    def due(self, now: int) -> list:
+        """Tasks to run now, highest priority first."""
+        due = []
+        for task in self.tasks:
+            late = time.ticks_diff(now, task.deadline)
+            if late < 0:
+                continue
+            blocked = self._blocks_higher(task, now) if late < task.period else None
+            if blocked is not None:
+                # Counted once per period, done() clears it
+                if task.deferred_until is None:
+                    task.stats.deferred += 1
+                task.deferred_until = blocked.deadline
+                continue
+            due.append(task)
+        return due
+
+    def _blocks_higher(self, task: Task, now: int):
+        """The higher priority task that becomes due before ``task`` would finish, or None."""
+        finish = time.ticks_add(now, int(task.stats.duration_avg()))
+        for other in self.tasks:
+            if other.priority <= task.priority:
+                return None
+            if time.ticks_diff(other.deadline, finish) < 0 and time.ticks_diff(other.deadline, now) > 0:
+                return other
+        return None
+
+    def done(self, task: Task, start: int, end: int) -> None:
+        """Update the statistics and the next deadline after ``task`` ran."""
+        stats = task.stats
+        jitter = time.ticks_diff(start, task.deadline)
+        duration = time.ticks_diff(end, start)
+        stats.runs += 1
+        stats.jitter_total += jitter
+        stats.jitter_max = max(stats.jitter_max, jitter)
+        stats.duration_total += duration
+        stats.duration_max = max(stats.duration_max, duration)
+
+        deadline = time.ticks_add(task.deadline, task.period)
+        missed = time.ticks_diff(end, deadline) // task.period
+        if missed > 0:
+            # Skip the periods that passed while we were busy
+            stats.overruns += missed
+            deadline = time.ticks_add(deadline, missed * task.period)
+        task.deadline = deadline
+        task.deferred_until = None
+
+    def sleep_time(self, now: int) -> int:
+        """Milliseconds until the next deadline, a deferred task waits for the
+        deadline of the task it was deferred for."""
+        if not self.tasks:
+            return 1000
+        return max(0, min(
+            time.ticks_diff(x.deadline if x.deferred_until is None else x.deferred_until, now)
+            for x in self.tasks
+        ))
+
@@ -0,0 +1,112 @@
+"""
+Buffered, block aligned file writer for the SD cards.
+
+The file stays open for the whole flight. Data is collected in a preallocated
+buffer and written out in whole 512 byte blocks (relative to the file offset),
+so FAT never has to read-modify-write a partially filled sector and never has
+to walk the cluster chain again for an ``open``.
+
+* When more than ``buffer_size`` bytes are pending, the aligned part is written
+  and the tail stays in the buffer.
+* ``poll`` writes everything pending once the oldest data is ``flush_ms`` old,
+  which bounds the amount of data lost on a power cut.
+* ``poll`` syncs the file (directory entry and FAT) every ``sync_ms``.
+"""
+
+import time
+
+BLOCK_SIZE = 512
+
+
+class FlushStats:
+    def __init__(self) -> None:
+        self.writes = 0
+        self.bytes = 0
+        self.syncs = 0
+        self.flush_ms_total = 0
+        self.flush_ms_max = 0
+        self.sync_ms_max = 0
+
+
+class BufferedWriter:
+    def __init__(self, path: str, buffer_size: int = 4096, flush_ms: int = 1000, sync_ms: int = 5000) -> None:
+        # At least two blocks, see _flush_aligned
+        if buffer_size < 2 * BLOCK_SIZE or buffer_size % BLOCK_SIZE:
+            raise ValueError("buffer_size must be a multiple of 512, at least 1024")
+        self.path = path
+        self.flush_ms = flush_ms
+        self.sync_ms = sync_ms
+        self.f = open(path, "ab")
+        self.pos = self.f.seek(0, 2)
+        # One extra block so an aligned flush always leaves room for the tail
+        self.buf = bytearray(buffer_size + BLOCK_SIZE)
+        self.mv = memoryview(self.buf)
+        self.threshold = buffer_size
+        self.n = 0
+        self.first_pending = 0
+        self.last_sync = time.ticks_ms()
+        self.stats = FlushStats()
+
+    def write(self, data) -> None:
+        data = memoryview(data)
+        while len(data):
+            if self.n == 0:
+                self.first_pending = time.ticks_ms()
+            k = min(len(data), len(self.buf) - self.n)
+            self.mv[self.n:self.n + k] = data[:k]
+            self.n += k
+            data = data[k:]
+            if self.n >= self.threshold:
+                self._flush_aligned()
+
+    def _flush_aligned(self) -> None:
+        end = (self.pos + self.n) // BLOCK_SIZE * BLOCK_SIZE
+        k = end - self.pos
+        if k <= 0:
+            return
+        self._write_out(k)
+        rest = self.n - k
+        # n >= threshold >= 2 * BLOCK_SIZE, so k > n - BLOCK_SIZE > rest and
+        # the regions do not overlap
+        self.mv[0:rest] = self.mv[k:self.n]
+        self.n = rest
+        if rest:
+            self.first_pending = time.ticks_ms()
+
+    def _write_out(self, k: int) -> None:
+        t = time.ticks_ms()
+        self.f.write(self.mv[:k])
+        dt = time.ticks_diff(time.ticks_ms(), t)
+        self.pos += k
+        stats = self.stats
+        stats.writes += 1
+        stats.bytes += k
+        stats.flush_ms_total += dt
+        stats.flush_ms_max = max(stats.flush_ms_max, dt)
+
+    def flush(self) -> None:
+        """Write everything pending, aligned or not."""
+        if self.n:
+            self._write_out(self.n)
+            self.n = 0
+
+    def sync(self) -> None:
+        t = time.ticks_ms()
+        self.f.flush()
+        self.last_sync = time.ticks_ms()
+        self.stats.syncs += 1
+        self.stats.sync_ms_max = max(self.stats.sync_ms_max, time.ticks_diff(self.last_sync, t))
+
+    def poll(self) -> None:
+        """Apply the time based flush and sync rules, call regularly."""
+        now = time.ticks_ms()
+        if self.n and time.ticks_diff(now, self.first_pending) >= self.flush_ms:
+            self.flush()
+        if time.ticks_diff(now, self.last_sync) >= self.sync_ms:
+            self.sync()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.f.close()
@@ -0,0 +1,221 @@
+"""
+Host side simulator for the CanSat firmware.
+
+``install`` puts stand-ins for the MicroPython and CircuitPython modules the
+firmware imports (``machine``, ``uos``, ``time``/``utime``, ``_thread``,
+``board``, ``busio``, ``digitalio``, ``ucollections``,
+``urandom``, ``ustruct``) into ``sys.modules`` and attaches register level
+models of the flight hardware:
+
+* I2C bus 0: BME680, DFRobot oxygen sensor, GTop GPS, MPU6500 + AK8963
+* UART 0: a second GTop GPS (TX GP16, RX GP17), the firmware uses one of the two
+* SPI bus 0: RFM95 (CS GP1, DIO0 GP6)
+* SPI bus 1: SD card ``sd1.img`` (CS GP9), behind the firmware's ``sdcard`` driver
+* ADC 0/1: NO2 and dust sensors, ADC 4: core temperature
+
+All time comes from a virtual clock (see ``sim.clock``), so ``main.CanSat``
+runs unchanged and much faster than real time: sleeps cost nothing, code costs
+``cpu_scale`` times the host time it takes. Run the firmware with::
+
+    python -m sim --duration 120 --root simroot
+
+which prints a summary of the run. Files written to ``/d1`` end up in
+``simroot/sd1.img.d``, the raw block log region in ``simroot/sd1.img``.
+"""
+
+import builtins
+import gc
+import os
+import sys
+import time as _time
+import types
+
+from sim.clock import Clock, SimulationEnd, ticks_add, ticks_diff
+from sim.hw import Board
+from sim import devices, hw, storage
+
+HEAP_SIZE = 200 * 1024
+
+current = None
+
+
+class Simulator:
+    def __init__(self, root: str, cpu_scale: float, duration_s: float, start_ms: int, env: devices.Environment) -> None:
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.clock = Clock(cpu_scale, start_ms, None if duration_s is None else int(duration_s * 1000))
+        self.board = Board(self.clock)
+        self.env = env or devices.Environment()
+        self.fs = storage.Filesystem(os.path.join(root, "flash"))
+
+        clock = self.clock
+        board = self.board
+        self.bme680 = devices.BME680(clock, self.env)
+        self.oxygen = devices.Oxygen(clock, self.env)
+        self.gps = devices.GtopGPS(clock, self.env)
+        self.mpu6500 = devices.MPU6500(clock, self.env)
+        self.ak8963 = devices.AK8963(clock, self.env)
+        board.attach_i2c(0, 0x77, self.bme680)
+        board.attach_i2c(0, 0x73, self.oxygen)
+        board.attach_i2c(0, 0x10, self.gps)
+        board.attach_i2c(0, 0x68, self.mpu6500)
+        board.attach_i2c(0, 0x0C, self.ak8963)
+        self.gps_uart = devices.GtopUART(clock, self.env)
+        board.attach_uart(0, self.gps_uart)
+
+        self.rfm95 = devices.RFM95(clock, board, dio0=6)
+        board.attach_spi(0, 1, self.rfm95)
+
+        self.sd1 = storage.CardModel(clock, os.path.join(root, "sd1.img"))
+        board.attach_spi(1, 9, self.sd1)
+
+        rng = self.env.rng
+        board.adc[0] = lambda t: 12000 + rng.gauss(0, 50)
+        board.adc[1] = lambda t: 3000 + rng.gauss(0, 200)
+        board.adc[4] = lambda t: (0.706 - (self.env.temperature(t) + 10 - 27) * 0.001721) / 3.3 * 65535
+
+    def modules(self) -> dict:
+        clock = self.clock
+        mods = hw.modules(self.board, clock)
+
+        t = types.ModuleType("time")
+        t.ticks_ms = clock.ticks_ms
+        t.ticks_us = clock.ticks_us
+        t.ticks_cpu = clock.ticks_us
+        t.ticks_add = ticks_add
+        t.ticks_diff = ticks_diff
+        t.sleep = lambda s: clock.sleep_us(s * 1e6)
+        t.sleep_ms = lambda ms: clock.sleep_us(ms * 1000)
+        t.sleep_us = clock.sleep_us
+        t.time = clock.time
+        t.time_ns = lambda: int(clock.time() * 1e9)
+        t.monotonic = clock.monotonic
+        t.monotonic_ns = lambda: int(clock.now_us() * 1000)
+        t.localtime = lambda secs=None: tuple(_time.gmtime(clock.time() if secs is None else secs))[:8]
+        t.gmtime = t.localtime
+        t.mktime = lambda tm: int(_time.mktime(tuple(tm[:8]) + (-1,)) - _time.timezone)
+        t.__getattr__ = lambda name: getattr(_time, name)
+        mods["time"] = mods["utime"] = t
+        mods["adafruit_blinka.agnostic.time"] = t
+
+        th = types.ModuleType("_thread")
+        import _thread
+
+        th.start_new_thread = clock.start_thread
+        th.allocate_lock = lambda: Lock(clock)
+        th.get_ident = _thread.get_ident
+        th.stack_size = lambda *args: 0
+        th.__getattr__ = lambda name: getattr(_thread, name)
+        mods["_thread"] = th
+
+        mods["uos"] = self.fs.module()
+
+        import collections
+        import random
+        import struct
+        mods["ucollections"] = collections
+        mods["urandom"] = random
+        mods["ustruct"] = struct
+
+        # The vendored Adafruit drivers use these in annotations, which
+        # CPython evaluates
+        typing_mod = types.ModuleType("circuitpython_typing")
+        typing_mod.ReadableBuffer = typing_mod.WriteableBuffer = bytes
+        drivers = types.ModuleType("circuitpython_typing.device_drivers")
+        drivers.I2CDeviceDriver = object
+        typing_mod.device_drivers = drivers
+        mods["circuitpython_typing"] = typing_mod
+        mods["circuitpython_typing.device_drivers"] = drivers
+        return mods
+
+    def snapshot(self) -> dict:
+        """Counters to diff over part of a run."""
+        return {
+            "t_us": self.clock.max_us,
+            "sd_writes": self.sd1.writes,
+            "sd_bytes": self.sd1.bytes_written,
+            "lora_frames": len(self.rfm95.frames),
+            "lora_airtime_s": self.rfm95.airtime_us / 1e6,
+        }
+
+    def report(self) -> dict:
+        return {
+            "virtual_s": (self.clock.max_us - self.clock.start_us) / 1e6,
+            "bme680_measurements": self.bme680.measurements,
+            "gps_sentences": self.gps.sentences + self.gps_uart.sentences,
+            "lora_frames": len(self.rfm95.frames),
+            "lora_airtime_s": self.rfm95.airtime_us / 1e6,
+            "sd_writes": self.sd1.writes,
+            "sd_bytes": self.sd1.bytes_written,
+        }
+
+
+class Lock:
+    """``_thread`` lock that yields to other simulated threads while waiting."""
+
+    def __init__(self, clock: Clock) -> None:
+        self.clock = clock
+        self.locked_ = False
+
+    def acquire(self, waitflag: int = 1, timeout: float = -1) -> bool:
+        waited = 0
+        while self.locked_:
+            if not waitflag or 0 <= timeout <= waited:
+                return False
+            self.clock.sleep_us(10)
+            waited += 10e-6
+        self.locked_ = True
+        return True
+
+    def release(self) -> None:
+        self.locked_ = False
+
+    def locked(self) -> bool:
+        return self.locked_
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def _mem_alloc() -> int:
+    import tracemalloc
+
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def install(root: str = "simroot", cpu_scale: float = 1.0, duration_s: float = None, start_ms: int = 0, env: devices.Environment = None) -> Simulator:
+    """Create the simulated hardware and install the stand-in modules."""
+    global current
+    if current is not None:
+        raise RuntimeError("The simulator is already installed")
+    sim = Simulator(root, cpu_scale, duration_s, start_ms, env)
+    sys.modules.update(sim.modules())
+    # The firmware's threading module has to be imported again on top of the
+    # simulated _thread, the host one (pulled in by subprocess, tempfile, ...)
+    # starts real threads
+    threading = sys.modules.get("threading")
+    if threading is not None and hasattr(threading, "_shutdown"):
+        del sys.modules["threading"]
+
+    # Blinka's agnostic layer only defines time.monotonic on the boards
+    import adafruit_blinka.agnostic
+    adafruit_blinka.agnostic.time = sys.modules["time"]
+
+    import micropython
+    micropython.heap_lock = lambda: 0
+    micropython.heap_unlock = lambda: 0
+    micropython.mem_info = lambda *args: None
+    micropython.opt_level = lambda *args: 0
+    micropython.alloc_emergency_exception_buf = lambda size: None
+
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = lambda: max(0, HEAP_SIZE - _mem_alloc())
+    gc.threshold = lambda *args: -1
+
+    builtins.open = sim.fs.open
+    current = sim
+    return sim
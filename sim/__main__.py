@@ -0,0 +1,47 @@
+"""
+Run main.py in the simulator and print a summary of the run.
+
+    python -m sim --duration 120
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import sim
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m sim", description="Run the CanSat firmware against simulated hardware.")
+    parser.add_argument("--duration", type=float, default=60, help="virtual seconds to run")
+    parser.add_argument("--cpu-scale", type=float, default=1.0, help="virtual time per host second of computation")
+    parser.add_argument("--root", default="simroot", help="directory for the SD card images and flash files")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    simulator = sim.install(args.root, args.cpu_scale, args.duration)
+    start = time.perf_counter()
+    try:
+        import main as firmware
+        firmware.CanSat().run()
+    except sim.SimulationEnd:
+        pass
+    report = simulator.report()
+    report["wall_s"] = time.perf_counter() - start
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value:.3f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    sys.stdout.flush()
+    # The other simulated threads are parked on the clock, and the firmware's
+    # threading module shadows the one the interpreter shuts down with
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
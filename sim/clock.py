@@ -0,0 +1,215 @@
+"""
+Virtual clock shared by all simulated threads.
+
+Every thread has its own timeline, like the two cores of the RP2040. A thread
+runs until it sleeps; then the thread (or device event) with the earliest
+wake up time continues. Only one thread executes at a time, the others wait on
+a baton lock, so the simulation is deterministic apart from the measured host
+CPU time.
+
+Code that runs between two sleeps costs ``cpu_scale`` times the host time it
+took (``cpu_scale`` is roughly how much slower the Pico is than the host,
+0 makes computation free) plus 1 us per clock read, so busy waiting loops
+always make progress. Device models add the time of bus transfers with
+``spend`` and can keep their own computation off the firmware's time with
+``uncharged``.
+
+Device events (``at``) are delivered from inside clock reads and sleeps of
+whatever thread reaches their time first, like an interrupt.
+"""
+
+import _thread
+import heapq
+import time as _time
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+# time.time() of the simulation start
+EPOCH = 1704067200
+
+
+class SimulationEnd(BaseException):
+    """Raised in a simulated thread once its time passes the end of the run.
+
+    Derived from BaseException so ``except Exception`` in the firmware does not
+    catch it.
+    """
+
+
+class _ThreadState:
+    def __init__(self, name: str, t_us: float) -> None:
+        self.name = name
+        self.t_us = t_us
+        self.real = _time.perf_counter()
+        self.baton = _thread.allocate_lock()
+        self.baton.acquire()
+        self.wake = 0
+        # Inside ``uncharged``, clock reads cost nothing
+        self.frozen = 0
+
+
+class Clock:
+    def __init__(self, cpu_scale: float = 1.0, start_ms: int = 0, end_ms: int = None) -> None:
+        self.cpu_scale = cpu_scale
+        self.start_us = start_ms * 1000
+        self.end_us = None if end_ms is None else (start_ms + end_ms) * 1000
+        self._threads = {}
+        self._sleepers = []
+        self._events = []
+        self._seq = 0
+        self._dispatching = False
+        self.max_us = self.start_us
+        main = _ThreadState("main", self.start_us)
+        self._threads[_thread.get_ident()] = main
+
+    # -- time of the calling thread
+
+    def _state(self) -> _ThreadState:
+        return self._threads[_thread.get_ident()]
+
+    def now_us(self) -> float:
+        st = self._state()
+        if not st.frozen:
+            real = _time.perf_counter()
+            st.t_us += (real - st.real) * 1e6 * self.cpu_scale + 1
+            st.real = real
+        self._check(st)
+        return st.t_us
+
+    def uncharged(self, fn, *args):
+        """Call ``fn`` without charging its host time, for device models that
+        do more work than the hardware they stand for."""
+        st = self._state()
+        if not st.frozen:
+            real = _time.perf_counter()
+            st.t_us += (real - st.real) * 1e6 * self.cpu_scale
+            st.real = real
+        st.frozen += 1
+        try:
+            return fn(*args)
+        finally:
+            st.frozen -= 1
+            if not st.frozen:
+                st.real = _time.perf_counter()
+
+    def spend(self, us: float) -> None:
+        """Advance the calling thread, used for bus transfers and device latency."""
+        st = self._state()
+        st.t_us += us
+        self._check(st)
+
+    def _check(self, st: _ThreadState) -> None:
+        if st.t_us > self.max_us:
+            self.max_us = st.t_us
+        if self.end_us is not None and st.t_us >= self.end_us:
+            raise SimulationEnd()
+        if self._events and not self._dispatching and self._events[0][0] <= st.t_us:
+            self._dispatch(st)
+
+    # -- device events
+
+    def at(self, t_us: float, fn) -> None:
+        """Call ``fn()`` once a thread reaches ``t_us``."""
+        self._seq += 1
+        heapq.heappush(self._events, (t_us, self._seq, fn))
+
+    def after(self, us: float, fn) -> None:
+        self.at(self.now_us() + us, fn)
+
+    def disable_irq(self) -> bool:
+        state = self._dispatching
+        self._dispatching = True
+        return state
+
+    def enable_irq(self, state: bool) -> None:
+        self._dispatching = state
+
+    def _dispatch(self, st: _ThreadState) -> None:
+        self._dispatching = True
+        try:
+            while self._events and self._events[0][0] <= st.t_us:
+                _, _, fn = heapq.heappop(self._events)
+                fn()
+        finally:
+            self._dispatching = False
+
+    # -- scheduling
+
+    def sleep_us(self, us: float) -> None:
+        st = self._state()
+        wake = self.now_us() + max(us, 0)
+        while True:
+            self._push(st, wake)
+            self._switch(st)
+            if st.t_us >= wake:
+                break
+            # Woken early to deliver a device event, then sleep on
+            if not self._dispatching:
+                self._dispatch(st)
+        self._check(st)
+
+    def _push(self, st: _ThreadState, wake: float) -> None:
+        self._seq += 1
+        st.wake = wake
+        heapq.heappush(self._sleepers, (wake, self._seq, st))
+
+    def _next(self) -> _ThreadState:
+        # Earliest sleeper, woken early if a device event comes first
+        wake, _, nxt = heapq.heappop(self._sleepers)
+        if self._events and not self._dispatching and self._events[0][0] < wake:
+            wake = self._events[0][0]
+        nxt.t_us = max(nxt.t_us, wake)
+        return nxt
+
+    def _switch(self, st: _ThreadState) -> None:
+        # Hand the baton to the earliest sleeper, which may be the caller itself
+        nxt = self._next()
+        if nxt is not st:
+            nxt.baton.release()
+            st.baton.acquire()
+        st.real = _time.perf_counter()
+
+    def start_thread(self, fn, args: tuple, name: str = None) -> int:
+        parent = self._state()
+        st = _ThreadState(name or f"thread-{len(self._threads)}", self.now_us())
+
+        def run():
+            st.baton.acquire()
+            st.real = _time.perf_counter()
+            try:
+                fn(*args)
+            except SimulationEnd:
+                pass
+            finally:
+                del self._threads[_thread.get_ident()]
+                if self._sleepers:
+                    self._next().baton.release()
+
+        ident = _thread.start_new_thread(run, ())
+        self._threads[ident] = st
+        self._push(st, parent.t_us)
+        return ident
+
+    # -- time module functions
+
+    def ticks_ms(self) -> int:
+        return int(self.now_us() // 1000) & TICKS_MAX
+
+    def ticks_us(self) -> int:
+        return int(self.now_us()) & TICKS_MAX
+
+    def time(self) -> int:
+        return EPOCH + int(self.now_us() // 1000000)
+
+    def monotonic(self) -> float:
+        return self.now_us() / 1e6
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(a: int, b: int) -> int:
+    return ((a - b + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
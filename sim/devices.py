@@ -0,0 +1,705 @@
+"""
+Register level models of the CanSat peripherals.
+
+The sensor models read their physical values from an ``Environment`` (a simple
+flight profile) and turn them into the raw register contents the drivers
+decode, so the whole driver code runs unchanged:
+
+* ``BME680``     I2C 0x77, forced mode measurements with realistic duration,
+                 raw ADC values solved from the driver's compensation formulas
+* ``Oxygen``     DFRobot SEN0322 I2C 0x73
+* ``GtopGPS``    PA1010D style I2C 0x10 NMEA stream with newline stuffing
+* ``MPU6500`` / ``AK8963``  MPU9250 accelerometer/gyro (0x68) and magnetometer (0x0C)
+* ``RFM95``      SPI LoRa radio, TX FIFO, TxDone/CadDone interrupts on DIO0,
+                 time on air from the modem configuration
+"""
+
+import math
+import random
+import struct
+
+from sim.clock import EPOCH
+
+
+class Environment:
+    """Flight profile: on the ground, rocket ascent, descent under the parachute."""
+
+    def __init__(self, launch_s: float = 60, apogee_m: float = 1000, ascent_s: float = 10, descent_rate: float = 9, ground_m: float = 300, lat: float = 50.0755, lon: float = 14.4378, seed: int = 1) -> None:
+        self.launch_s = launch_s
+        self.apogee_m = apogee_m
+        self.ascent_s = ascent_s
+        self.descent_rate = descent_rate
+        self.ground_m = ground_m
+        self.lat = lat
+        self.lon = lon
+        self.rng = random.Random(seed)
+
+    def height(self, t: float) -> float:
+        """Height above ground in m."""
+        t -= self.launch_s
+        if t <= 0:
+            return 0.0
+        if t < self.ascent_s:
+            return self.apogee_m * (t / self.ascent_s) ** 2
+        return max(0.0, self.apogee_m - (t - self.ascent_s) * self.descent_rate)
+
+    def altitude(self, t: float) -> float:
+        return self.ground_m + self.height(t)
+
+    def temperature(self, t: float) -> float:
+        return 18.0 - 0.0065 * self.height(t) + self.rng.gauss(0, 0.02)
+
+    def pressure(self, t: float) -> float:
+        """hPa"""
+        return 1013.25 * (1 - 2.25577e-5 * self.altitude(t)) ** 5.25588 + self.rng.gauss(0, 0.01)
+
+    def humidity(self, t: float) -> float:
+        return 45.0 + 0.005 * self.height(t) + self.rng.gauss(0, 0.05)
+
+    def gas(self, t: float) -> float:
+        """Gas resistance in ohms"""
+        return 50000.0 + self.rng.gauss(0, 200)
+
+    def oxygen(self, t: float) -> float:
+        """vol %"""
+        return 20.9 + self.rng.gauss(0, 0.02)
+
+    def position(self, t: float) -> tuple:
+        # Drift with the wind once launched
+        drift = max(0.0, t - self.launch_s) * 3e-6
+        return self.lat + drift, self.lon + drift * 1.5
+
+    def acceleration(self, t: float) -> tuple:
+        """m/s^2 in sensor axes, z points up"""
+        boost = 2 * self.apogee_m / self.ascent_s ** 2 if 0 < t - self.launch_s < self.ascent_s else 0.0
+        g = self.rng.gauss
+        return g(0, 0.05), g(0, 0.05), 9.81 + boost + g(0, 0.05)
+
+    def rotation(self, t: float) -> tuple:
+        """deg/s"""
+        spin = 30.0 if t > self.launch_s + self.ascent_s and self.height(t) > 0 else 0.0
+        g = self.rng.gauss
+        return g(0, 0.2), g(0, 0.2), spin + g(0, 0.2)
+
+    def magnetic(self, t: float) -> tuple:
+        """uT"""
+        g = self.rng.gauss
+        return 20.0 + g(0, 0.3), 0.5 + g(0, 0.3), -45.0 + g(0, 0.3)
+
+
+class RegisterDevice:
+    """I2C device with an auto incrementing register pointer."""
+
+    def __init__(self) -> None:
+        self.regs = bytearray(256)
+        self.ptr = 0
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.ptr = data[0]
+        for b in data[1:]:
+            self.write_reg(self.ptr, b)
+            self.ptr = (self.ptr + 1) & 0xFF
+
+    def read(self, n: int) -> bytes:
+        self.before_read(self.ptr, n)
+        out = bytearray(n)
+        for i in range(n):
+            out[i] = self.read_reg(self.ptr)
+            self.ptr = (self.ptr + 1) & 0xFF
+        return bytes(out)
+
+    def write_reg(self, reg: int, value: int) -> None:
+        self.regs[reg] = value
+
+    def read_reg(self, reg: int) -> int:
+        return self.regs[reg]
+
+    def before_read(self, reg: int, n: int) -> None:
+        pass
+
+
+# BME680 calibration as decoded by the driver's struct format
+_BME_COEFF_FORMAT = "<hbBHhbBhhbbHhhBBBHbbbBbHhbb"
+_BME_COEFF = (
+    26308, 3, 0,                      # T2, T3
+    36377, -10369, 88, 0,             # P1, P2, P3
+    7300, -147, 43, 30, 0,            # P4, P5, P7, P6
+    -2796, -2363, 30, 0,              # P8, P9, P10
+    63, 12752,                        # H2 high bits, H1 << 4
+    0, 45, 20, 120, -100,             # H3 .. H7
+    25969, -1383, -39, 18,            # T1, G2, G1, G3
+)
+_BME_OVERSAMPLING = (0, 1, 2, 4, 8, 16)
+_BME_LOOKUP_1 = (2147483647.0, 2147483647.0, 2147483647.0, 2147483647.0, 2147483647.0, 2126008810.0, 2147483647.0, 2130303777.0, 2147483647.0, 2147483647.0, 2143188679.0, 2136746228.0, 2147483647.0, 2126008810.0, 2147483647.0, 2147483647.0)
+_BME_LOOKUP_2 = (4096000000.0, 2048000000.0, 1024000000.0, 512000000.0, 255744255.0, 127110228.0, 64000000.0, 32258064.0, 16016016.0, 8000000.0, 4000000.0, 2000000.0, 1000000.0, 500000.0, 250000.0, 125000.0)
+
+
+def _solve(fn, target: float, lo: int, hi: int) -> int:
+    """Integer x in [lo, hi] with fn(x) closest to target, fn monotonic."""
+    rising = fn(hi) > fn(lo)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if (fn(mid) < target) == rising:
+            lo = mid
+        else:
+            hi = mid
+    return lo if abs(fn(lo) - target) <= abs(fn(hi) - target) else hi
+
+
+class BME680(RegisterDevice):
+    def __init__(self, clock, env: Environment) -> None:
+        super().__init__()
+        self.clock = clock
+        self.env = env
+        self.measurements = 0
+        coeff = struct.pack(_BME_COEFF_FORMAT, *_BME_COEFF)
+        # Driver reads 25 bytes at 0x89 and 16 at 0xE1 and unpacks bytes 1..38
+        for i, b in enumerate(coeff, 1):
+            self.regs[0x89 + i if i < 25 else 0xE1 + i - 25] = b
+        self.regs[0xD0] = 0x61
+        self.regs[0xF0] = 0x00
+        self.regs[0x00] = 0x2E
+        self.regs[0x02] = 0x10
+        self.regs[0x04] = 0x00
+        self._calibration()
+
+    def _calibration(self) -> None:
+        c = [float(x) for x in _BME_COEFF]
+        self.t_cal = [c[23], c[0], c[1]]
+        self.p_cal = [c[x] for x in (3, 4, 5, 7, 8, 10, 9, 12, 13, 14)]
+        h = [c[x] for x in (17, 16, 18, 19, 20, 21, 22)]
+        h[1] = h[1] * 16 + h[0] % 16
+        h[0] /= 16
+        self.h_cal = h
+
+    # Compensation as in adafruit_bme680, inverted with _solve
+
+    def _t_fine(self, adc: float) -> int:
+        var1 = (adc / 8) - (self.t_cal[0] * 2)
+        var2 = (var1 * self.t_cal[1]) / 2048
+        var3 = ((var1 / 2) * (var1 / 2)) / 4096
+        var3 = (var3 * self.t_cal[2] * 16) / 16384
+        return int(var2 + var3)
+
+    def _pressure(self, adc: float, t_fine: int) -> float:
+        p = self.p_cal
+        var1 = (t_fine / 2) - 64000
+        var2 = ((var1 / 4) * (var1 / 4)) / 2048
+        var2 = (var2 * p[5]) / 4
+        var2 = var2 + (var1 * p[4] * 2)
+        var2 = (var2 / 4) + (p[3] * 65536)
+        var1 = ((((var1 / 4) * (var1 / 4)) / 8192) * (p[2] * 32) / 8) + ((p[1] * var1) / 2)
+        var1 = var1 / 262144
+        var1 = ((32768 + var1) * p[0]) / 32768
+        calc = 1048576 - adc
+        calc = (calc - (var2 / 4096)) * 3125
+        calc = (calc / var1) * 2
+        var1 = (p[8] * (((calc / 8) * (calc / 8)) / 8192)) / 4096
+        var2 = ((calc / 4) * p[7]) / 8192
+        var3 = (((calc / 256) ** 3) * p[9]) / 131072
+        calc += (var1 + var2 + var3 + (p[6] * 128)) / 16
+        return calc / 100
+
+    def _humidity(self, adc: int, t_fine: int) -> float:
+        h = self.h_cal
+        temp = ((t_fine * 5) + 128) / 256
+        var1 = (adc - (h[0] * 16)) - ((temp * h[2]) / 200)
+        var2 = (h[1] * (((temp * h[3]) / 100) + (((temp * ((temp * h[4]) / 100)) / 64) / 100) + 16384)) / 1024
+        var3 = var1 * var2
+        var4 = h[5] * 128
+        var4 = (var4 + ((temp * h[6]) / 100)) / 16
+        var5 = ((var3 / 16384) * (var3 / 16384)) / 1024
+        var6 = (var4 * var5) / 2
+        return (((var3 + var6) / 1024) * 1000) / 4096 / 1000
+
+    def _gas(self, adc: int, gas_range: int) -> float:
+        var1 = ((1340 + (5 * 0)) * _BME_LOOKUP_1[gas_range]) / 65536
+        var2 = ((adc * 32768) - 16777216) + var1
+        var3 = (_BME_LOOKUP_2[gas_range] * var1) / 512
+        return (var3 + (var2 / 2)) / var2
+
+    def write(self, data: bytes) -> None:
+        # BME680 I2C writes are register/value pairs
+        if len(data) == 1:
+            self.ptr = data[0]
+            return
+        for i in range(0, len(data) - 1, 2):
+            self.write_reg(data[i], data[i + 1])
+
+    def write_reg(self, reg: int, value: int) -> None:
+        if reg == 0xE0:
+            if value == 0xB6:
+                for r in range(0x70, 0x76):
+                    self.regs[r] = 0
+            return
+        self.regs[reg] = value
+        if reg == 0x74 and value & 0x03 == 0x01:
+            self._start()
+
+    def _duration_us(self) -> float:
+        cycles = _BME_OVERSAMPLING[min((self.regs[0x74] >> 5) & 7, 5)]
+        cycles += _BME_OVERSAMPLING[min((self.regs[0x74] >> 2) & 7, 5)]
+        cycles += _BME_OVERSAMPLING[min(self.regs[0x72] & 7, 5)]
+        us = cycles * 1963 + 477 * 9 + 1000
+        if self.regs[0x71] & 0x10:
+            wait = self.regs[0x64]
+            us += (wait & 0x3F) * (1, 4, 16, 64)[wait >> 6] * 1000
+        return us
+
+    def _start(self) -> None:
+        self.regs[0x1D] = 0x20
+        self.clock.after(self._duration_us(), self._complete)
+
+    def _complete(self) -> None:
+        t = self.clock.now_us() / 1e6
+        env = self.env
+        target_t = env.temperature(t)
+        adc_t = _solve(lambda x: ((self._t_fine(x) * 5) + 128) / 256 / 100, target_t, 0, (1 << 20) - 1)
+        t_fine = self._t_fine(adc_t)
+        adc_p = _solve(lambda x: self._pressure(x, t_fine), env.pressure(t), 0, (1 << 20) - 1)
+        adc_h = _solve(lambda x: self._humidity(x, t_fine), env.humidity(t), 0, 0xFFFF)
+        gas_range = 5
+        adc_g = _solve(lambda x: self._gas(x, gas_range), env.gas(t), 1, 1023)
+
+        r = self.regs
+        r[0x1F] = adc_p >> 12
+        r[0x20] = (adc_p >> 4) & 0xFF
+        r[0x21] = (adc_p & 0x0F) << 4
+        r[0x22] = adc_t >> 12
+        r[0x23] = (adc_t >> 4) & 0xFF
+        r[0x24] = (adc_t & 0x0F) << 4
+        r[0x25] = adc_h >> 8
+        r[0x26] = adc_h & 0xFF
+        r[0x2A] = adc_g >> 2
+        r[0x2B] = ((adc_g & 0x03) << 6) | 0x30 | gas_range
+        r[0x1D] = 0x80
+        # Back to sleep mode
+        r[0x74] &= 0xFC
+        self.measurements += 1
+
+
+class Oxygen(RegisterDevice):
+    KEY = 174
+
+    def __init__(self, clock, env: Environment) -> None:
+        super().__init__()
+        self.clock = clock
+        self.env = env
+        self.regs[0x0A] = self.KEY
+
+    def before_read(self, reg: int, n: int) -> None:
+        if reg == 0x03:
+            v = self.env.oxygen(self.clock.now_us() / 1e6) / (self.KEY / 1000)
+            self.regs[0x03] = int(v)
+            self.regs[0x04] = int(v * 10) % 10
+            self.regs[0x05] = int(v * 100) % 10
+
+
+def _nmea(body: str) -> bytes:
+    checksum = 0
+    for c in body.encode():
+        checksum ^= c
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+class GtopGPS:
+    """NMEA over I2C, reads past the end of the data return stuffed newlines."""
+
+    def __init__(self, clock, env: Environment, fix_after_s: float = 5, rate_ms: int = 1000) -> None:
+        self.clock = clock
+        self.env = env
+        self.fix_after_s = fix_after_s
+        self.rate_ms = rate_ms
+        self.buf = bytearray()
+        self.next_fix_us = 0
+        self.commands = []
+        self.pending = bytearray()
+        # Default PMTK314 output: RMC, VTG, GGA, GSA, GSV
+        self.output = {"RMC", "VTG", "GGA", "GSA", "GSV"}
+        self.sentences = 0
+
+    def write(self, data: bytes) -> None:
+        self.pending += data
+        while b"\n" in self.pending:
+            line, _, rest = bytes(self.pending).partition(b"\n")
+            self.pending = bytearray(rest)
+            text = line.decode(errors="ignore").strip()
+            if text.startswith("$PMTK"):
+                self.command(text[1:].split("*")[0])
+
+    def command(self, text: str) -> None:
+        self.commands.append(text)
+        name, *args = text.split(",")
+        if name == "PMTK220":
+            self.rate_ms = int(args[0])
+        elif name == "PMTK314":
+            self.output = {x for x, on in zip(("GLL", "RMC", "VTG", "GGA", "GSA", "GSV"), args) if on != "0"}
+        # Acknowledge as valid command
+        self.buf += _nmea(f"PMTK001,{name[4:]},3")
+
+    def read(self, n: int) -> bytes:
+        now = self.clock.now_us()
+        while self.next_fix_us <= now:
+            self._next_epoch()
+        out = bytes(self.buf[:n])
+        del self.buf[:n]
+        return out + b"\n" * (n - len(out))
+
+    def _next_epoch(self) -> None:
+        self._epoch(self.next_fix_us / 1e6)
+        self.next_fix_us += self.rate_ms * 1000
+
+    def _epoch(self, t: float) -> None:
+        seconds = EPOCH + t
+        day, rest = divmod(seconds, 86400)
+        hh, rest = divmod(rest, 3600)
+        mm, ss = divmod(rest, 60)
+        hms = f"{int(hh):02d}{int(mm):02d}{ss:06.3f}"
+        y, m, d = _civil(int(day))
+        if t < self.fix_after_s:
+            sentences = [
+                ("GGA", f"GPGGA,{hms},,,,,0,00,,,M,,M,,"),
+                ("GSA", "GPGSA,A,1,,,,,,,,,,,,,,,"),
+                ("GSV", "GPGSV,1,1,00"),
+                ("RMC", f"GPRMC,{hms},V,,,,,,,{d:02d}{m:02d}{y % 100:02d},,,N"),
+                ("VTG", "GPVTG,,T,,M,,N,,K,N"),
+            ]
+        else:
+            lat, lon = self.env.position(t)
+            lat_s = f"{int(lat):02d}{(lat % 1) * 60:07.4f},{'N' if lat >= 0 else 'S'}"
+            lon_s = f"{int(lon):03d}{(lon % 1) * 60:07.4f},{'E' if lon >= 0 else 'W'}"
+            alt = self.env.altitude(t)
+            sentences = [
+                ("GGA", f"GPGGA,{hms},{lat_s},{lon_s},1,08,0.9,{alt:.1f},M,46.9,M,,"),
+                ("GSA", "GPGSA,A,3,02,05,12,13,15,18,20,25,,,,,1.5,0.9,1.2"),
+                ("GSV", "GPGSV,2,1,08,02,45,120,38,05,30,200,35,12,60,080,41,13,15,310,29"),
+                ("GSV", "GPGSV,2,2,08,15,50,045,40,18,10,170,27,20,35,260,33,25,70,010,44"),
+                ("RMC", f"GPRMC,{hms},A,{lat_s},{lon_s},0.5,54.7,{d:02d}{m:02d}{y % 100:02d},,,A"),
+                ("VTG", "GPVTG,54.7,T,,M,0.5,N,0.9,K,A"),
+                ("GLL", f"GPGLL,{lat_s},{lon_s},{hms},A,A"),
+            ]
+        for name, sentence in sentences:
+            if name in self.output:
+                self.buf += _nmea(sentence)
+                self.sentences += 1
+
+
+class GtopUART(GtopGPS):
+    """The same module on its UART, bytes arrive at baudrate / 10 per second.
+
+    Reading with a different baudrate than the module sends at only returns
+    framing garbage. ``PMTK251`` switches the module's baudrate.
+    """
+
+    def __init__(self, clock, env: Environment, fix_after_s: float = 5, rate_ms: int = 1000, baudrate: int = 9600) -> None:
+        super().__init__(clock, env, fix_after_s, rate_ms)
+        self.baudrate = baudrate
+        # When the next byte starts on the wire
+        self.tx_us = 0.0
+        self.bytes_sent = 0
+
+    def command(self, text: str) -> None:
+        if not self.buf:
+            self.tx_us = max(self.tx_us, self.clock.now_us())
+        super().command(text)
+        name, *args = text.split(",")
+        if name == "PMTK251":
+            self.baudrate = int(args[0])
+
+    def transmit(self, now_us: float, baudrate: int) -> bytes:
+        out = bytearray()
+        while self.next_fix_us <= now_us:
+            out += self._send(self.next_fix_us)
+            if not self.buf:
+                self.tx_us = max(self.tx_us, self.next_fix_us)
+            self._next_epoch()
+        out += self._send(now_us)
+        if baudrate != self.baudrate:
+            return b"\xf0" * len(out)
+        return bytes(out)
+
+    def _send(self, until_us: float) -> bytes:
+        us_per_byte = 10e6 / self.baudrate
+        n = min(len(self.buf), max(0, int((until_us - self.tx_us) / us_per_byte)))
+        out = bytes(self.buf[:n])
+        del self.buf[:n]
+        self.tx_us += n * us_per_byte
+        self.bytes_sent += n
+        return out
+
+
+def _civil(days: int) -> tuple:
+    # Days since 1970-01-01 to (year, month, day)
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    y = yoe + era * 400
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + 3 if mp < 10 else mp - 9
+    return y + (m <= 2), m, d
+
+
+# FIFO_EN bits and the sample bytes they put into the FIFO
+_MPU_FIFO_SOURCES = ((0x08, 0, 6), (0x80, 6, 8), (0x40, 8, 10), (0x20, 10, 12), (0x10, 12, 14))
+
+
+class MPU6500(RegisterDevice):
+    """Registers plus the 512 byte FIFO, filled at 1 kHz / (1 + SMPLRT_DIV)."""
+
+    def __init__(self, clock, env: Environment) -> None:
+        super().__init__()
+        self.clock = clock
+        self.env = env
+        self.regs[0x75] = 0x71
+        self.fifo = bytearray()
+        self.next_sample_us = 0
+        self.samples = 0
+
+    def sample(self, t: float) -> bytes:
+        """ACCEL_XOUT_H..GYRO_ZOUT_L at time t"""
+        accel_lsb = 16384 >> ((self.regs[0x1C] >> 3) & 3)
+        gyro_lsb = 131.0 / (1 << ((self.regs[0x1B] >> 3) & 3))
+        ax, ay, az = self.env.acceleration(t)
+        gx, gy, gz = self.env.rotation(t)
+        temp = (self.env.temperature(t) - 21) * 333.87
+        values = [a / 9.80665 * accel_lsb for a in (ax, ay, az)] + [temp] + [g * gyro_lsb for g in (gx, gy, gz)]
+        return struct.pack(">7h", *(max(-32768, min(32767, int(v))) for v in values))
+
+    def fill_fifo(self) -> None:
+        self.clock.uncharged(self._fill_fifo, self.clock.now_us())
+
+    def _fill_fifo(self, now: float) -> None:
+        enabled = self.regs[0x23] if self.regs[0x6A] & 0x40 else 0
+        period_us = (self.regs[0x19] + 1) * 1000
+        if not enabled:
+            self.next_sample_us = now
+            return
+        frame = sum(end - start for bit, start, end in _MPU_FIFO_SOURCES if enabled & bit)
+        while self.next_sample_us <= now:
+            if len(self.fifo) + frame > 512:
+                # Full, the rest of the samples until now are lost
+                self.regs[0x3A] |= 0x10
+                missed = int((now - self.next_sample_us) // period_us) + 1
+                self.next_sample_us += missed * period_us
+                break
+            data = self.sample(self.next_sample_us / 1e6)
+            for bit, start, end in _MPU_FIFO_SOURCES:
+                if enabled & bit:
+                    self.fifo += data[start:end]
+            self.samples += 1
+            self.next_sample_us += period_us
+
+    def write_reg(self, reg: int, value: int) -> None:
+        if reg in (0x19, 0x23, 0x6A):
+            self.fill_fifo()
+        if reg == 0x6A and value & 0x04:
+            self.fifo = bytearray()
+            value &= ~0x04
+        super().write_reg(reg, value)
+
+    def read(self, n: int) -> bytes:
+        if self.ptr != 0x74:
+            return super().read(n)
+        # FIFO_R_W does not auto increment
+        self.fill_fifo()
+        out = bytes(self.fifo[:n])
+        del self.fifo[:n]
+        return out + b"\xff" * (n - len(out))
+
+    def read_reg(self, reg: int) -> int:
+        value = self.regs[reg]
+        if reg == 0x3A:
+            # Read to clear
+            self.regs[reg] = 0
+        return value
+
+    def before_read(self, reg: int, n: int) -> None:
+        if reg <= 0x3A < reg + n or reg <= 0x72 < reg + n:
+            self.fill_fifo()
+            struct.pack_into(">H", self.regs, 0x72, len(self.fifo))
+        if reg + n <= 0x3B or reg > 0x48:
+            return
+        self.regs[0x3B:0x49] = self.sample(self.clock.now_us() / 1e6)
+
+
+# CNTL1 continuous measurement modes and their period
+_AK_CONTINUOUS_US = {0x02: 125000, 0x06: 10000}
+
+
+class AK8963(RegisterDevice):
+    """Measurements are latched into HXL..HZH when they complete: right away
+    in single mode, every 125 ms / 10 ms in continuous mode 1 / 2. ST1 DRDY
+    is set until ST2 is read, DOR when a measurement replaced an unread one.
+    """
+
+    def __init__(self, clock, env: Environment) -> None:
+        super().__init__()
+        self.clock = clock
+        self.env = env
+        self.regs[0x00] = 0x48
+        self.regs[0x10] = self.regs[0x11] = self.regs[0x12] = 0xB0
+        self.next_us = 0
+        self.measurements = 0
+
+    def write_reg(self, reg: int, value: int) -> None:
+        self.regs[reg] = value
+        if reg != 0x0A:
+            return
+        mode = value & 0x0F
+        now = self.clock.now_us()
+        if mode == 0x01:
+            self._measure(now)
+            # Back to power down after a single measurement
+            self.regs[0x0A] &= 0x10
+        elif mode in _AK_CONTINUOUS_US:
+            self.next_us = now + _AK_CONTINUOUS_US[mode]
+
+    def _measure(self, t_us: float) -> None:
+        if self.regs[0x02] & 0x01:
+            self.regs[0x02] |= 0x02
+        # 0.15 uT/LSB in 16 bit mode, 0.6 in 14 bit mode
+        scale = 0.15 if self.regs[0x0A] & 0x10 else 0.6
+        adj = [((self.regs[0x10 + i] - 128) / 256 + 1) for i in range(3)]
+        values = [m / scale / adj[i] for i, m in enumerate(self.env.magnetic(t_us / 1e6))]
+        struct.pack_into("<3h", self.regs, 0x03, *(max(-32768, min(32767, int(v))) for v in values))
+        self.regs[0x09] = self.regs[0x0A] & 0x10
+        self.regs[0x02] |= 0x01
+        self.measurements += 1
+
+    def before_read(self, reg: int, n: int) -> None:
+        period_us = _AK_CONTINUOUS_US.get(self.regs[0x0A] & 0x0F)
+        if period_us is None or reg + n <= 0x02 or reg > 0x09:
+            return
+        now = self.clock.now_us()
+        if self.next_us <= now:
+            missed = int((now - self.next_us) // period_us)
+            if missed:
+                # Measurements nobody read in between
+                self.regs[0x02] |= 0x01
+            self._measure(self.next_us + missed * period_us)
+            self.next_us += (missed + 1) * period_us
+
+    def read_reg(self, reg: int) -> int:
+        value = self.regs[reg]
+        if reg == 0x09:
+            # Reading ST2 ends the data read
+            self.regs[0x02] &= ~0x03
+        return value
+
+
+_LORA_BANDWIDTH = (7800, 10400, 15600, 20800, 31250, 41700, 62500, 125000, 250000, 500000)
+
+
+class RFM95:
+    """SX1276 in LoRa mode, transmit side only."""
+
+    def __init__(self, clock, board, dio0: int) -> None:
+        self.clock = clock
+        self.board = board
+        self.dio0 = dio0
+        self.regs = bytearray(128)
+        self.fifo = bytearray(256)
+        self.regs[0x01] = 0x09
+        self.regs[0x42] = 0x12
+        self.regs[0x1D] = 0x72
+        self.regs[0x1E] = 0x74
+        self.regs[0x20] = 0
+        self.regs[0x21] = 8
+        self.selected = False
+        self.addr = None
+        self.write_mode = False
+        self.pending_irq = False
+        self.frames = []
+        self.airtime_us = 0
+
+    def select(self) -> None:
+        self.selected = True
+        self.addr = None
+
+    def deselect(self) -> None:
+        self.selected = False
+        if self.pending_irq:
+            self.pending_irq = False
+            self.board.drive(self.dio0, 1)
+
+    def transfer(self, b: int) -> int:
+        if self.addr is None:
+            self.addr = b & 0x7F
+            self.write_mode = bool(b & 0x80)
+            return 0
+        addr = self.addr
+        if addr != 0x00:
+            self.addr = (addr + 1) & 0x7F
+        if self.write_mode:
+            self._write(addr, b)
+            return 0
+        return self._read(addr)
+
+    def _read(self, addr: int) -> int:
+        if addr == 0x00:
+            ptr = self.regs[0x0D]
+            self.regs[0x0D] = (ptr + 1) & 0xFF
+            return self.fifo[ptr]
+        return self.regs[addr]
+
+    def _write(self, addr: int, value: int) -> None:
+        if addr == 0x00:
+            ptr = self.regs[0x0D]
+            self.fifo[ptr] = value
+            self.regs[0x0D] = (ptr + 1) & 0xFF
+        elif addr == 0x12:
+            self.regs[0x12] &= ~value & 0xFF
+            if not self.regs[0x12]:
+                self.board.drive(self.dio0, 0)
+        elif addr == 0x01:
+            self.regs[0x01] = value
+            mode = value & 0x07
+            if mode == 0x03:
+                self._transmit()
+            elif mode == 0x07:
+                self.clock.after(2000, lambda: self._done(0x04, 2))
+        else:
+            self.regs[addr] = value
+
+    def time_on_air_us(self, length: int) -> float:
+        bw = _LORA_BANDWIDTH[self.regs[0x1D] >> 4]
+        cr = (self.regs[0x1D] >> 1) & 0x07
+        implicit = self.regs[0x1D] & 0x01
+        sf = self.regs[0x1E] >> 4
+        crc = (self.regs[0x1E] >> 2) & 0x01
+        ldro = (self.regs[0x26] >> 3) & 0x01
+        symbol = (1 << sf) / bw
+        preamble = ((self.regs[0x20] << 8 | self.regs[0x21]) + 4.25) * symbol
+        n = 8 * length - 4 * sf + 28 + 16 * crc - 20 * implicit
+        payload = 8 + max(math.ceil(n / (4 * (sf - 2 * ldro))) * (cr + 4), 0)
+        return (preamble + payload * symbol) * 1e6
+
+    def _transmit(self) -> None:
+        length = self.regs[0x22]
+        base = self.regs[0x0E]
+        frame = bytes(self.fifo[(base + i) & 0xFF] for i in range(length))
+        duration = self.time_on_air_us(length)
+        self.airtime_us += duration
+        start = self.clock.now_us()
+
+        def done():
+            self.frames.append((start + duration, frame))
+            self._done(0x08, 1)
+        self.clock.at(start + duration, done)
+
+    def _done(self, flag: int, dio_map: int) -> None:
+        if self.regs[0x01] & 0x07 not in (0x03, 0x07):
+            # Mode was changed before the operation finished
+            return
+        self.regs[0x12] |= flag
+        self.regs[0x01] = (self.regs[0x01] & 0xF8) | 0x01
+        if self.regs[0x40] >> 6 == dio_map:
+            if self.selected:
+                self.pending_irq = True
+            else:
+                self.board.drive(self.dio0, 1)
@@ -0,0 +1,485 @@
+"""
+Stand-ins for ``machine`` and the CircuitPython ``board``/``busio``/``digitalio``
+modules.
+
+Pins, SPI and I2C buses are shared between both APIs, so a device attached to
+I2C bus 0 answers ``machine.I2C(0)`` as well as ``busio.I2C(board.GP21,
+board.GP20)``. Transfers cost the virtual time they take on the wire.
+
+SPI devices implement ``select()``, ``deselect()`` and ``transfer(byte) -> byte``
+and are selected by the level of their chip select pin. I2C devices implement
+``write(data)`` and ``read(n) -> bytes`` for one transaction each. UART devices
+implement ``write(data)`` and ``transmit(now_us, baudrate) -> bytes``, the bytes
+that arrived on the RX line since the last call.
+"""
+
+EIO = 5
+
+
+class Board:
+    """All simulated hardware, ``sim.install`` creates one."""
+
+    def __init__(self, clock) -> None:
+        self.clock = clock
+        self.levels = {}
+        self.handlers = {}
+        self.listeners = {}
+        self.spi_buses = {}
+        self.i2c_buses = {}
+        self.adc = {}
+        self.uarts = {}
+
+    def spi_bus(self, bus_id: int) -> "SpiBus":
+        if bus_id not in self.spi_buses:
+            self.spi_buses[bus_id] = SpiBus(self)
+        return self.spi_buses[bus_id]
+
+    def i2c_bus(self, bus_id: int) -> "I2cBus":
+        if bus_id not in self.i2c_buses:
+            self.i2c_buses[bus_id] = I2cBus(self)
+        return self.i2c_buses[bus_id]
+
+    def attach_spi(self, bus_id: int, cs: int, device) -> None:
+        self.spi_bus(bus_id).devices.append((cs, device))
+
+        def changed(level):
+            if level:
+                device.deselect()
+            else:
+                device.select()
+        self.listeners.setdefault(cs, []).append(changed)
+
+    def attach_i2c(self, bus_id: int, address: int, device) -> None:
+        self.i2c_bus(bus_id).devices[address] = device
+
+    def attach_uart(self, uart_id: int, device) -> None:
+        self.uarts[uart_id] = device
+
+    def set_level(self, pin: int, level: int) -> None:
+        """Level driven by the MCU, notifies attached devices."""
+        level = 1 if level else 0
+        old = self.levels.get(pin, 0)
+        self.levels[pin] = level
+        if old != level:
+            for fn in self.listeners.get(pin, ()):
+                fn(level)
+
+    def drive(self, pin: int, level: int) -> None:
+        """Level driven by a device, calls the pin interrupt handler."""
+        level = 1 if level else 0
+        old = self.levels.get(pin, 0)
+        self.levels[pin] = level
+        handler = self.handlers.get(pin)
+        if handler is not None and old != level:
+            trigger, fn, obj = handler
+            if trigger & (Pin.IRQ_RISING if level else Pin.IRQ_FALLING):
+                fn(obj)
+
+
+class SpiBus:
+    def __init__(self, board: Board) -> None:
+        self.board = board
+        self.devices = []
+        self.bytes = 0
+
+    def selected(self):
+        for cs, device in self.devices:
+            if self.board.levels.get(cs, 1) == 0:
+                return device
+        return None
+
+    def exchange(self, out, n: int, baudrate: int) -> bytearray:
+        clock = self.board.clock
+        clock.spend(n * 8e6 / baudrate)
+        self.bytes += n
+        # Byte by byte device models are much slower than the SPI peripheral
+        return clock.uncharged(self._exchange, out, n)
+
+    def _exchange(self, out, n: int) -> bytearray:
+        device = self.selected()
+        result = bytearray(n)
+        if device is not None:
+            for i in range(n):
+                result[i] = device.transfer(out[i] if out is not None else 0)
+        else:
+            for i in range(n):
+                result[i] = 0xFF
+        return result
+
+
+class I2cBus:
+    def __init__(self, board: Board) -> None:
+        self.board = board
+        self.devices = {}
+        self.transactions = 0
+
+    def device(self, address: int, n: int, freq: int):
+        # Address byte plus n data bytes, 9 clocks each
+        self.board.clock.spend((n + 1) * 9e6 / freq)
+        self.transactions += 1
+        device = self.devices.get(address)
+        if device is None:
+            raise OSError(EIO)
+        return device
+
+    def write(self, address: int, data, freq: int) -> None:
+        self.device(address, len(data), freq).write(bytes(data))
+
+    def read(self, address: int, n: int, freq: int) -> bytes:
+        return self.device(address, n, freq).read(n)
+
+
+_board = None
+
+
+def _pin_id(pin) -> int:
+    if isinstance(pin, Pin):
+        return pin.id
+    return int(pin)
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode: int = -1, pull: int = -1, value=None) -> None:
+        self.id = _pin_id(id)
+        self.mode = mode
+        if pull == Pin.PULL_UP and self.id not in _board.levels:
+            _board.levels[self.id] = 1
+        if value is not None:
+            self.value(value)
+
+    def init(self, mode: int = -1, pull: int = -1, value=None) -> None:
+        self.__init__(self.id, mode, pull, value)
+
+    def value(self, v=None):
+        if v is None:
+            return _board.levels.get(self.id, 0)
+        _board.set_level(self.id, v)
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self) -> None:
+        self.value(1)
+
+    def off(self) -> None:
+        self.value(0)
+
+    def high(self) -> None:
+        self.value(1)
+
+    def low(self) -> None:
+        self.value(0)
+
+    def toggle(self) -> None:
+        self.value(not self.value())
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard: bool = False):
+        if handler is None:
+            _board.handlers.pop(self.id, None)
+        else:
+            _board.handlers[self.id] = (trigger, handler, self)
+
+
+class SPI:
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id, baudrate: int = 1000000, *, polarity: int = 0, phase: int = 0, bits: int = 8, firstbit: int = MSB, sck=None, mosi=None, miso=None) -> None:
+        self.bus = _board.spi_bus(id)
+        self.baudrate = baudrate
+
+    def init(self, baudrate: int = None, **kwargs) -> None:
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def deinit(self) -> None:
+        pass
+
+    def read(self, nbytes: int, write: int = 0x00) -> bytes:
+        return bytes(self.bus.exchange([write] * nbytes, nbytes, self.baudrate))
+
+    def readinto(self, buf, write: int = 0x00) -> None:
+        n = len(buf)
+        buf[:] = self.bus.exchange([write] * n, n, self.baudrate)
+
+    def write(self, buf) -> None:
+        self.bus.exchange(bytes(buf), len(buf), self.baudrate)
+
+    def write_readinto(self, write_buf, read_buf) -> None:
+        read_buf[:] = self.bus.exchange(bytes(write_buf), len(write_buf), self.baudrate)
+
+
+class I2C:
+    def __init__(self, id, *, scl=None, sda=None, freq: int = 400000, timeout: int = 50000) -> None:
+        self.bus = _board.i2c_bus(id)
+        self.freq = freq
+
+    def init(self, *, scl=None, sda=None, freq: int = 400000) -> None:
+        self.freq = freq
+
+    def scan(self) -> list:
+        return sorted(self.bus.devices)
+
+    def readfrom(self, addr: int, nbytes: int, stop: bool = True) -> bytes:
+        return self.bus.read(addr, nbytes, self.freq)
+
+    def readfrom_into(self, addr: int, buf, stop: bool = True) -> None:
+        buf[:] = self.bus.read(addr, len(buf), self.freq)
+
+    def writeto(self, addr: int, buf, stop: bool = True) -> int:
+        self.bus.write(addr, buf, self.freq)
+        return len(buf)
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, *, addrsize: int = 8) -> bytes:
+        self.bus.write(addr, bytes([memaddr]), self.freq)
+        return self.bus.read(addr, nbytes, self.freq)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, *, addrsize: int = 8) -> None:
+        self.bus.write(addr, bytes([memaddr]), self.freq)
+        buf[:] = self.bus.read(addr, len(buf), self.freq)
+
+    def writeto_mem(self, addr: int, memaddr: int, buf, *, addrsize: int = 8) -> None:
+        self.bus.write(addr, bytes([memaddr]) + bytes(buf), self.freq)
+
+
+class ADC:
+    CORE_TEMP = 4
+
+    def __init__(self, pin) -> None:
+        pin = _pin_id(pin)
+        # GPIO 26-29 are ADC 0-3
+        self.channel = pin - 26 if pin >= 26 else pin
+
+    def read_u16(self) -> int:
+        _board.clock.spend(2)
+        source = _board.adc.get(self.channel)
+        if source is None:
+            return 0
+        return max(0, min(0xFFFF, int(source(_board.clock.now_us() / 1e6))))
+
+
+class UART:
+    """``machine.UART`` without ``irq``, received bytes beyond ``rxbuf`` are lost."""
+
+    def __init__(self, id, baudrate: int = 115200, bits: int = 8, parity=None, stop: int = 1, *, tx=None, rx=None, rxbuf: int = 256, txbuf: int = 256, timeout: int = 0, **kwargs) -> None:
+        self.device = _board.uarts.get(id)
+        self.baudrate = baudrate
+        self.rxbuf = rxbuf
+        self.fifo = bytearray()
+        self.overruns = 0
+
+    def init(self, baudrate: int = None, **kwargs) -> None:
+        if baudrate is not None:
+            self.receive()
+            self.baudrate = baudrate
+
+    def deinit(self) -> None:
+        pass
+
+    def receive(self) -> None:
+        if self.device is None:
+            return
+        data = self.device.transmit(_board.clock.now_us(), self.baudrate)
+        room = self.rxbuf - len(self.fifo)
+        if len(data) > room:
+            self.overruns += len(data) - room
+            data = data[:room]
+        self.fifo += data
+
+    def any(self) -> int:
+        _board.clock.spend(1)
+        self.receive()
+        return len(self.fifo)
+
+    def read(self, nbytes: int = None):
+        self.receive()
+        if not self.fifo:
+            return None
+        if nbytes is None:
+            nbytes = len(self.fifo)
+        out = bytes(self.fifo[:nbytes])
+        del self.fifo[:nbytes]
+        return out
+
+    def readinto(self, buf, nbytes: int = None):
+        data = self.read(len(buf) if nbytes is None else nbytes)
+        if data is None:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        self.receive()
+        end = self.fifo.find(b"\n")
+        return self.read(None if end < 0 else end + 1)
+
+    def write(self, buf) -> int:
+        _board.clock.spend(len(buf) * 10e6 / self.baudrate)
+        self.receive()
+        if self.device is not None:
+            self.device.write(bytes(buf))
+        return len(buf)
+
+
+class PinId(int):
+    """``board`` pins are GPIO numbers here, Blinka's pins have an ``id``."""
+
+    @property
+    def id(self) -> int:
+        return int(self)
+
+
+# RP2040 UART0 TX/RX pins, UART1 TX/RX pins
+_UART_PINS = (((0, 12, 16, 28), (1, 13, 17, 29)), ((4, 8, 20, 24), (5, 9, 21, 25)))
+
+
+def _busio_i2c_id(sda) -> int:
+    # RP2040 I2C0 SDA pins are 0, 4, 8, ..., I2C1 SDA pins 2, 6, 10, ...
+    return (_pin_id(sda) // 2) % 2
+
+
+class BusioI2C:
+    def __init__(self, scl, sda, *, frequency: int = 100000, timeout: int = 255) -> None:
+        self.bus = _board.i2c_bus(_busio_i2c_id(sda))
+        self.freq = frequency
+        self.locked = False
+
+    def deinit(self) -> None:
+        pass
+
+    def try_lock(self) -> bool:
+        if self.locked:
+            return False
+        self.locked = True
+        return True
+
+    def unlock(self) -> None:
+        self.locked = False
+
+    def scan(self) -> list:
+        return sorted(self.bus.devices)
+
+    def readfrom_into(self, address: int, buffer, *, start: int = 0, end: int = None) -> None:
+        if end is None:
+            end = len(buffer)
+        buffer[start:end] = self.bus.read(address, end - start, self.freq)
+
+    def writeto(self, address: int, buffer, *, start: int = 0, end: int = None) -> None:
+        if end is None:
+            end = len(buffer)
+        self.bus.write(address, bytes(buffer[start:end]), self.freq)
+
+    def writeto_then_readfrom(self, address: int, buffer_out, buffer_in, *, out_start: int = 0, out_end: int = None, in_start: int = 0, in_end: int = None) -> None:
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.deinit()
+
+
+class Direction:
+    INPUT = 0
+    OUTPUT = 1
+
+
+class Pull:
+    UP = 1
+    DOWN = 2
+
+
+class DigitalInOut:
+    def __init__(self, pin) -> None:
+        self.pin = Pin(pin)
+        self.direction = Direction.INPUT
+        self.pull = None
+
+    def switch_to_output(self, value: bool = False, drive_mode=None) -> None:
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input(self, pull=None) -> None:
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    @property
+    def value(self) -> bool:
+        return bool(self.pin.value())
+
+    @value.setter
+    def value(self, v: bool) -> None:
+        self.pin.value(v)
+
+    def deinit(self) -> None:
+        pass
+
+
+def modules(board: Board, clock) -> dict:
+    """Module objects to install into ``sys.modules``."""
+    global _board
+    _board = board
+    import types
+
+    machine = types.ModuleType("machine")
+    machine.Pin = Pin
+    machine.SPI = SPI
+    machine.I2C = I2C
+    machine.SoftI2C = I2C
+    machine.ADC = ADC
+    machine.UART = UART
+    machine.disable_irq = clock.disable_irq
+    machine.enable_irq = clock.enable_irq
+    machine.freq = lambda *args: 125000000
+    machine.unique_id = lambda: b"\xe6\x61\x38\x52\x83\x44\x2a\x2f"
+    machine.idle = lambda: clock.sleep_us(1)
+
+    def reset():
+        raise SystemExit("machine.reset()")
+    machine.reset = reset
+    machine.soft_reset = reset
+
+    board_mod = types.ModuleType("board")
+    for i in range(29):
+        setattr(board_mod, f"GP{i}", i)
+    board_mod.LED = 25
+    board_mod.SDA = 20
+    board_mod.SCL = 21
+    board_mod.I2C = lambda: BusioI2C(21, 20)
+
+    busio = types.ModuleType("busio")
+    busio.I2C = BusioI2C
+    busio.SPI = SPI
+    busio.UART = object
+
+    # Blinka's rp2040 UART looks its pins up here
+    pin_mod = types.ModuleType("microcontroller.pin")
+    pin_mod.uartPorts = tuple(
+        (uart_id, PinId(tx), PinId(rx)) for uart_id, (txs, rxs) in enumerate(_UART_PINS) for tx in txs for rx in rxs
+    )
+    microcontroller = types.ModuleType("microcontroller")
+    microcontroller.pin = pin_mod
+
+    digitalio = types.ModuleType("digitalio")
+    digitalio.DigitalInOut = DigitalInOut
+    digitalio.Direction = Direction
+    digitalio.Pull = Pull
+
+    return {
+        "machine": machine,
+        "board": board_mod,
+        "busio": busio,
+        "digitalio": digitalio,
+        "microcontroller": microcontroller,
+        "microcontroller.pin": pin_mod,
+    }
@@ -0,0 +1,601 @@
+"""
+SD cards and filesystems.
+
+``CardModel`` is an SD card in SPI mode behind the firmware's own ``sdcard``
+driver: it answers the commands the driver sends (CMD0/8/9/12/16/17/18/24/25/
+55/58, ACMD41) byte by byte, delivers a read block ``access_us`` after the
+command and keeps the card busy for ``program_us`` after every written block,
+which the driver polls for. Each card is a disk image on the host. A new image
+is created sparse with an MBR whose FAT32 partition covers the first half of
+the card, so the rest is free for ``blocklog``.
+
+There is no FAT implementation: ``uos.VfsFat`` mounted at a path maps that path
+to a host directory next to the image (``<image>.d``), and ``open`` is
+redirected for absolute paths below a mount point. ``FatVolume`` charges what
+MicroPython's FatFs (``FF_FS_TINY``, one sector window per volume) would do on
+the card, as block reads and writes through the driver into the partition
+area of the image:
+
+* mount reads the MBR, the boot sector and FSInfo
+* ``open`` reads the directory up to the entry, ``"a"`` walks the cluster
+  chain to the end of the file, ``"w"`` frees the old chain
+* writes of whole aligned sectors go straight to the card, partial sectors go
+  through the window (read-modify-write unless on the growing edge)
+* a new cluster reads and updates the FAT, written to both copies
+* ``flush``/``close`` write the pending sector, the directory entry and FSInfo
+
+Files are allocated contiguously in the order their clusters are needed.
+``listdir`` and ``stat`` read the directory, ``remove``, ``rename`` and
+``mkdir`` cost nothing.
+
+The rp2 port strips the first character of a mount point that does not start
+with ``/`` (``mount(vfs, "sd1")`` shows up as ``/d1``), the stand-in does the
+same.
+"""
+
+import builtins
+import os
+import struct
+from collections import deque
+
+BLOCK_SIZE = 512
+
+_R1_IDLE = 0x01
+_R1_ILLEGAL = 0x04
+_TOKEN_DATA = 0xFE
+_TOKEN_MULTI = 0xFC
+_TOKEN_STOP = 0xFD
+_DATA_ACCEPTED = 0x05
+
+# Card states between commands
+_IDLE = 0
+_READ = 1
+_READ_MULTI = 2
+_WRITE = 3
+_WRITE_MULTI = 4
+
+
+def create_image(path: str, blocks: int, fs_fraction: float = 0.5) -> None:
+    mbr = bytearray(BLOCK_SIZE)
+    start = 2048
+    count = int(blocks * fs_fraction) - start
+    struct.pack_into("<B3sB3sII", mbr, 446, 0x00, b"\x00\x02\x00", 0x0C, b"\xfe\xff\xff", start, count)
+    mbr[510] = 0x55
+    mbr[511] = 0xAA
+    with builtins.open(path, "wb") as f:
+        f.write(mbr)
+        f.truncate(blocks * BLOCK_SIZE)
+
+
+class CardModel:
+    """SPI device: image, command state machine and timing of one card."""
+
+    def __init__(self, clock, path: str, blocks: int = 131072, access_us: float = 100, program_us: float = 800) -> None:
+        if blocks % 1024:
+            raise ValueError("blocks must be a multiple of 1024, see the CSD")
+        self.clock = clock
+        self.path = path
+        if not os.path.exists(path):
+            create_image(path, blocks)
+        self.f = builtins.open(path, "r+b")
+        self.f.seek(0, 2)
+        self.blocks = self.f.tell() // BLOCK_SIZE
+        self.access_us = access_us
+        self.program_us = program_us
+        self.out = deque()
+        self.cmd = bytearray(6)
+        self.cmd_n = 0
+        self.data = bytearray(BLOCK_SIZE + 2)
+        self.data_n = -1
+        self.state = _IDLE
+        self.block = 0
+        self.ready = False
+        self.app = False
+        # Time the card has the next read block or is done programming
+        self.busy_until = 0
+        self.reads = 0
+        self.writes = 0
+        self.bytes_written = 0
+
+    def select(self) -> None:
+        pass
+
+    def deselect(self) -> None:
+        # The card keeps its state, the driver releases it between command and data
+        pass
+
+    def transfer(self, byte: int) -> int:
+        if self.data_n >= 0:
+            return self._receive(byte)
+        if self.cmd_n:
+            self.cmd[self.cmd_n] = byte
+            self.cmd_n += 1
+            if self.cmd_n == 6:
+                self.cmd_n = 0
+                self._command()
+            return 0xFF
+        if self.state in (_WRITE, _WRITE_MULTI) and not self.out:
+            if self.clock.now_us() < self.busy_until:
+                return 0x00
+            if byte == (_TOKEN_DATA if self.state == _WRITE else _TOKEN_MULTI):
+                self.data_n = 0
+                return 0xFF
+            if byte == _TOKEN_STOP and self.state == _WRITE_MULTI:
+                self.state = _IDLE
+                return 0xFF
+        if byte & 0xC0 == 0x40:
+            # A command, aborts a multiple block read
+            self.cmd[0] = byte
+            self.cmd_n = 1
+            self.out.clear()
+            return 0xFF
+        return self._next()
+
+    def _next(self) -> int:
+        if self.out:
+            return self.out.popleft()
+        if self.state in (_READ, _READ_MULTI):
+            if self.clock.now_us() < self.busy_until:
+                return 0xFF
+            self.out.extend(self._read_block(self.block))
+            self.out.extend(b"\xff\xff")
+            self.block += 1
+            if self.state == _READ:
+                self.state = _IDLE
+            return _TOKEN_DATA
+        if self.clock.now_us() < self.busy_until:
+            return 0x00
+        return 0xFF
+
+    def _respond(self, r1: int, extra: bytes = b"") -> None:
+        # One byte of command response time, then R1 and the rest of the response
+        self.out.append(0xFF)
+        self.out.append(r1)
+        self.out.extend(extra)
+
+    def _command(self) -> None:
+        index = self.cmd[0] & 0x3F
+        arg = struct.unpack_from(">I", self.cmd, 1)[0]
+        app = self.app
+        self.app = False
+        idle = 0 if self.ready else _R1_IDLE
+        if index == 0:
+            self.ready = False
+            self.state = _IDLE
+            self._respond(_R1_IDLE)
+        elif index == 8:
+            self._respond(idle, struct.pack(">I", arg & 0xFFF))
+        elif index == 58:
+            # Powered up, CCS set: block addressing
+            self._respond(idle, bytes([0xC0 if self.ready else 0x00, 0xFF, 0x80, 0x00]))
+        elif index == 55:
+            self.app = True
+            self._respond(idle)
+        elif index == 41 and app:
+            self.ready = True
+            self._respond(0)
+        elif not self.ready:
+            self._respond(idle | _R1_ILLEGAL)
+        elif index == 9:
+            csd = bytearray(16)
+            csd[0] = 0x40
+            struct.pack_into(">H", csd, 8, self.blocks // 1024 - 1)
+            self._respond(0, bytes([0xFF, _TOKEN_DATA]) + csd + b"\xff\xff")
+        elif index == 12:
+            self.state = _IDLE
+            self._respond(0)
+        elif index in (13, 16):
+            self._respond(0, b"\x00" if index == 13 else b"")
+        elif index in (17, 18):
+            self.state = _READ if index == 17 else _READ_MULTI
+            self.block = arg
+            self.busy_until = self.clock.now_us() + self.access_us
+            self._respond(0)
+        elif index in (24, 25):
+            self.state = _WRITE if index == 24 else _WRITE_MULTI
+            self.block = arg
+            self.writes += 1
+            self._respond(0)
+        else:
+            self._respond(_R1_ILLEGAL)
+
+    def _receive(self, byte: int) -> int:
+        self.data[self.data_n] = byte
+        self.data_n += 1
+        if self.data_n == len(self.data):
+            self.data_n = -1
+            self._write_block(self.block, self.data[:BLOCK_SIZE])
+            self.block += 1
+            if self.state == _WRITE:
+                self.state = _IDLE
+            self.out.append(_DATA_ACCEPTED)
+            self.busy_until = self.clock.now_us() + self.program_us
+        return 0xFF
+
+    def _read_block(self, block: int) -> bytes:
+        self.reads += 1
+        self.f.seek(block * BLOCK_SIZE)
+        return self.f.read(BLOCK_SIZE).ljust(BLOCK_SIZE, b"\x00")
+
+    def _write_block(self, block: int, data) -> None:
+        self.bytes_written += BLOCK_SIZE
+        self.f.seek(block * BLOCK_SIZE)
+        self.f.write(data)
+
+
+class FatVolume:
+    """Block traffic of FatFs on one mounted card, see the module docstring."""
+
+    def __init__(self, dev, root: str, cluster_sectors: int = 64, reserved: int = 32) -> None:
+        self.dev = dev
+        self.win = bytearray(BLOCK_SIZE)
+        self.winsect = -1
+        self.wdirty = False
+        self.fsi_dirty = False
+
+        # Like find_volume: MBR, boot sector, FSInfo
+        self.move_window(0)
+        start, count = struct.unpack_from("<II", self.win, 446 + 8)
+        if self.win[510:512] != b"\x55\xaa" or not count:
+            start, count = 0, dev.ioctl(4, 0)
+        self.move_window(start)
+        self.move_window(start + 1)
+
+        self.cluster_sectors = cluster_sectors
+        self.cluster_bytes = cluster_sectors * BLOCK_SIZE
+        self.clusters = (count - reserved) * BLOCK_SIZE // (self.cluster_bytes + 8)
+        self.fat_start = start + reserved
+        self.fat_sectors = ((self.clusters + 2) * 4 + BLOCK_SIZE - 1) // BLOCK_SIZE
+        self.data_start = self.fat_start + 2 * self.fat_sectors
+        self.fsinfo = start + 1
+        # Cluster 2 is the root directory
+        self.next_cluster = 3
+
+        # Existing files, in directory order, with their chains
+        self.entries = []
+        self.chains = {}
+        for name in sorted(os.listdir(root)):
+            self.entries.append(name)
+            size = os.path.getsize(os.path.join(root, name))
+            self.chains[name] = [self._take_cluster() for _ in range((size + self.cluster_bytes - 1) // self.cluster_bytes)]
+
+    # -- sector window
+
+    def move_window(self, sect: int) -> None:
+        if sect != self.winsect:
+            self.sync_window()
+            self.dev.readblocks(sect, self.win)
+            self.winsect = sect
+
+    def sync_window(self) -> None:
+        if self.wdirty:
+            self.dev.writeblocks(self.winsect, self.win)
+            if self.fat_start <= self.winsect < self.fat_start + self.fat_sectors:
+                # Second FAT
+                self.dev.writeblocks(self.winsect + self.fat_sectors, self.win)
+            self.wdirty = False
+
+    def sync(self) -> None:
+        self.sync_window()
+        if self.fsi_dirty:
+            # FSInfo is built in the window from scratch
+            self.win[:] = bytes(BLOCK_SIZE)
+            self.winsect = self.fsinfo
+            self.dev.writeblocks(self.fsinfo, self.win)
+            self.fsi_dirty = False
+
+    # -- FAT
+
+    def cluster_sector(self, cluster: int) -> int:
+        return self.data_start + (cluster - 2) * self.cluster_sectors
+
+    def fat_sector(self, cluster: int) -> int:
+        return self.fat_start + cluster * 4 // BLOCK_SIZE
+
+    def _take_cluster(self) -> int:
+        if self.next_cluster >= self.clusters + 2:
+            raise OSError(28)
+        cluster = self.next_cluster
+        self.next_cluster += 1
+        return cluster
+
+    def allocate(self, chain: list) -> None:
+        cluster = self._take_cluster()
+        # Check that it is free, mark the end of the chain and link the previous one
+        self.move_window(self.fat_sector(cluster))
+        self.wdirty = True
+        if chain:
+            self.move_window(self.fat_sector(chain[-1]))
+            self.wdirty = True
+        chain.append(cluster)
+        self.fsi_dirty = True
+
+    def free(self, chain: list) -> None:
+        for cluster in chain:
+            self.move_window(self.fat_sector(cluster))
+            self.wdirty = True
+        if chain:
+            self.fsi_dirty = True
+        chain.clear()
+
+    def walk(self, chain: list, n: int) -> None:
+        """Follow ``chain`` for ``n`` clusters."""
+        for cluster in chain[:n]:
+            self.move_window(self.fat_sector(cluster))
+
+    # -- directory
+
+    @staticmethod
+    def entry_slots(name: str) -> int:
+        base, _, ext = name.upper().partition(".")
+        if len(base) <= 8 and len(ext) <= 3 and name == name.upper():
+            return 1
+        # Long file name entries, 13 characters each, and the short entry
+        return 1 + (len(name) + 12) // 13
+
+    def dir_sector(self, index: int) -> int:
+        slot = sum(self.entry_slots(x) for x in self.entries[:index])
+        return self.cluster_sector(2) + (slot + self.entry_slots(self.entries[index]) - 1) * 32 // BLOCK_SIZE
+
+    def scan(self, name: str = None) -> int:
+        """Read the directory up to ``name`` (all of it if not found), returns its index or -1."""
+        last = self.cluster_sector(2) + sum(self.entry_slots(x) for x in self.entries) * 32 // BLOCK_SIZE
+        index = self.entries.index(name) if name in self.entries else -1
+        if index >= 0:
+            last = self.dir_sector(index)
+        for sect in range(self.cluster_sector(2), last + 1):
+            self.move_window(sect)
+        return index
+
+    def open(self, name: str, mode: str, size: int) -> "FatFile":
+        index = self.scan(name)
+        if index < 0:
+            if "r" in mode and "+" not in mode:
+                raise OSError(2)
+            self.entries.append(name)
+            self.chains[name] = []
+            index = len(self.entries) - 1
+            self.move_window(self.dir_sector(index))
+            self.wdirty = True
+        chain = self.chains[name]
+        f = FatFile(self, chain, self.dir_sector(index))
+        if "w" in mode:
+            if chain:
+                self.free(chain)
+                self.move_window(f.dir_sect)
+                self.wdirty = True
+        else:
+            f.size = f.last_size = size
+        if "a" in mode:
+            self.walk(chain, len(chain) - 1)
+        return f
+
+    def remove(self, name: str) -> None:
+        if name in self.entries:
+            self.free(self.chains.pop(name))
+            self.entries.remove(name)
+
+    def rename(self, name: str, new: str) -> None:
+        if name in self.entries:
+            self.remove(new)
+            self.entries[self.entries.index(name)] = new
+            self.chains[new] = self.chains.pop(name)
+
+
+class FatFile:
+    """Position, size and cluster chain of one open file."""
+
+    def __init__(self, volume: FatVolume, chain: list, dir_sect: int) -> None:
+        self.volume = volume
+        self.chain = chain
+        self.dir_sect = dir_sect
+        self.size = 0
+        self.last_size = 0
+        self.pos = 0
+        self.modified = False
+
+    def seek(self, pos: int) -> None:
+        self.pos = pos
+
+    def _sector(self) -> int:
+        volume = self.volume
+        i = self.pos // volume.cluster_bytes
+        if i >= len(self.chain):
+            volume.allocate(self.chain)
+        return volume.cluster_sector(self.chain[i]) + self.pos % volume.cluster_bytes // BLOCK_SIZE
+
+    def write(self, data) -> None:
+        volume = self.volume
+        data = memoryview(data.encode() if isinstance(data, str) else bytes(data))
+        while len(data):
+            sect = self._sector()
+            offset = self.pos % BLOCK_SIZE
+            if offset == 0:
+                if volume.winsect == sect:
+                    volume.sync_window()
+                cc = min(len(data) // BLOCK_SIZE, volume.cluster_sectors - self.pos % volume.cluster_bytes // BLOCK_SIZE)
+                if cc:
+                    # Whole sectors straight to the card
+                    volume.dev.writeblocks(sect, data[:cc * BLOCK_SIZE])
+                    if sect <= volume.winsect < sect + cc:
+                        volume.wdirty = False
+                    self.pos += cc * BLOCK_SIZE
+                    data = data[cc * BLOCK_SIZE:]
+                    continue
+                if self.pos >= self.size:
+                    # Growing edge, nothing to read
+                    volume.sync_window()
+                    volume.winsect = sect
+            k = min(BLOCK_SIZE - offset, len(data))
+            volume.move_window(sect)
+            volume.win[offset:offset + k] = data[:k]
+            volume.wdirty = True
+            self.pos += k
+            data = data[k:]
+        self.size = max(self.size, self.pos)
+        self.modified = True
+
+    def read(self, n: int) -> None:
+        volume = self.volume
+        n = min(n, self.size - self.pos)
+        while n > 0:
+            sect = self._sector()
+            offset = self.pos % BLOCK_SIZE
+            cc = min(n // BLOCK_SIZE, volume.cluster_sectors - self.pos % volume.cluster_bytes // BLOCK_SIZE) if offset == 0 else 0
+            if cc:
+                volume.dev.readblocks(sect, bytearray(cc * BLOCK_SIZE))
+                k = cc * BLOCK_SIZE
+            else:
+                volume.move_window(sect)
+                k = min(BLOCK_SIZE - offset, n)
+            self.pos += k
+            n -= k
+
+    def sync(self) -> None:
+        if self.modified:
+            volume = self.volume
+            volume.move_window(self.dir_sect)
+            volume.wdirty = True
+            volume.sync()
+            self.modified = False
+
+
+class VfsFat:
+    def __init__(self, dev) -> None:
+        self.dev = dev
+        # The card on the driver's bus and chip select
+        self.model = next(x for cs, x in dev.spi.bus.devices if cs == dev.cs.id)
+        self.root = self.model.path + ".d"
+        os.makedirs(self.root, exist_ok=True)
+        self.volume = FatVolume(dev, self.root)
+
+
+class SimFile:
+    """Host file on a mounted card, the card sees the traffic of FatFs."""
+
+    def __init__(self, f, fat: FatFile) -> None:
+        self.f = f
+        self.fat = fat
+        if "a" in f.mode:
+            fat.seek(fat.size)
+
+    def write(self, data) -> int:
+        self.fat.write(data)
+        return self.f.write(data)
+
+    def flush(self) -> None:
+        self.fat.sync()
+        self.f.flush()
+
+    def read(self, *args):
+        data = self.f.read(*args)
+        self.fat.read(len(data))
+        return data
+
+    def seek(self, *args) -> int:
+        pos = self.f.seek(*args)
+        self.fat.seek(pos)
+        return pos
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self.fat.sync()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __iter__(self):
+        return iter(self.f)
+
+    def __getattr__(self, name: str):
+        return getattr(self.f, name)
+
+
+class Filesystem:
+    """Mount table, ``uos`` functions and the ``open`` redirect."""
+
+    def __init__(self, flash_dir: str) -> None:
+        os.makedirs(flash_dir, exist_ok=True)
+        self.mounts = {}
+        self.flash_dir = flash_dir
+        self._open = builtins.open
+
+    def mount(self, vfs: VfsFat, path: str, *, readonly: bool = False) -> None:
+        if not path.startswith("/"):
+            path = "/" + path[1:]
+        if path in self.mounts:
+            raise OSError(1)
+        self.mounts[path] = vfs
+
+    def umount(self, path: str) -> None:
+        self.mounts.pop(path)
+
+    def resolve(self, path: str):
+        """Host path and mounted volume of a device path, the volume is None on flash."""
+        if not isinstance(path, str) or not path.startswith("/"):
+            return None, None
+        for mount, vfs in self.mounts.items():
+            if path == mount or path.startswith(mount + "/"):
+                return os.path.join(vfs.root, path[len(mount) + 1:]), vfs
+        return os.path.join(self.flash_dir, path[1:]), None
+
+    def open(self, file, mode: str = "r", *args, **kwargs):
+        host, vfs = self.resolve(file)
+        if host is None:
+            return self._open(file, mode, *args, **kwargs)
+        if vfs is None:
+            return self._open(host, mode, *args, **kwargs)
+        size = os.path.getsize(host) if os.path.exists(host) else 0
+        fat = vfs.volume.open(os.path.basename(host), mode, size)
+        return SimFile(self._open(host, mode, *args, **kwargs), fat)
+
+    def listdir(self, path: str = "/") -> list:
+        host, vfs = self.resolve(path)
+        if vfs is not None:
+            vfs.volume.scan()
+        names = os.listdir(host)
+        if path in ("", "/"):
+            names += [m[1:] for m in self.mounts]
+        return sorted(names)
+
+    def stat(self, path: str) -> tuple:
+        host, vfs = self.resolve(path)
+        if vfs is not None and host != vfs.root:
+            vfs.volume.scan(os.path.basename(host))
+        return tuple(os.stat(host))
+
+    def remove(self, path: str) -> None:
+        host, vfs = self.resolve(path)
+        os.remove(host)
+        if vfs is not None:
+            vfs.volume.remove(os.path.basename(host))
+
+    def rename(self, a: str, b: str) -> None:
+        host_a, vfs = self.resolve(a)
+        host_b, _ = self.resolve(b)
+        os.rename(host_a, host_b)
+        if vfs is not None:
+            vfs.volume.rename(os.path.basename(host_a), os.path.basename(host_b))
+
+    def module(self):
+        import types
+
+        uos = types.ModuleType("uos")
+        uos.VfsFat = VfsFat
+        uos.mount = self.mount
+        uos.umount = self.umount
+        uos.listdir = self.listdir
+        uos.uname = lambda: ("rp2", "rp2", "1.22.0", "v1.22.0 on 2024-01-01 (simulated)", "Raspberry Pi Pico with RP2040")
+        uos.stat = self.stat
+        uos.remove = self.remove
+        uos.rename = self.rename
+        uos.mkdir = lambda path: os.mkdir(self.resolve(path)[0])
+        uos.getcwd = lambda: "/"
+        uos.sync = lambda: None
+        uos.urandom = os.urandom
+        uos.sep = "/"
+        return uos
@@ -0,0 +1,264 @@
+"""
+Binary telemetry record format.
+
+A stream starts with the 5 byte header ``b"CSAT" + FORMAT_RECORDS`` and is
+followed by records of the form::
+
+    id:u8  dt:u16  value
+
+``dt`` is the number of milliseconds since the previous record in the same
+stream. The value is packed little endian with the struct format registered for
+the sensor id in ``SCHEMA``; ``"s"`` marks a short string (u8 length + bytes).
+
+Two ids are special:
+
+* ``TIME_ID`` carries an absolute ``u32`` timestamp instead of a value and
+  resets the stream clock. The encoder emits one before the first record and
+  whenever ``dt`` does not fit into 16 bits (including ticks wrap around).
+* ``id | NULL_FLAG`` is a reading without value (``None``), it has no payload.
+
+Logs can also use the delta compressed format of ``compress``, ``decode`` reads
+both. The module runs on the Pico and on the host. On the host it can be used
+to turn a log back into the old CSV format::
+
+    python telemetry.py data-3.bin > data-3.csv
+"""
+
+import struct
+
+MAGIC = b"CSAT"
+FORMAT_RECORDS = 1
+
+TIME_ID = 0x7F
+NULL_FLAG = 0x80
+HEADER_SIZE = 3
+
+SCHEMA = {
+    0: "f",   # BME680 - Temperature
+    1: "f",   # BME680 - Pressure
+    2: "f",   # BME680 - Humidity
+    3: "I",   # BME680 - Gas
+    4: "f",   # Pico - RAM free
+    5: "f",   # Pico - RAM allocated
+    6: "f",   # Pico - CPU temperature
+    7: "s",   # Pico - uname - sysname
+    8: "s",   # Pico - uname - nodename
+    9: "s",   # Pico - uname - release
+    10: "s",  # Pico - uname - version
+    11: "s",  # Pico - uname - machine
+    12: "B",  # Pico - SD card 1 - mounted
+    13: "B",  # Pico - SD card 2 - mounted
+    14: "f",  # GPS - Latitude
+    15: "f",  # GPS - Longitude
+    16: "f",  # GPS - Altitude
+    17: "s",  # GPS - Time
+    18: "s",  # GPS - Date
+    19: "f",  # MPU9250 - Accelerometer X
+    20: "f",  # MPU9250 - Accelerometer Y
+    21: "f",  # MPU9250 - Accelerometer Z
+    22: "f",  # MPU9250 - Gyroscope X
+    23: "f",  # MPU9250 - Gyroscope Y
+    24: "f",  # MPU9250 - Gyroscope Z
+    25: "f",  # MPU9250 - Magnetometer X
+    26: "f",  # MPU9250 - Magnetometer Y
+    27: "f",  # MPU9250 - Magnetometer Z
+    28: "f",  # MPU9250 - Temperature
+    29: "H",  # CCS811 - CO2
+    30: "H",  # CCS811 - TVOC
+    31: "H",  # Dust
+    32: "f",  # O2
+    33: "H",  # NO2
+    34: "B",  # GPS - connection
+}
+
+# Lookup tables indexed by sensor id, faster than the dict on the Pico
+_FORMATS = [None] * TIME_ID
+_SIZES = [0] * TIME_ID
+for _id, _fmt in SCHEMA.items():
+    if _fmt != "s":
+        _FORMATS[_id] = "<" + _fmt
+        _SIZES[_id] = struct.calcsize(_FORMATS[_id])
+    else:
+        _FORMATS[_id] = "s"
+
+
+def header() -> bytes:
+    return MAGIC + bytes([FORMAT_RECORDS])
+
+
+def time_record(t: int) -> bytes:
+    """A ``TIME_ID`` record that sets the stream clock to ``t``."""
+    return struct.pack("<BHI", TIME_ID, 0, t & 0xFFFFFFFF)
+
+
+def value_size(sensor_id: int, value) -> int:
+    """Number of payload bytes ``value`` takes for ``sensor_id``."""
+    if value is None:
+        return 0
+    if _FORMATS[sensor_id] == "s":
+        return 1 + min(len(value), 255)
+    return _SIZES[sensor_id]
+
+
+def pack_value(buf, offset: int, sensor_id: int, value) -> int:
+    """Pack ``value`` into ``buf`` at ``offset``, returns the new offset."""
+    fmt = _FORMATS[sensor_id]
+    if fmt == "s":
+        if isinstance(value, str):
+            value = value.encode()
+        length = min(len(value), 255)
+        buf[offset] = length
+        buf[offset + 1:offset + 1 + length] = value[:length]
+        return offset + 1 + length
+    if fmt is None:
+        raise ValueError(f"Unknown sensor id {sensor_id}")
+    struct.pack_into(fmt, buf, offset, value)
+    return offset + _SIZES[sensor_id]
+
+
+def unpack_value(buf, offset: int, sensor_id: int):
+    """Unpack the value of ``sensor_id`` at ``offset``, returns (value, new offset)."""
+    fmt = _FORMATS[sensor_id]
+    if fmt == "s":
+        length = buf[offset]
+        value = bytes(buf[offset + 1:offset + 1 + length]).decode()
+        return value, offset + 1 + length
+    if fmt is None:
+        raise ValueError(f"Unknown sensor id {sensor_id}")
+    return struct.unpack_from(fmt, buf, offset)[0], offset + _SIZES[sensor_id]
+
+
+class Encoder:
+    """Packs readings into a preallocated buffer.
+
+    The encoder keeps the stream clock, so one encoder must be used per stream
+    (file). Records are appended to ``buf`` until ``take()`` hands out the
+    encoded bytes and rewinds the buffer.
+    """
+
+    def __init__(self, size: int = 1024) -> None:
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.n = 0
+        self.last_time = None
+
+    def add(self, sensor_id: int, t: int, value) -> bool:
+        """Append one reading, returns False if it does not fit anymore."""
+        buf = self.buf
+        n = self.n
+        size = value_size(sensor_id, value)
+        dt = 0 if self.last_time is None else t - self.last_time
+        if self.last_time is None or dt < 0 or dt > 0xFFFF:
+            if n + HEADER_SIZE + 4 + size > len(buf):
+                return False
+            buf[n] = TIME_ID
+            struct.pack_into("<HI", buf, n + 1, 0, t & 0xFFFFFFFF)
+            n += HEADER_SIZE + 4
+            dt = 0
+        elif n + HEADER_SIZE + size > len(buf):
+            return False
+
+        if value is None:
+            buf[n] = sensor_id | NULL_FLAG
+            struct.pack_into("<H", buf, n + 1, dt)
+            n += HEADER_SIZE
+        else:
+            buf[n] = sensor_id
+            struct.pack_into("<H", buf, n + 1, dt)
+            n = pack_value(buf, n + HEADER_SIZE, sensor_id, value)
+        self.n = n
+        self.last_time = t
+        return True
+
+    def resync(self) -> None:
+        """Make the next record carry an absolute time.
+
+        Needed when encoded bytes were dropped, otherwise the deltas that
+        follow would be relative to a record the decoder never sees.
+        """
+        self.last_time = None
+
+    def rebind(self, buf) -> None:
+        """Continue the stream in another (empty) buffer."""
+        self.buf = buf
+        self.mv = memoryview(buf)
+        self.n = 0
+
+    def take(self) -> memoryview:
+        """Return the encoded bytes and rewind the buffer.
+
+        The returned memoryview is only valid until the next ``add``.
+        """
+        n = self.n
+        self.n = 0
+        return self.mv[:n]
+
+
+class Decoder:
+    """Turns a record stream back into (sensor_id, time, value) tuples."""
+
+    def __init__(self) -> None:
+        self.time = 0
+
+    def records(self, data, offset: int = 0, end: int = None):
+        for sensor_id, t, start, size in self.raw_records(data, offset, end):
+            if size < 0:
+                yield sensor_id, t, None
+            else:
+                yield sensor_id, t, unpack_value(data, start, sensor_id)[0]
+
+    def raw_records(self, data, offset: int = 0, end: int = None):
+        """Like ``records`` but yields (sensor_id, time, offset, size) of the packed value.
+
+        ``size`` is -1 for readings without value.
+        """
+        if end is None:
+            end = len(data)
+        while offset + HEADER_SIZE <= end:
+            sensor_id = data[offset]
+            self.time += struct.unpack_from("<H", data, offset + 1)[0]
+            offset += HEADER_SIZE
+            if sensor_id == TIME_ID:
+                if offset + 4 > end:
+                    return
+                self.time = struct.unpack_from("<I", data, offset)[0]
+                offset += 4
+                continue
+            if sensor_id & NULL_FLAG:
+                yield sensor_id & ~NULL_FLAG, self.time, 0, -1
+                continue
+            if _FORMATS[sensor_id] is None:
+                raise ValueError(f"Unknown sensor id {sensor_id}")
+            # A log cut off by a power loss can end in the middle of a value
+            if offset >= end:
+                return
+            size = 1 + data[offset] if _FORMATS[sensor_id] == "s" else _SIZES[sensor_id]
+            if offset + size > end:
+                return
+            yield sensor_id, self.time, offset, size
+            offset += size
+
+
+def decode(data):
+    """Decode a complete stream including its header."""
+    if bytes(data[:4]) != MAGIC:
+        raise ValueError("Not a telemetry stream")
+    if data[4] == FORMAT_RECORDS:
+        return Decoder().records(data, 5)
+    import compress
+    if data[4] == compress.FORMAT_COMPRESSED:
+        return compress.Decoder().records(data, 5)
+    raise ValueError(f"Unsupported format {data[4]}")
+
+
+def to_csv(data):
+    """Render a stream in the CSV format written by older firmware."""
+    return "\n".join(f"{i},{t},{v};" for i, t, v in decode(data)) + "\n"
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        with open(path, "rb") as f:
+            sys.stdout.write(to_csv(f.read()))
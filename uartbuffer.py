@@ -0,0 +1,129 @@
+"""
+Receive buffer for a UART that is filled in the background.
+
+``machine.UART`` only holds ``rxbuf`` bytes (256 by default on the rp2 port),
+so a reader that looks at it once per sampling period either blocks in
+``readline`` or loses data. ``BufferedUART`` moves received bytes into a
+``RingBuffer`` whenever the receive line goes idle (``UART.IRQ_RXIDLE``).
+Where the port has no UART interrupt (the host simulator) the consumer calls
+drain it instead, on the caller's core, so ``rxbuf`` has to hold what arrives
+between two reads. It never starts a thread: the second core belongs to the
+IO thread. The consumer side never blocks:
+
+* ``in_waiting``: bytes received and not read yet
+* ``read``/``readinto``: up to the requested bytes, whatever is there
+* ``readline``: a complete line or None
+
+It has the interface ``adafruit_gps.GPS`` expects from a UART::
+
+    uart = BufferedUART(UART(board.GP16, board.GP17, baudrate=9600))
+    gps = adafruit_gps.GPS(uart)
+
+The interrupt handler (or the consumer itself) is the only producer and the
+reader the only consumer, which is what ``RingBuffer`` needs to go without a
+lock.
+"""
+
+from ringbuffer import RingBuffer
+
+CHUNK_SIZE = 64
+
+
+class BufferedUART:
+    def __init__(self, uart, capacity: int = 1024) -> None:
+        self.uart = uart
+        self.ring = RingBuffer(capacity)
+        self.chunk = bytearray(CHUNK_SIZE)
+        self.chunk_mv = memoryview(self.chunk)
+        # Read from the ring, not returned by readline yet
+        self.line = bytearray()
+        self.scanned = 0
+        try:
+            uart.irq(self.drain)
+            self.interrupt = True
+        except (AttributeError, NotImplementedError, ValueError):
+            self.interrupt = False
+
+    @property
+    def overflows(self) -> int:
+        """Times received data was dropped because the ring buffer was full."""
+        return self.ring.overflows
+
+    @property
+    def baudrate(self) -> int:
+        return self.uart.baudrate
+
+    @baudrate.setter
+    def baudrate(self, baudrate: int) -> None:
+        self.uart.baudrate = baudrate
+
+    # -- producer side, interrupt handler or the consumer calls
+
+    def drain(self, _uart=None) -> None:
+        """Move everything the UART has received into the ring buffer."""
+        uart = self.uart
+        while True:
+            n = min(uart.in_waiting, CHUNK_SIZE)
+            if not n:
+                break
+            n = uart.readinto(self.chunk, n)
+            if not n:
+                break
+            self.ring.write(self.chunk_mv[:n])
+
+    # -- consumer side
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.interrupt:
+            self.drain()
+        return len(self.line) + self.ring.used()
+
+    def readinto(self, buf, nbytes: int = None) -> int:
+        """Move up to ``nbytes`` (default ``len(buf)``) received bytes into ``buf``, returns how many."""
+        if nbytes is None:
+            nbytes = len(buf)
+        if not self.interrupt:
+            self.drain()
+        n = min(nbytes, len(self.line))
+        if n:
+            buf[0:n] = self.line[:n]
+            del self.line[:n]
+            self.scanned = 0
+        if n < nbytes:
+            n += self.ring.readinto(memoryview(buf)[n:], nbytes - n)
+        return n
+
+    def read(self, nbytes: int = None):
+        """Up to ``nbytes`` received bytes (all by default), None if there are none."""
+        available = self.in_waiting
+        if nbytes is None or nbytes > available:
+            nbytes = available
+        if not nbytes:
+            return None
+        buf = bytearray(nbytes)
+        return bytes(buf[:self.readinto(buf)])
+
+    def readline(self):
+        """The next line including its newline, or None right away if it is not complete yet."""
+        if not self.interrupt:
+            self.drain()
+        line = self.line
+        start = self.scanned
+        while True:
+            i = bytes(line[start:]).find(b"\n") if len(line) > start else -1
+            if i >= 0:
+                end = start + i + 1
+                result = bytes(line[:end])
+                del line[:end]
+                self.scanned = 0
+                return result
+            start = len(line)
+            n = self.ring.readinto(self.chunk)
+            if not n:
+                self.scanned = start
+                return None
+            line.extend(self.chunk_mv[:n])
+
+    def write(self, buf) -> int:
+        return self.uart.write(buf)
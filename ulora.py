@@ -72,10 +72,10 @@ class SPIConfig():
 
 class LoRa(object):
     def __init__(self, spi_channel, interrupt, this_address, cs_pin, reset_pin=None, freq=868.0, tx_power=14,
-                 modem_config=ModemConfig.Bw125Cr45Sf128, receive_all=False, acks=False, crypto=None):
+                 modem_config=ModemConfig.Bw125Cr45Sf128, receive_all=False, acks=False, crypto=None, tx_queue=4):
         """
         Lora(channel, interrupt, this_address, cs_pin, reset_pin=None, freq=868.0, tx_power=14,
-                 modem_config=ModemConfig.Bw125Cr45Sf128, receive_all=False, acks=False, crypto=None)
+                 modem_config=ModemConfig.Bw125Cr45Sf128, receive_all=False, acks=False, crypto=None, tx_queue=4)
         channel: SPI channel, check SPIConfig for preconfigured names
         interrupt: GPIO interrupt pin
         this_address: set address for this device [0-254]
@@ -87,6 +87,7 @@ class LoRa(object):
         receive_all: if True, don't filter packets on address
         acks: if True, request acknowledgments
         crypto: if desired, an instance of ucrypto AES (https://docs.pycom.io/firmwareapi/micropython/ucrypto/) - not tested
+        tx_queue: number of packets enqueue() can hold while the radio is busy
         """
         
         self._spi_channel = spi_channel
@@ -111,6 +112,34 @@ class LoRa(object):
         self.send_retries = 2
         self.wait_packet_sent_timeout = 0.2
         self.retry_timeout = 0.2
+
+        # TX queue used by enqueue(), one slot stays empty to tell full from empty
+        self._tx_bufs = [bytearray(256) for _ in range(tx_queue + 1)]
+        self._tx_lens = [0] * (tx_queue + 1)
+        self._tx_head = 0
+        self._tx_tail = 0
+        self._tx_active = False
+        self._tx_on_air = False
+        self._tx_retries = 0
+        self._tx_deadline = 0
+        self._ack_wait = False
+        self._ack_deadline = 0
+        self.tx_timeout_ms = 2000
+        self.tx_ok = 0
+        self.tx_failed = 0
+        self.tx_dropped = 0
+        # Once enqueue() is used the pin interrupt only counts, poll() handles it
+        self._deferred = False
+        self._irq_count = 0
+        self._irq_seen = 0
+
+        # Preallocated SPI buffers, register access does not allocate
+        self._reg_buf = bytearray(2)
+        self._reg_addr = memoryview(self._reg_buf)[:1]
+        self._hdr_buf = bytearray(4)
+        self._tx_mvs = [memoryview(b) for b in self._tx_bufs]
+        self._rx_buf = bytearray(256)
+        self._rx_mv = memoryview(self._rx_buf)
         
         # Setup the module
 #        gpio_interrupt = Pin(self._interrupt, Pin.IN, Pin.PULL_DOWN)
@@ -179,6 +208,11 @@ class LoRa(object):
         # This should be overridden by the user
         pass
 
+    def on_sent(self, header_id, ok):
+        # Called for every enqueued packet once it was sent (and acknowledged if acks are on)
+        # or gave up, this may be overridden by the user
+        pass
+
     def sleep(self):
         if self._mode != MODE_SLEEP:
             self._spi_write(REG_01_OP_MODE, MODE_SLEEP)
@@ -229,6 +263,8 @@ class LoRa(object):
         # wait for `_handle_interrupt` to switch the mode back
         start = time.time()
         while time.time() - start < self.wait_packet_sent_timeout:
+            if self._deferred:
+                self._poll_interrupt()
             if self._mode != MODE_TX:
                 return True
 
@@ -244,21 +280,24 @@ class LoRa(object):
         self.set_mode_idle()
         self.wait_cad()
 
-        header = [header_to, self._this_address, header_id, header_flags]
+        header = self._hdr_buf
+        header[0] = header_to
+        header[1] = self._this_address
+        header[2] = header_id
+        header[3] = header_flags
         if type(data) == int:
-            data = [data]
-        elif type(data) == bytes:
-            data = [p for p in data]
+            data = bytes([data])
         elif type(data) == str:
-            data = [ord(s) for s in data]
+            data = data.encode()
+        elif type(data) == list:
+            data = bytes(data)
 
         if self.crypto:
-            data = [b for b in self._encrypt(bytes(data))]
+            data = self._encrypt(bytes(data))
 
-        payload = header + data
         self._spi_write(REG_0D_FIFO_ADDR_PTR, 0)
-        self._spi_write(REG_00_FIFO, payload)
-        self._spi_write(REG_22_PAYLOAD_LENGTH, len(payload))
+        self._spi_write_fifo(header, data)
+        self._spi_write(REG_22_PAYLOAD_LENGTH, 4 + len(data))
 
         self.set_mode_tx()
         return True
@@ -286,29 +325,159 @@ class LoRa(object):
                         return True
         return False
 
+    def enqueue(self, data, header_to, header_flags=0):
+        """
+        Queue a packet and return its header id without waiting for the radio, or None if
+        the queue is full. poll() has to be called regularly: it handles the radio interrupts
+        (the pin interrupt only counts them from now on, so all SPI traffic and queue state
+        stay on the thread that calls enqueue() and poll()), starts the next queued packet
+        and handles ACK and TX timeouts. Completion is reported through on_sent() and the
+        tx_ok / tx_failed counters. Do not mix with send() / send_to_wait().
+        """
+        self._deferred = True
+        size = len(self._tx_bufs)
+        head = self._tx_head
+        nxt = (head + 1) % size
+        if nxt == self._tx_tail:
+            self.tx_dropped += 1
+            return None
+
+        if type(data) == int:
+            data = bytes([data])
+        elif type(data) == str:
+            data = data.encode()
+        if self.crypto:
+            data = self._encrypt(bytes(data))
+        n = 4 + len(data)
+        if n > 255:
+            raise ValueError("packet too long")
+
+        self._last_header_id = (self._last_header_id + 1) % 256
+        if self._acks and header_to != BROADCAST_ADDRESS:
+            header_flags |= FLAGS_REQ_ACK
+        buf = self._tx_bufs[head]
+        buf[0] = header_to
+        buf[1] = self._this_address
+        buf[2] = self._last_header_id
+        buf[3] = header_flags
+        buf[4:n] = data
+        self._tx_lens[head] = n
+        self._tx_head = nxt
+
+        if not self._tx_active:
+            self._tx_active = True
+            self._tx_retries = 0
+            self._start_tx()
+        return self._last_header_id
+
+    def poll(self):
+        """
+        Handle radio interrupts and ACK and TX timeouts of the TX queue, returns the number
+        of queued packets
+        """
+        self._poll_interrupt()
+        if self._tx_active:
+            now = time.ticks_ms()
+            if self._ack_wait:
+                if time.ticks_diff(now, self._ack_deadline) >= 0:
+                    self._ack_wait = False
+                    if self._tx_retries < self.send_retries:
+                        self._tx_retries += 1
+                        self._start_tx()
+                    else:
+                        self._tx_finished(False)
+            elif self._mode == MODE_TX and time.ticks_diff(now, self._tx_deadline) >= 0:
+                # TxDone never came
+                self._tx_finished(False)
+        return (self._tx_head - self._tx_tail) % len(self._tx_bufs)
+
+    def _start_tx(self):
+        tail = self._tx_tail
+        self.set_mode_idle()
+        self._spi_write(REG_0D_FIFO_ADDR_PTR, 0)
+        self._spi_write(REG_00_FIFO, self._tx_mvs[tail][:self._tx_lens[tail]])
+        self._spi_write(REG_22_PAYLOAD_LENGTH, self._tx_lens[tail])
+        self._tx_deadline = time.ticks_add(time.ticks_ms(), self.tx_timeout_ms)
+        self._tx_on_air = True
+        self.set_mode_tx()
+
+    def _tx_sent(self):
+        # TxDone of the packet at the tail of the queue
+        buf = self._tx_bufs[self._tx_tail]
+        if buf[3] & FLAGS_REQ_ACK:
+            timeout = self.retry_timeout + (self.retry_timeout * (getrandbits(16) / (2**16 - 1)))
+            self._ack_deadline = time.ticks_add(time.ticks_ms(), int(timeout * 1000))
+            self._ack_wait = True
+            self.set_mode_rx()
+        else:
+            self._tx_finished(True)
+
+    def _tx_finished(self, ok):
+        tail = self._tx_tail
+        header_id = self._tx_bufs[tail][2]
+        self._tx_tail = (tail + 1) % len(self._tx_bufs)
+        self._tx_on_air = False
+        if ok:
+            self.tx_ok += 1
+        else:
+            self.tx_failed += 1
+        self.on_sent(header_id, ok)
+        if self._tx_tail != self._tx_head:
+            self._tx_retries = 0
+            self._start_tx()
+        else:
+            self._tx_active = False
+            self.set_mode_rx()
+
     def send_ack(self, header_to, header_id):
         self.send(b'!', header_to, header_id, FLAGS_ACK)
         self.wait_packet_sent()
 
     def _spi_write(self, register, payload):
+        # payload is a register value (int) or a buffer (bytes, bytearray, memoryview)
+        # that is clocked out directly after the address byte
+        buf = self._reg_buf
+        buf[0] = register | 0x80
+        self.cs.value(0)
         if type(payload) == int:
-            payload = [payload]
-        elif type(payload) == bytes:
-            payload = [p for p in payload]
-        elif type(payload) == str:
-            payload = [ord(s) for s in payload]
+            buf[1] = payload
+            self.spi.write(buf)
+        else:
+            if type(payload) == str:
+                payload = payload.encode()
+            elif type(payload) == list:
+                payload = bytes(payload)
+            self.spi.write(self._reg_addr)
+            self.spi.write(payload)
+        self.cs.value(1)
+
+    def _spi_write_fifo(self, header, data):
+        # Header and data in one burst, without joining them into a new buffer
+        self._reg_buf[0] = REG_00_FIFO | 0x80
         self.cs.value(0)
-        self.spi.write(bytearray([register | 0x80] + payload))
+        self.spi.write(self._reg_addr)
+        self.spi.write(header)
+        self.spi.write(data)
         self.cs.value(1)
 
     def _spi_read(self, register, length=1):
-        self.cs.value(0)
         if length == 1:
-            data = self.spi.read(length + 1, register)[1]
-        else:
-            data = self.spi.read(length + 1, register)[1:]
-        self.cs.value(1)
+            buf = self._reg_buf
+            self.cs.value(0)
+            self.spi.readinto(buf, register)
+            self.cs.value(1)
+            return buf[1]
+        data = bytearray(length)
+        self._spi_read_into(register, data)
         return data
+
+    def _spi_read_into(self, register, buf):
+        # Burst read of len(buf) bytes starting at register
+        self._reg_buf[0] = register & 0x7f
+        self.cs.value(0)
+        self.spi.write(self._reg_addr)
+        self.spi.readinto(buf)
+        self.cs.value(1)
         
     def _decrypt(self, message):
         decrypted_msg = self.crypto.decrypt(message)
@@ -323,13 +492,27 @@ class LoRa(object):
         return encrypted_msg
 
     def _handle_interrupt(self, channel):
+        if self._deferred:
+            # Runs on the core that set up the pin, SPI and the queue belong to poll()
+            self._irq_count += 1
+            return
+        self._service_interrupt()
+
+    def _poll_interrupt(self):
+        count = self._irq_count
+        if count != self._irq_seen:
+            self._irq_seen = count
+            self._service_interrupt()
+
+    def _service_interrupt(self):
         irq_flags = self._spi_read(REG_12_IRQ_FLAGS)
 
         if self._mode == MODE_RXCONTINUOUS and (irq_flags & RX_DONE):
             packet_len = self._spi_read(REG_13_RX_NB_BYTES)
             self._spi_write(REG_0D_FIFO_ADDR_PTR, self._spi_read(REG_10_FIFO_RX_CURRENT_ADDR))
 
-            packet = self._spi_read(REG_00_FIFO, packet_len)
+            packet = self._rx_mv[:packet_len]
+            self._spi_read_into(REG_00_FIFO, packet)
             self._spi_write(REG_12_IRQ_FLAGS, 0xff)  # Clear all IRQ flags
 
             snr = self._spi_read(REG_19_PKT_SNR_VALUE) / 4
@@ -370,9 +553,18 @@ class LoRa(object):
 
                 if not header_flags & FLAGS_ACK:
                     self.on_recv(self._last_payload)
+                elif self._ack_wait and header_to == self._this_address and \
+                        header_id == self._tx_bufs[self._tx_tail][2]:
+                    # ACK for the queued packet
+                    self._ack_wait = False
+                    self._tx_finished(True)
 
         elif self._mode == MODE_TX and (irq_flags & TX_DONE):
             self.set_mode_idle()
+            if self._tx_on_air:
+                # Not an ACK sent by send_ack()
+                self._tx_on_air = False
+                self._tx_sent()
 
         elif self._mode == MODE_CAD and (irq_flags & CAD_DONE):
             self._cad = irq_flags & CAD_DETECTED